@@ -0,0 +1,166 @@
+import argparse
+import logging
+from datetime import UTC, datetime
+from decimal import Decimal
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+
+from src.csv_schema import PRICE_TYPE, TIMESTAMP_TYPE
+
+logger = logging.getLogger(__name__)
+
+ITEMS = ["Pulse", "Smart Pulse", "Pulse Charger", "Smart Thermostat", "Smart Plug", "EV Charger", "Power Meter"]
+DEFAULT_CURRENCY_WEIGHTS = {"NOK": 0.55, "SEK": 0.15, "EUR": 0.15, "USD": 0.1, "DKK": 0.05}
+DEFAULT_START = datetime(2024, 1, 1, tzinfo=UTC)
+WRITE_BATCH_ROWS = 250_000
+HEX_DIGITS = np.frombuffer(b"0123456789abcdef", dtype=np.uint8)
+# positions of the four dashes in the 36 character textual UUID
+UUID_DASHES = (8, 13, 18, 23)
+
+
+def parse_currency_weights(text: str) -> dict[str, float]:
+    """Parse ``"NOK:0.6,EUR:0.4"`` into a currency -> weight mapping."""
+    weights = {}
+    for part in text.split(","):
+        currency, weight = part.split(":")
+        weights[currency.strip().upper()] = float(weight)
+    return weights
+
+
+def _uuid_strings(rng: np.random.Generator, count: int) -> np.ndarray:
+    # Builds the textual UUIDs as one uint8 matrix instead of formatting them one by one
+    random_bytes = rng.integers(0, 256, size=(count, 16), dtype=np.uint8)
+    nibbles = np.empty((count, 32), dtype=np.uint8)
+    nibbles[:, 0::2] = random_bytes >> 4
+    nibbles[:, 1::2] = random_bytes & 0x0F
+    characters = HEX_DIGITS[nibbles]
+    for position in UUID_DASHES:
+        characters = np.insert(characters, position, ord("-"), axis=1)
+    return np.ascontiguousarray(characters).view("S36").ravel().astype(str)
+
+
+def _timestamps(microseconds: np.ndarray) -> pa.Array:
+    return pa.array(microseconds, pa.int64()).cast(TIMESTAMP_TYPE)
+
+
+def _prices(cents: np.ndarray) -> pa.Array:
+    unscaled = pc.cast(pa.array(cents, pa.int64()), pa.decimal128(19, 0))
+    return pc.cast(pc.multiply(unscaled, pa.scalar(Decimal("0.01"), pa.decimal128(3, 2))), PRICE_TYPE)
+
+
+def generate_item_prices(
+    output_dir: str | Path,
+    rows: int,
+    files: int = 1,
+    mean_versions: float = 3.0,
+    duplicate_ratio: float = 0.0,
+    currency_weights: dict[str, float] | None = None,
+    seed: int = 42,
+    start: datetime = DEFAULT_START,
+    seconds_between_rows: float = 1.0,
+) -> list[Path]:
+    """Write ``rows`` synthetic item_prices rows, split into ``files`` batch<N>.csv files.
+
+    Every id gets a geometrically distributed number of versions with mean ``mean_versions``.
+    A ``duplicate_ratio`` share of the rows repeats an earlier row exactly, which the loaders skip
+    with ON CONFLICT. system_timestamp grows through the files like real exports, so checkpoint
+    filtering behaves as in production. The same arguments always produce the same files.
+    """
+    rng = np.random.default_rng(seed)
+    currency_weights = currency_weights or DEFAULT_CURRENCY_WEIGHTS
+    currencies = np.array(list(currency_weights))
+    probabilities = np.array(list(currency_weights.values()), dtype=np.float64)
+    probabilities /= probabilities.sum()
+
+    unique_rows = rows - int(rows * duplicate_ratio)
+    versions = rng.geometric(1 / mean_versions, size=int(unique_rows / mean_versions * 1.1) + 10)
+    while versions.sum() < unique_rows:
+        versions = np.concatenate([versions, rng.geometric(1 / mean_versions, size=len(versions))])
+    id_index = np.repeat(np.arange(len(versions)), versions)[:unique_rows]
+    rng.shuffle(id_index)
+    ids = _uuid_strings(rng, len(versions))
+    # an id keeps its item and currency across versions, only the price changes
+    id_items = np.array(ITEMS)[rng.integers(0, len(ITEMS), size=len(versions))]
+    id_currencies = currencies[rng.choice(len(currencies), size=len(versions), p=probabilities)]
+
+    # row i of the output is a new version, or a copy of one of the unique rows written before it
+    source = np.arange(rows)
+    duplicate_positions = np.sort(rng.choice(np.arange(1, rows), size=rows - unique_rows, replace=False))
+    is_duplicate = np.zeros(rows, dtype=bool)
+    is_duplicate[duplicate_positions] = True
+    unique_position = np.cumsum(~is_duplicate) - 1
+    source[~is_duplicate] = unique_position[~is_duplicate]
+    source[is_duplicate] = rng.integers(0, unique_position[is_duplicate] + 1)
+
+    start_us = int(start.timestamp() * 1_000_000)
+    step_us = int(seconds_between_rows * 1_000_000)
+    system_us = start_us + np.arange(unique_rows, dtype=np.int64) * step_us
+    updated_us = system_us - rng.integers(0, 600, size=unique_rows) * 1_000_000
+    created_us = updated_us - rng.integers(0, 86_400, size=unique_rows) * 1_000_000
+    cents = rng.integers(1_000, 1_000_000, size=unique_rows)
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for file_number, file_rows in enumerate(np.array_split(source, files), start=1):
+        path = output_dir / f"batch{file_number}.csv"
+        with pa_csv.CSVWriter(path, _schema()) as writer:
+            for start_row in range(0, len(file_rows), WRITE_BATCH_ROWS):
+                picked = file_rows[start_row : start_row + WRITE_BATCH_ROWS]
+                picked_ids = id_index[picked]
+                writer.write_table(
+                    pa.table(
+                        {
+                            "id": pa.array(ids[picked_ids]),
+                            "item": pa.array(id_items[picked_ids]),
+                            "price": _prices(cents[picked]),
+                            "currency": pa.array(id_currencies[picked_ids]),
+                            "created_at": _timestamps(created_us[picked]),
+                            "updated_at": _timestamps(updated_us[picked]),
+                            "system_timestamp": _timestamps(system_us[picked]),
+                        },
+                        schema=_schema(),
+                    )
+                )
+        paths.append(path)
+        logger.info("Wrote %s rows to %s", len(file_rows), path)
+    return paths
+
+
+def _schema() -> pa.Schema:
+    return pa.schema(
+        [
+            ("id", pa.string()),
+            ("item", pa.string()),
+            ("price", PRICE_TYPE),
+            ("currency", pa.string()),
+            ("created_at", TIMESTAMP_TYPE),
+            ("updated_at", TIMESTAMP_TYPE),
+            ("system_timestamp", TIMESTAMP_TYPE),
+        ]
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate synthetic item_prices CSV files")
+    parser.add_argument("output_dir")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--files", type=int, default=1)
+    parser.add_argument("--mean-versions", type=float, default=3.0)
+    parser.add_argument("--duplicate-ratio", type=float, default=0.0)
+    parser.add_argument("--currencies", type=parse_currency_weights, default=DEFAULT_CURRENCY_WEIGHTS)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    generate_item_prices(
+        args.output_dir, args.rows, args.files, args.mean_versions, args.duplicate_ratio, args.currencies, args.seed
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    main()
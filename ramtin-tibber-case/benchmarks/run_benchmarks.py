@@ -0,0 +1,282 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+
+from benchmarks.generate_data import generate_item_prices
+
+logger = logging.getLogger(__name__)
+
+BASELINES_PATH = Path(__file__).parent / "baselines.json"
+DEFAULT_ROWS = 1_000_000
+DEFAULT_FILES = 3
+DEFAULT_DUPLICATE_RATIO = 0.05
+DEFAULT_CHUNK_SIZE = 100_000
+DEFAULT_DB_NAME = "tibber_benchmark"
+# a stage regresses when its throughput drops, or its peak memory grows, by more than this share
+DEFAULT_TOLERANCE = 0.2
+
+OFFLINE_STAGES = ("parse", "row_feed")
+DATABASE_STAGES = ("insert_batch", "insert_copy", "load_batch", "load_copy")
+
+
+class StageResult(NamedTuple):
+    stage: str
+    rows: int
+    seconds: float
+    rows_per_second: float
+    peak_rss_mb: float
+    latency_p50_ms: float
+    latency_p95_ms: float
+    latency_max_ms: float
+
+
+def _csv_files(data_dir: str) -> list[str]:
+    from src.load_csv import get_csv_files_in_order
+
+    return get_csv_files_in_order(data_dir)
+
+
+def _timed(latencies: list[float], function: Callable[[], int]) -> int:
+    started = time.perf_counter()
+    rows = function()
+    latencies.append(time.perf_counter() - started)
+    return rows
+
+
+def _parse(data_dir: str, chunk_size: int, latencies: list[float]) -> int:
+    from src.load_csv import iter_csv_chunks
+
+    rows = 0
+    for file_path in _csv_files(data_dir):
+        chunks = iter_csv_chunks(file_path, chunk_size=chunk_size)
+        while True:
+            started = time.perf_counter()
+            chunk = next(chunks, None)
+            if chunk is None:
+                break
+            latencies.append(time.perf_counter() - started)
+            rows += chunk.rows_parsed
+    return rows
+
+
+def _row_feed(data_dir: str, chunk_size: int, latencies: list[float]) -> int:
+    from src.load_csv import DEFAULT_BATCH_SIZE, ITEM_PRICES_COLUMNS, iter_csv_chunks
+    from src.row_feed import RowFeed
+
+    def feed(data_frame) -> int:
+        return sum(len(batch) for batch in RowFeed(data_frame, ITEM_PRICES_COLUMNS).batches(DEFAULT_BATCH_SIZE))
+
+    rows = 0
+    for file_path in _csv_files(data_dir):
+        for chunk in iter_csv_chunks(file_path, chunk_size=chunk_size):
+            rows += _timed(latencies, lambda chunk=chunk: feed(chunk.data_frame))
+    return rows
+
+
+def _prepare_database() -> None:
+    from src.database_manager import database_setup, reset_database
+
+    reset_database()
+    database_setup()
+
+
+def _insert(mode: str, data_dir: str, chunk_size: int, latencies: list[float]) -> int:
+    from src.load_csv import copy_data_into_database, insert_data_into_database, iter_csv_chunks
+
+    insert = copy_data_into_database if mode == "copy" else insert_data_into_database
+    _prepare_database()
+    rows = 0
+    for file_path in _csv_files(data_dir):
+        for chunk in iter_csv_chunks(file_path, chunk_size=chunk_size):
+            _timed(latencies, lambda chunk=chunk: insert(chunk.data_frame, checkpoint_name=None))
+            rows += chunk.rows_parsed
+    return rows
+
+
+def _count_rows(data_dir: str) -> int:
+    from src.csv_schema import iter_item_prices_batches
+
+    return sum(batch.rows_parsed for path in _csv_files(data_dir) for batch in iter_item_prices_batches(path))
+
+
+def _load(mode: str, data_dir: str, chunk_size: int, latencies: list[float]) -> None:
+    from src.load_csv import load_csv_files
+
+    _prepare_database()
+    if not _timed(latencies, lambda: load_csv_files(mode, chunk_size, use_manifest=False, directory=data_dir)):
+        raise RuntimeError(f"Not every CSV file in {data_dir} was loaded")
+
+
+def run_stage(stage: str, data_dir: str, chunk_size: int, db_name: str) -> StageResult:
+    """Run one stage and measure it, meant to be called in a fresh process so peak RSS is its own.
+
+    Throughput covers everything the stage does from reading the files, latencies only its own unit
+    of work: a parsed chunk, a converted or inserted chunk, or the whole end-to-end load.
+    """
+    os.environ["DB_NAME"] = db_name
+    logging.basicConfig(level=logging.WARNING)
+
+    # the end-to-end load does not report its rows, they are counted before the clock starts
+    rows = _count_rows(data_dir) if stage.startswith("load_") else 0
+    latencies: list[float] = []
+    started = time.perf_counter()
+    if stage == "parse":
+        rows = _parse(data_dir, chunk_size, latencies)
+    elif stage == "row_feed":
+        rows = _row_feed(data_dir, chunk_size, latencies)
+    elif stage.startswith("insert_"):
+        rows = _insert(stage.removeprefix("insert_"), data_dir, chunk_size, latencies)
+    else:
+        _load(stage.removeprefix("load_"), data_dir, chunk_size, latencies)
+    seconds = time.perf_counter() - started
+
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_rss_mb = peak_rss / (1024 * 1024) if sys.platform == "darwin" else peak_rss / 1024
+    p50, p95, maximum = np.percentile(latencies, [50, 95, 100]) * 1000 if latencies else (0.0, 0.0, 0.0)
+    return StageResult(
+        stage,
+        rows,
+        round(seconds, 3),
+        round(rows / seconds, 1) if seconds else 0.0,
+        round(peak_rss_mb, 1),
+        round(float(p50), 2),
+        round(float(p95), 2),
+        round(float(maximum), 2),
+    )
+
+
+def _run_in_fresh_process(stage: str, data_dir: str, chunk_size: int, db_name: str) -> StageResult:
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(run_stage, stage, data_dir, chunk_size, db_name).result()
+
+
+def database_available(db_name: str) -> bool:
+    os.environ["DB_NAME"] = db_name
+    from src.database_manager import get_db_connection
+
+    try:
+        get_db_connection().close()
+        return True
+    except Exception:
+        logger.warning("Database %s is not reachable, skipping the database stages", db_name)
+        return False
+
+
+def compare_to_baselines(
+    results: list[StageResult], baselines: dict[str, dict], tolerance: float = DEFAULT_TOLERANCE
+) -> list[str]:
+    """Return a message for every stage that is slower or uses more memory than its baseline allows."""
+    regressions = []
+    for result in results:
+        baseline = baselines.get(result.stage)
+        if baseline is None:
+            continue
+        if result.rows_per_second < baseline["rows_per_second"] * (1 - tolerance):
+            regressions.append(
+                f"{result.stage}: {result.rows_per_second:.0f} rows/s, baseline {baseline['rows_per_second']:.0f}"
+            )
+        if result.peak_rss_mb > baseline["peak_rss_mb"] * (1 + tolerance):
+            regressions.append(
+                f"{result.stage}: peak RSS {result.peak_rss_mb:.0f} MB, baseline {baseline['peak_rss_mb']:.0f} MB"
+            )
+    return regressions
+
+
+def _print_report(results: list[StageResult], baselines: dict[str, dict]) -> None:
+    print(
+        f"{'stage':<14}{'rows':>10}{'rows/s':>12}{'baseline':>12}{'RSS MB':>9}"
+        f"{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}"
+    )
+    for result in results:
+        baseline = baselines.get(result.stage, {}).get("rows_per_second")
+        print(
+            f"{result.stage:<14}{result.rows:>10}{result.rows_per_second:>12.0f}"
+            f"{baseline if baseline is not None else '-':>12}{result.peak_rss_mb:>9.1f}"
+            f"{result.latency_p50_ms:>10.1f}{result.latency_p95_ms:>10.1f}{result.latency_max_ms:>10.1f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark CSV parsing and loading on synthetic data")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS)
+    parser.add_argument("--files", type=int, default=DEFAULT_FILES)
+    parser.add_argument("--duplicate-ratio", type=float, default=DEFAULT_DUPLICATE_RATIO)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--data-dir", help="use existing CSV files instead of generating them")
+    parser.add_argument("--stages", nargs="+", choices=OFFLINE_STAGES + DATABASE_STAGES)
+    parser.add_argument("--skip-db", action="store_true", help="only run the stages that need no database")
+    parser.add_argument("--db-name", default=DEFAULT_DB_NAME, help="scratch database, it is reset by the run")
+    parser.add_argument("--baselines", type=Path, default=BASELINES_PATH)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--update-baselines", action="store_true")
+    parser.add_argument("--check", action="store_true", help="exit with status 1 on a regression")
+    parser.add_argument("--output", type=Path, help="write the results as JSON")
+    args = parser.parse_args()
+
+    stages = list(args.stages or OFFLINE_STAGES + DATABASE_STAGES)
+    if args.skip_db or (any(s in DATABASE_STAGES for s in stages) and not database_available(args.db_name)):
+        stages = [stage for stage in stages if stage in OFFLINE_STAGES]
+
+    with tempfile.TemporaryDirectory(prefix="tibber_benchmark_") as temp_dir:
+        data_dir = args.data_dir or temp_dir
+        if not args.data_dir:
+            logger.info("Generating %s rows in %s files", args.rows, args.files)
+            generate_item_prices(data_dir, args.rows, args.files, duplicate_ratio=args.duplicate_ratio, seed=args.seed)
+        data_dir = str(Path(data_dir).resolve())
+
+        results = []
+        for stage in stages:
+            logger.info("Running stage %s", stage)
+            results.append(_run_in_fresh_process(stage, data_dir, args.chunk_size, args.db_name))
+
+    stored = json.loads(args.baselines.read_text()) if args.baselines.exists() else {}
+    # throughput and memory depend on the data size, so baselines only apply to runs of the same size
+    baselines = stored.get("stages", {}) if stored.get("rows") == args.rows and not args.data_dir else {}
+    _print_report(results, baselines)
+
+    if args.output:
+        args.output.write_text(
+            json.dumps(
+                {
+                    "python": platform.python_version(),
+                    "machine": platform.machine(),
+                    "rows": args.rows,
+                    "results": [result._asdict() for result in results],
+                },
+                indent=2,
+            )
+        )
+
+    if args.update_baselines:
+        for result in results:
+            baselines[result.stage] = {"rows_per_second": result.rows_per_second, "peak_rss_mb": result.peak_rss_mb}
+        stored = {"rows": args.rows, "stages": baselines}
+        args.baselines.write_text(json.dumps(stored, indent=2, sort_keys=True) + "\n")
+        logger.info("Updated baselines in %s", args.baselines)
+
+    regressions = compare_to_baselines(results, baselines, args.tolerance)
+    for regression in regressions:
+        logger.warning("Regression: %s", regression)
+    if args.check and regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    main()
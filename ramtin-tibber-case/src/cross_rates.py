@@ -0,0 +1,51 @@
+from datetime import date
+
+import numpy as np
+
+from src.database_manager import execute_query
+
+# float64 carries 15-16 significant digits and a division can disturb the last one, so cross rates
+# are rounded to a precision that float64 reproduces reliably, so every reader derives the same rates
+RATE_SIGNIFICANT_DIGITS = 12
+
+
+def round_significant(values: np.ndarray, digits: int = RATE_SIGNIFICANT_DIGITS) -> np.ndarray:
+    magnitude = np.floor(np.log10(np.abs(values)))
+    scale = 10.0 ** (digits - 1 - magnitude)
+    return np.round(values * scale) / scale
+
+
+def cross_rate_matrix(rates: dict[str, float], base_currency: str) -> tuple[list[str], np.ndarray]:
+    """Derive every currency pair from one set of rates quoted against ``base_currency``.
+
+    With ``rates[x]`` units of x per unit of the base, one unit of a buys ``rates[b] / rates[a]``
+    units of b. The whole N x N matrix is one outer division, ``matrix[i, j]`` being the rate from
+    ``currencies[i]`` to ``currencies[j]``.
+    """
+    quoted = {code: rate for code, rate in rates.items() if rate}
+    quoted[base_currency] = 1.0
+    currencies = sorted(quoted)
+
+    base_rates = np.array([quoted[code] for code in currencies], dtype=np.float64)
+    matrix = round_significant(base_rates[np.newaxis, :] / base_rates[:, np.newaxis])
+    np.fill_diagonal(matrix, 1.0)
+    return currencies, matrix
+
+
+def load_cross_rates(anchor_currency: str, rate_date: date) -> tuple[list[str], np.ndarray] | None:
+    """Derive every currency pair from the ``anchor_currency`` rates valid on ``rate_date``.
+
+    exchange_rates only keeps the rates published against the anchor, one row per currency and day.
+    The latest day published on or before ``rate_date`` is read and expanded with cross_rate_matrix,
+    so the table does not have to hold the pairs the anchor already implies.
+    """
+    query = """
+    SELECT currency_code, rate
+    FROM exchange_rates
+    WHERE base_currency = %s
+        AND rate_date = (SELECT MAX(rate_date) FROM exchange_rates WHERE base_currency = %s AND rate_date <= %s);
+    """
+    rows = execute_query(query, (anchor_currency, anchor_currency, rate_date))
+    if not rows:
+        return None
+    return cross_rate_matrix({code: float(rate) for code, rate in rows}, anchor_currency)
@@ -0,0 +1,103 @@
+from collections.abc import Iterator
+from datetime import datetime
+from typing import Any, NamedTuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+
+TIMESTAMP_TYPE = pa.timestamp("us", tz="UTC")
+PRICE_TYPE = pa.decimal128(10, 2)  # matches item_prices.price DECIMAL(10, 2)
+
+# Declared layout of the item_prices CSV exports. Timestamps must carry a zone offset and are
+# normalized to UTC while parsing; item and currency are low-cardinality and dictionary encoded.
+ITEM_PRICES_SCHEMA = pa.schema(
+    [
+        pa.field("id", pa.string(), nullable=False),
+        pa.field("item", pa.dictionary(pa.int32(), pa.string()), nullable=False),
+        pa.field("price", PRICE_TYPE, nullable=False),
+        pa.field("currency", pa.dictionary(pa.int32(), pa.string()), nullable=False),
+        pa.field("created_at", TIMESTAMP_TYPE, nullable=False),
+        pa.field("updated_at", TIMESTAMP_TYPE, nullable=False),
+        pa.field("system_timestamp", TIMESTAMP_TYPE, nullable=False),
+    ]
+)
+
+UUID_PATTERN = r"^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$"
+
+# pyarrow reads in byte-sized blocks; rows in these exports are roughly this wide
+APPROX_BYTES_PER_ROW = 160
+
+
+class CsvBatch(NamedTuple):
+    rows_parsed: int
+    min_timestamp: datetime | None
+    max_timestamp: datetime | None
+    table: pa.Table
+
+
+def _convert_options() -> pa_csv.ConvertOptions:
+    return pa_csv.ConvertOptions(
+        column_types={field.name: field.type for field in ITEM_PRICES_SCHEMA},
+        include_columns=ITEM_PRICES_SCHEMA.names,
+        strings_can_be_null=False,
+    )
+
+
+def _checkpoint_scalar(checkpoint_timestamp: Any) -> pa.Scalar:
+    checkpoint = pd.Timestamp(checkpoint_timestamp)
+    checkpoint = checkpoint.tz_localize("UTC") if checkpoint.tzinfo is None else checkpoint.tz_convert("UTC")
+    return pa.scalar(checkpoint, type=TIMESTAMP_TYPE)
+
+
+def _validate_ids(table: pa.Table | pa.RecordBatch) -> None:
+    valid = pc.match_substring_regex(table["id"], UUID_PATTERN)
+    invalid_count = len(valid) - pc.sum(valid).as_py() if len(valid) else 0
+    if invalid_count:
+        raise ValueError(f"{invalid_count} rows have an id that is not a UUID")
+
+
+def iter_item_prices_batches(
+    file_path: str, checkpoint_timestamp: Any | None = None, rows_per_batch: int = 100_000
+) -> Iterator[CsvBatch]:
+    """Read ``file_path`` with the pyarrow CSV reader, yielding typed batches filtered on the checkpoint.
+
+    The checkpoint predicate is evaluated on each Arrow batch before anything is converted to pandas,
+    so rows that are already loaded are never materialized as Python or pandas objects.
+    """
+    checkpoint = _checkpoint_scalar(checkpoint_timestamp) if checkpoint_timestamp else None
+    read_options = pa_csv.ReadOptions(block_size=max(rows_per_batch * APPROX_BYTES_PER_ROW, 1 << 16))
+
+    with pa_csv.open_csv(file_path, read_options=read_options, convert_options=_convert_options()) as reader:
+        for batch in reader:
+            rows_parsed = batch.num_rows
+            if not rows_parsed:
+                continue
+
+            _validate_ids(batch)
+            timestamp_range = pc.min_max(batch["system_timestamp"])
+            if checkpoint is not None:
+                batch = batch.filter(pc.greater(batch["system_timestamp"], checkpoint))
+
+            yield CsvBatch(
+                rows_parsed,
+                timestamp_range["min"].as_py(),
+                timestamp_range["max"].as_py(),
+                pa.Table.from_batches([batch], schema=batch.schema),
+            )
+
+
+def read_item_prices_table(file_path: str, checkpoint_timestamp: Any | None = None) -> tuple[int, pa.Table]:
+    """Read a whole file with the declared schema, returning ``(rows_parsed, filtered_table)``."""
+    table = pa_csv.read_csv(file_path, convert_options=_convert_options())
+    _validate_ids(table)
+    rows_parsed = table.num_rows
+    if checkpoint_timestamp:
+        table = table.filter(pc.greater(table["system_timestamp"], _checkpoint_scalar(checkpoint_timestamp)))
+    return rows_parsed, table
+
+
+def to_data_frame(table: pa.Table) -> pd.DataFrame:
+    # Prices stay Arrow-backed fixed-point decimals instead of being boxed into Python Decimal objects
+    return table.to_pandas(types_mapper={PRICE_TYPE: pd.ArrowDtype(PRICE_TYPE)}.get)
@@ -0,0 +1,121 @@
+import logging
+import threading
+from decimal import ROUND_HALF_UP, Decimal, localcontext
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from src.database_manager import execute_query
+
+logger = logging.getLogger(__name__)
+
+CONVERTED_PRICE_TYPE = pa.decimal128(20, 2)  # matches transaction_prices_in_nok.price_in_nok
+CENT = Decimal("0.01")
+# A float64 quotient this close to a half cent may be on the wrong side of it, those few are
+# recomputed exactly
+TIE_RELATIVE_TOLERANCE = 1e-12
+EXACT_PRECISION = 50
+
+_rate_cache: "RateCache | None" = None
+_rate_cache_lock = threading.Lock()
+
+
+class RateCache:
+    """NOK-based rates held in memory, as exact Decimals and as a float lookup for vectorized use.
+
+    ``rates[x]`` is how many units of x one NOK buys, as stored in currency_conversion_rates_base_nok.
+    """
+
+    def __init__(self, rates: dict[str, Decimal]) -> None:
+        self.rates = dict(rates)
+        self.rates.setdefault("NOK", Decimal(1))
+        self.float_rates = {code: float(rate) for code, rate in self.rates.items()}
+
+    @classmethod
+    def load(cls) -> "RateCache":
+        result = execute_query("SELECT currency_code, rate FROM currency_conversion_rates_base_nok;") or []
+        logger.info("Loaded %s conversion rates", len(result))
+        return cls({currency_code: Decimal(rate) for currency_code, rate in result})
+
+
+def get_rate_cache() -> RateCache:
+    global _rate_cache
+
+    with _rate_cache_lock:
+        if _rate_cache is None:
+            _rate_cache = RateCache.load()
+        return _rate_cache
+
+
+def invalidate_rate_cache() -> None:
+    # The next conversion reloads the rates, called whenever insert_rates has written new ones
+    global _rate_cache
+
+    with _rate_cache_lock:
+        _rate_cache = None
+
+
+def _to_cents(prices: pd.Series) -> np.ndarray:
+    if isinstance(prices.dtype, pd.ArrowDtype) and pa.types.is_decimal(prices.dtype.pyarrow_dtype):
+        # exact for the DECIMAL(10, 2) prices read by to_data_frame
+        scaled = pc.round(pc.multiply(pa.array(prices.array), pa.scalar(100)))
+        return pc.cast(scaled, pa.int64()).to_numpy(zero_copy_only=False)
+    return np.rint(prices.to_numpy(dtype=np.float64) * 100).astype(np.int64)
+
+
+def _exact_cents(cents: int, source_rate: Decimal, target_rate: Decimal) -> int:
+    with localcontext() as context:
+        context.prec = EXACT_PRECISION
+        converted = Decimal(cents) / 100 / source_rate * target_rate
+        return int(converted.quantize(CENT, rounding=ROUND_HALF_UP) * 100)
+
+
+def _cents_to_decimal_array(cents: np.ndarray, valid: np.ndarray) -> pa.Array:
+    # decimal128 values are 128-bit two's complement integers of the unscaled value
+    words = np.empty((len(cents), 2), dtype=np.int64)
+    words[:, 0] = cents
+    words[:, 1] = np.where(cents < 0, -1, 0)
+    validity = pa.array(valid, pa.bool_()).buffers()[1]
+    return pa.Array.from_buffers(
+        CONVERTED_PRICE_TYPE, len(cents), [validity, pa.py_buffer(words)], null_count=int((~valid).sum())
+    )
+
+
+def convert_prices(
+    prices: pd.Series, currencies: pd.Series, target_currency: str = "NOK", rates: RateCache | None = None
+) -> pd.Series:
+    """Convert a whole column of prices to ``target_currency`` in one vectorized pass.
+
+    The result is rounded to cents half away from zero like ``ROUND(price / rate, 2)`` in
+    transaction_prices_in_nok, and returned as an Arrow-backed decimal column. Prices in a currency
+    without a rate convert to null, like the LEFT JOIN in SQL.
+    """
+    rates = rates or get_rate_cache()
+    if target_currency not in rates.rates:
+        raise ValueError(f"No conversion rate for target currency {target_currency!r}")
+
+    cents = _to_cents(prices)
+    source_rates = currencies.map(rates.float_rates).to_numpy(dtype=np.float64, na_value=np.nan)
+    valid = ~np.isnan(source_rates)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        converted = cents / source_rates * rates.float_rates[target_currency]
+        rounded = np.trunc(converted + np.copysign(0.5, converted))
+        distance_from_tie = np.abs(np.abs(converted) % 1 - 0.5)
+    near_tie = valid & (distance_from_tie <= np.abs(converted) * TIE_RELATIVE_TOLERANCE + 1e-9)
+
+    result = np.where(valid, rounded, 0).astype(np.int64)
+    if near_tie.any():
+        currency_values = currencies.to_numpy(dtype=object)
+        target_rate = rates.rates[target_currency]
+        for index in np.flatnonzero(near_tie):
+            source_rate = rates.rates[currency_values[index]]
+            result[index] = _exact_cents(int(cents[index]), source_rate, target_rate)
+
+    return pd.Series(
+        pd.arrays.ArrowExtensionArray(_cents_to_decimal_array(result, valid)),
+        index=prices.index,
+        name=f"price_in_{target_currency.lower()}",
+    )
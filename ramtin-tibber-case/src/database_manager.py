@@ -1,16 +1,56 @@
 import logging
 import os
-from typing import Any
+import re
+import threading
+import time
+import uuid
+from collections.abc import Callable, Iterator, Sequence
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from datetime import UTC, datetime
+from types import ModuleType
+from typing import IO, Any, NamedTuple
 
+import pandas as pd
 import psycopg2
+import pyarrow as pa
 from dotenv import load_dotenv
-from psycopg2.extensions import connection
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, connection
 from psycopg2.extras import execute_values
 
+from src.metrics import increment, record_insert, set_gauge, timer
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_POOL_MIN_SIZE = 1
+DEFAULT_POOL_MAX_SIZE = 10
+DEFAULT_POOL_HEALTH_CHECK_INTERVAL = 30.0  # seconds a connection may sit idle before it is pinged on checkout
+DEFAULT_POOL_TIMEOUT = 30.0
+DEFAULT_PARTITION_MONTHS_AHEAD = 3
+DEFAULT_STREAM_FETCH_SIZE = 10_000
+STREAM_OUTPUTS = ("rows", "pandas", "arrow")
+# "postgres" is the production database, "duckdb" an embedded columnar file for local analytics and CI
+STORAGE_BACKENDS = ("postgres", "duckdb")
+
+
+def storage_backend() -> str:
+    backend = os.getenv("DB_BACKEND", "postgres").lower()
+    if backend not in STORAGE_BACKENDS:
+        raise ValueError(f"Unknown DB_BACKEND {backend!r}, expected one of {STORAGE_BACKENDS}")
+    return backend
+
+
+def _using_duckdb() -> bool:
+    return storage_backend() == "duckdb"
+
+
+def _duckdb() -> ModuleType:
+    # imported on first use, so a PostgreSQL deployment does not need duckdb installed
+    from src import duckdb_backend
+
+    return duckdb_backend
+
 
 def get_db_connection() -> connection:
     return psycopg2.connect(
@@ -22,37 +62,417 @@ def get_db_connection() -> connection:
     )
 
 
+class PoolExhaustedError(Exception):
+    pass
+
+
+class ConnectionPool:
+    """Thread-safe pool of reusable connections.
+
+    Idle connections are kept in LIFO order so the most recently used (and therefore
+    most likely still alive) connection is handed out first. A connection that has been
+    idle longer than ``health_check_interval`` is pinged before it is returned to a caller,
+    and broken connections are discarded and replaced transparently.
+    """
+
+    def __init__(
+        self,
+        min_size: int = DEFAULT_POOL_MIN_SIZE,
+        max_size: int = DEFAULT_POOL_MAX_SIZE,
+        health_check_interval: float = DEFAULT_POOL_HEALTH_CHECK_INTERVAL,
+        timeout: float = DEFAULT_POOL_TIMEOUT,
+        connection_factory: Callable[[], connection] | None = None,
+    ) -> None:
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(f"Invalid pool size: min_size={min_size}, max_size={max_size}")
+
+        self.min_size = min_size
+        self.max_size = max_size
+        self.health_check_interval = health_check_interval
+        self.timeout = timeout
+        self._connection_factory = connection_factory
+        self._idle: list[tuple[connection, float]] = []
+        self._size = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def idle_count(self) -> int:
+        return len(self._idle)
+
+    def fill(self) -> None:
+        with self._condition:
+            while self._size < self.min_size:
+                self._idle.append((self._connect(), time.monotonic()))
+                self._size += 1
+
+    def getconn(self) -> connection:
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self._condition:
+                if self._closed:
+                    raise PoolExhaustedError("Connection pool is closed")
+
+                conn: connection | None = None
+                if self._idle:
+                    conn, idle_since = self._idle.pop()
+                elif self._size < self.max_size:
+                    self._size += 1
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolExhaustedError(f"No connection available within {self.timeout} seconds")
+                    self._condition.wait(remaining)
+                    continue
+
+            if conn is None:
+                try:
+                    return self._connect()
+                except Exception:
+                    self._release_slot()
+                    raise
+
+            if self._is_healthy(conn, idle_since):
+                return conn
+
+            logger.warning("Discarding broken pooled connection")
+            self._discard(conn)
+
+    def putconn(self, conn: connection, discard: bool = False) -> None:
+        if not discard and not conn.closed:
+            try:
+                if conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                discard = True
+
+        if discard or conn.closed:
+            self._discard(conn)
+            return
+
+        with self._condition:
+            if self._closed:
+                self._size -= 1
+                conn.close()
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._condition.notify()
+
+    @contextmanager
+    def checkout(self) -> Iterator[connection]:
+        conn = self.getconn()
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            self.putconn(conn, discard=True)
+            raise
+        except BaseException:
+            self.putconn(conn)
+            raise
+        else:
+            self.putconn(conn)
+
+    def closeall(self) -> None:
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._condition.notify_all()
+
+        for conn, _ in idle:
+            try:
+                conn.close()
+            except psycopg2.Error:
+                logger.warning("Error closing pooled connection", exc_info=True)
+
+    def _connect(self) -> connection:
+        if self._connection_factory is not None:
+            return self._connection_factory()
+        return get_db_connection()
+
+    def _is_healthy(self, conn: connection, idle_since: float) -> bool:
+        if conn.closed:
+            return False
+        if time.monotonic() - idle_since < self.health_check_interval:
+            return True
+
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1;")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn: connection) -> None:
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+        self._release_slot()
+
+    def _release_slot(self) -> None:
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+
+
+_pool: ConnectionPool | None = None
+_pool_pid: int | None = None
+_pool_lock = threading.Lock()
+
+
+def get_connection_pool() -> ConnectionPool:
+    global _pool, _pool_pid
+
+    with _pool_lock:
+        if _pool is not None and _pool_pid != os.getpid():
+            # Forked child process: the inherited connections share sockets with the parent,
+            # so they must be abandoned (not closed) and the child gets its own pool.
+            _pool = None
+
+        if _pool is None:
+            _pool = ConnectionPool(
+                min_size=int(os.getenv("DB_POOL_MIN_SIZE", DEFAULT_POOL_MIN_SIZE)),
+                max_size=int(os.getenv("DB_POOL_MAX_SIZE", DEFAULT_POOL_MAX_SIZE)),
+                health_check_interval=float(
+                    os.getenv("DB_POOL_HEALTH_CHECK_INTERVAL", DEFAULT_POOL_HEALTH_CHECK_INTERVAL)
+                ),
+                timeout=float(os.getenv("DB_POOL_TIMEOUT", DEFAULT_POOL_TIMEOUT)),
+            )
+            _pool_pid = os.getpid()
+            _pool.fill()
+            logger.info("Created connection pool (min=%s, max=%s)", _pool.min_size, _pool.max_size)
+        return _pool
+
+
+def close_connection_pool() -> None:
+    global _pool
+
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+    if _using_duckdb():
+        _duckdb().close_connection()
+
+
+@contextmanager
+def pooled_connection() -> Iterator[connection]:
+    with get_connection_pool().checkout() as conn:
+        yield conn
+
+
+@contextmanager
+def transaction() -> Iterator[connection]:
+    """Check out a pooled connection and run the block as one transaction, committed only on success."""
+    if _using_duckdb():
+        with _duckdb().transaction() as conn:
+            yield conn
+        return
+
+    with pooled_connection() as conn:
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+
+
+@contextmanager
+def savepoint(conn: connection, name: str = "sub_batch") -> Iterator[None]:
+    """Run the block under a savepoint, so a failure only undoes the block and not the whole transaction."""
+    if _using_duckdb():
+        raise ValueError("DuckDB has no savepoints, transactional loads need PostgreSQL")
+
+    with conn.cursor() as cursor:
+        cursor.execute(f"SAVEPOINT {name};")
+    try:
+        yield
+    except BaseException:
+        with conn.cursor() as cursor:
+            cursor.execute(f"ROLLBACK TO SAVEPOINT {name};")
+        raise
+    with conn.cursor() as cursor:
+        cursor.execute(f"RELEASE SAVEPOINT {name};")
+
+
+@contextmanager
+def _connection_or_pooled(conn: connection | None) -> Iterator[connection]:
+    # A connection passed in by the caller belongs to the caller's transaction and is not committed here
+    if conn is not None:
+        yield conn
+        return
+
+    with pooled_connection() as pooled_conn:
+        yield pooled_conn
+        pooled_conn.commit()
+
+
 def execute_query(
     query: str,
     params: tuple[Any, ...] | None = None,
     conn: connection | None = None,
+    commit: bool = True,
 ) -> list[tuple] | None:
-    should_close_conn = False
-    if conn is None:
-        conn = get_db_connection()
-        should_close_conn = True
+    with timer("db_query_duration_seconds", statement=_statement_type(query)):
+        if _using_duckdb():
+            return _duckdb().execute_query(query, params, conn, commit)
 
-    try:
-        with conn.cursor() as cursor:
-            cursor.execute(query, params)
+        if conn is None:
+            with pooled_connection() as pooled_conn:
+                return _execute_and_commit(pooled_conn, query, params, commit)
+
+        return _execute_and_commit(conn, query, params, commit)
+
+
+def _statement_type(query: str) -> str:
+    words = query.split(None, 1)
+    return words[0].upper() if words else ""
+
+
+def _insert_table(query: str) -> str:
+    match = re.match(r"\s*INSERT\s+INTO\s+([\w.]+)", query, re.IGNORECASE)
+    return match.group(1) if match else ""
+
+
+def _execute_and_commit(
+    conn: connection, query: str, params: tuple[Any, ...] | None, commit: bool = True
+) -> list[tuple] | None:
+    with conn.cursor() as cursor:
+        cursor.execute(query, params)
+        if commit:
             conn.commit()
-            try:  # If the query is not a select, fetchall will raise an error
-                return cursor.fetchall()
-            except psycopg2.ProgrammingError:
-                return None
-    finally:
-        if should_close_conn:
-            conn.close()
+        try:  # If the query is not a select, fetchall will raise an error
+            return cursor.fetchall()
+        except psycopg2.ProgrammingError:
+            return None
+
+
+# Arrow types of the PostgreSQL column types the pipeline selects, by type OID, so that every chunk of
+# a stream gets the same schema. Other types are inferred from the values.
+ARROW_TYPES = {
+    16: pa.bool_(),
+    20: pa.int64(),
+    21: pa.int16(),
+    23: pa.int32(),
+    25: pa.string(),
+    700: pa.float32(),
+    701: pa.float64(),
+    1042: pa.string(),
+    1043: pa.string(),
+    1082: pa.date32(),
+    1114: pa.timestamp("us"),
+    1184: pa.timestamp("us", tz="UTC"),
+    2950: pa.string(),
+}
+NUMERIC_OID = 1700
+
+
+def stream_query(
+    query: str,
+    params: tuple[Any, ...] | None = None,
+    fetch_size: int = DEFAULT_STREAM_FETCH_SIZE,
+    output: str = "rows",
+    conn: connection | None = None,
+) -> Iterator[tuple | pd.DataFrame | pa.Table]:
+    """Run a SELECT and yield its result lazily, ``fetch_size`` rows at a time, instead of all at once.
+
+    ``output`` "rows" yields tuples, "pandas" a DataFrame and "arrow" a pyarrow Table per fetch.
+    In PostgreSQL the query runs on a named server-side cursor, so client memory is bounded by one
+    fetch however large the result is. Without ``conn`` a pooled connection is held until the
+    generator is exhausted or closed.
+    """
+    if output not in STREAM_OUTPUTS:
+        raise ValueError(f"Unknown output {output!r}, expected one of {STREAM_OUTPUTS}")
+    if fetch_size < 1:
+        raise ValueError(f"fetch_size must be positive, got {fetch_size}")
+
+    if _using_duckdb():
+        chunks = _duckdb().stream_chunks(query, params, fetch_size, output == "rows", conn)
+    else:
+        chunks = _stream_chunks(query, params, fetch_size, output == "rows", conn)
+    return _stream_output(chunks, output)
+
+
+def _stream_output(chunks: Iterator[list[tuple] | pa.Table], output: str) -> Iterator[tuple | pd.DataFrame | pa.Table]:
+    for chunk in chunks:
+        increment("db_rows_streamed_total", len(chunk))
+        if isinstance(chunk, list):
+            yield from chunk
+        elif output == "pandas":
+            yield chunk.to_pandas()
+        else:
+            yield chunk
 
 
-def batch_insert(query: str, params_list: list[tuple[Any, ...]]) -> int:
+def _stream_chunks(
+    query: str, params: tuple[Any, ...] | None, fetch_size: int, as_rows: bool, conn: connection | None
+) -> Iterator[list[tuple] | pa.Table]:
+    # Nothing is committed, a pooled connection is rolled back when it is returned
+    stream_context: AbstractContextManager[connection] = nullcontext(conn) if conn is not None else pooled_connection()
+    with stream_context as stream_conn:
+        with stream_conn.cursor(name=f"stream_{uuid.uuid4().hex}") as cursor:
+            cursor.itersize = fetch_size
+            cursor.execute(query, params)
+            types: list[pa.DataType | None] = []
+            while rows := cursor.fetchmany(fetch_size):
+                if as_rows:
+                    yield rows
+                    continue
+                columns = list(zip(*rows, strict=True))
+                # A named cursor only has a description after the first fetch. A type is fixed by the
+                # first chunk with a value in its column and used for every chunk after it.
+                types = [
+                    type_ or _arrow_type(column, values)
+                    for type_, column, values in zip(
+                        types or [None] * len(columns), cursor.description, columns, strict=True
+                    )
+                ]
+                yield pa.Table.from_arrays(
+                    [pa.array(values, type=type_) for values, type_ in zip(columns, types, strict=True)],
+                    names=[column.name for column in cursor.description],
+                )
+
+
+def _arrow_type(column: Any, values: Sequence[Any]) -> pa.DataType | None:
+    if column.type_code == NUMERIC_OID and column.precision:
+        return pa.decimal128(column.precision, column.scale)
+    if column.type_code in ARROW_TYPES:
+        return ARROW_TYPES[column.type_code]
+
+    inferred = pa.array(values).type
+    if pa.types.is_null(inferred):
+        return None
+    # An unconstrained NUMERIC, such as a ROUND(...) column, gets the widest precision at the scale
+    # of its values, so that larger values in later chunks still fit
+    return pa.decimal128(38, inferred.scale) if pa.types.is_decimal(inferred) else inferred
+
+
+def batch_insert(
+    query: str,
+    params_list: list[tuple[Any, ...]],
+    template: str | None = None,
+    conn: connection | None = None,
+    page_size: int = 100,
+) -> int:
     if not params_list:
         return 0
 
-    conn = get_db_connection()
+    if _using_duckdb():
+        with timer("db_insert_duration_seconds", method="batch"):
+            rows_affected = _duckdb().batch_insert(query, params_list, template, conn)
+        record_insert(_insert_table(query), "batch", len(params_list), rows_affected)
+        return rows_affected
+
     rows_affected = 0
 
-    try:
+    with _connection_or_pooled(conn) as conn:
         with conn.cursor() as cursor:
             table_and_columns = query.split("VALUES")[0].strip()
 
@@ -63,8 +483,10 @@ def batch_insert(query: str, params_list: list[tuple[Any, ...]]) -> int:
                 new_query = f"{new_query} ON CONFLICT {on_conflict_clause}"
 
             try:
-                execute_values(cursor, new_query, params_list, template=None, page_size=100)
+                with timer("db_insert_duration_seconds", method="batch"):
+                    execute_values(cursor, new_query, params_list, template=template, page_size=page_size)
                 rows_affected = cursor.rowcount
+                record_insert(_insert_table(query), "batch", len(params_list), rows_affected)
                 if rows_affected < len(params_list):
                     logger.info(
                         "Some rows were skipped due to conflicts. Attempted: %s, Inserted: %s",
@@ -74,10 +496,103 @@ def batch_insert(query: str, params_list: list[tuple[Any, ...]]) -> int:
             except Exception as e:
                 logger.error("Error during batch insert: %s", str(e))
                 raise
-            conn.commit()
         return rows_affected
-    finally:
-        conn.close()
+
+
+class CopyResult(NamedTuple):
+    rows_copied: int
+    rows_attempted: int
+    rows_inserted: int
+    max_value: Any | None = None
+    staged_min: Any | None = None
+    staged_max: Any | None = None
+
+
+def copy_insert(
+    table_name: str,
+    columns: Sequence[str],
+    csv_data: IO[bytes] | IO[str],
+    conflict_columns: Sequence[str],
+    where_clause: str | None = None,
+    params: tuple[Any, ...] | None = None,
+    max_column: str | None = None,
+    conn: connection | None = None,
+) -> CopyResult:
+    """Bulk load CSV data with COPY into a staging table and merge it into ``table_name``.
+
+    The staging table is a session-private temporary table, so it is never WAL-logged and
+    concurrent loaders do not block each other. Rows are merged with a single set-based
+    ``INSERT ... SELECT ... ON CONFLICT DO NOTHING``; ``where_clause`` (with ``params``) can
+    restrict which staged rows are merged. If ``max_column`` is given, the maximum value of
+    that column among the merged candidates is returned as well, together with its range over
+    everything that was staged. Without ``conn`` the load is committed on its own connection.
+    """
+    if _using_duckdb():
+        with timer("db_insert_duration_seconds", method="copy"):
+            result = CopyResult(
+                *_duckdb().copy_insert(
+                    table_name, columns, csv_data, conflict_columns, where_clause, params, max_column, conn
+                )
+            )
+        record_insert(table_name, "copy", result.rows_attempted, result.rows_inserted)
+        return result
+
+    column_list = ", ".join(columns)
+    staging_table = f"{table_name}_staging"
+    where_sql = f"WHERE {where_clause}" if where_clause else ""
+
+    with _connection_or_pooled(conn) as conn, timer("db_insert_duration_seconds", method="copy"):
+        with conn.cursor() as cursor:
+            # emptied on commit, and explicitly in case an earlier load ran in the same open transaction
+            cursor.execute(
+                f"""
+                CREATE TEMP TABLE IF NOT EXISTS {staging_table}
+                (LIKE {table_name} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS;
+                TRUNCATE {staging_table};
+                """
+            )
+            try:
+                cursor.copy_expert(
+                    f"COPY {staging_table} ({column_list}) FROM STDIN WITH (FORMAT csv, HEADER true)",
+                    csv_data,
+                )
+                rows_copied = cursor.rowcount
+
+                rows_attempted, max_value, staged_min, staged_max = rows_copied, None, None, None
+                if where_clause or max_column:
+                    filter_sql = f"FILTER (WHERE {where_clause})" if where_clause else ""
+                    range_sql = (
+                        f"MAX({max_column}) {filter_sql}, MIN({max_column}), MAX({max_column})"
+                        if max_column
+                        else "NULL, NULL, NULL"
+                    )
+                    # the filter appears once per filtered aggregate, so its parameters are repeated to match
+                    aggregate_params = params * (2 if max_column else 1) if params else None
+                    cursor.execute(f"SELECT COUNT(*) {filter_sql}, {range_sql} FROM {staging_table};", aggregate_params)
+                    rows_attempted, max_value, staged_min, staged_max = cursor.fetchone()
+
+                cursor.execute(
+                    f"""
+                    INSERT INTO {table_name} ({column_list})
+                    SELECT {column_list} FROM {staging_table}
+                    {where_sql}
+                    ON CONFLICT ({", ".join(conflict_columns)}) DO NOTHING;
+                    """,
+                    params,
+                )
+                rows_inserted = cursor.rowcount
+                record_insert(table_name, "copy", rows_attempted, rows_inserted)
+                if rows_inserted < rows_attempted:
+                    logger.info(
+                        "Some rows were skipped due to conflicts. Attempted: %s, Inserted: %s",
+                        rows_attempted,
+                        rows_inserted,
+                    )
+            except Exception as e:
+                logger.error("Error during copy insert: %s", str(e))
+                raise
+
+    return CopyResult(rows_copied, rows_attempted, rows_inserted, max_value, staged_min, staged_max)
 
 
 def check_database_encoding() -> None:
@@ -89,6 +604,10 @@ def check_database_encoding() -> None:
 
 
 def create_currency_table() -> None:
+    if _using_duckdb():
+        _duckdb().create_object("currencies")
+        return
+
     query = """
     CREATE TABLE IF NOT EXISTS currencies (
         currency_code VARCHAR(3) PRIMARY KEY,
@@ -102,6 +621,10 @@ def create_currency_table() -> None:
 
 
 def create_currency_conversion_rates_table(base_currency: str) -> None:
+    if _using_duckdb():
+        _duckdb().create_object("currency_conversion_rates", base_currency=base_currency)
+        return
+
     query = f"""
     CREATE TABLE IF NOT EXISTS currency_conversion_rates_base_{base_currency} (
         currency_code VARCHAR(3) PRIMARY KEY,
@@ -118,8 +641,49 @@ def create_currency_conversion_rates_table(base_currency: str) -> None:
     logger.info("Currency conversion rates table created successfully.")
 
 
+def create_exchange_rates_table() -> None:
+    if _using_duckdb():
+        _duckdb().create_object("exchange_rates")
+        return
+
+    # Daily rate history for any base currency, one row per (base, currency, date) as published
+    query = """
+    CREATE TABLE IF NOT EXISTS exchange_rates (
+        base_currency VARCHAR(3) NOT NULL,
+        currency_code VARCHAR(3) NOT NULL,
+        rate_date DATE NOT NULL,
+        rate DECIMAL(32, 16) NOT NULL,
+        _inserted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (base_currency, currency_code, rate_date)
+    );
+    """
+    execute_query(query)
+    logger.info("Exchange rates table created successfully.")
+
+
 def create_item_prices_table() -> None:
+    """Create item_prices range partitioned by month on system_timestamp.
+
+    Queries bounded on system_timestamp only scan the months they cover. Rows outside every
+    monthly partition land in item_prices_default until ensure_item_prices_partitions moves them.
+    An item_prices table created before it was partitioned is migrated, its rows are copied into
+    the default partition.
+    """
+    if _using_duckdb():
+        _duckdb().create_object("item_prices")
+        return
+
     query = """
+    DO $$
+    BEGIN
+        IF EXISTS (SELECT 1 FROM pg_class WHERE oid = to_regclass('item_prices') AND relkind = 'r') THEN
+            ALTER TABLE item_prices RENAME TO item_prices_unpartitioned;
+            -- the name of its unique index is taken by the constraint of the partitioned table
+            ALTER TABLE item_prices_unpartitioned
+                RENAME CONSTRAINT unique_id_timestamp TO unique_id_timestamp_unpartitioned;
+        END IF;
+    END $$;
+
     CREATE TABLE IF NOT EXISTS item_prices (
         id UUID NOT NULL,
         item VARCHAR(100) NOT NULL,
@@ -129,25 +693,135 @@ def create_item_prices_table() -> None:
         updated_at TIMESTAMP WITH TIME ZONE NOT NULL,
         system_timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
         CONSTRAINT unique_id_timestamp UNIQUE (id, system_timestamp)
-    );
+    ) PARTITION BY RANGE (system_timestamp);
+
+    CREATE TABLE IF NOT EXISTS item_prices_default PARTITION OF item_prices DEFAULT;
+
+    -- Rows arrive roughly in system_timestamp order, so a BRIN index stays tiny and still lets range
+    -- scans skip most of each partition. The unique constraint is the B-tree for lookups by id.
+    CREATE INDEX IF NOT EXISTS idx_item_prices_system_timestamp_brin
+        ON item_prices USING BRIN (system_timestamp) WITH (pages_per_range = 32);
+
+    CREATE OR REPLACE FUNCTION create_item_prices_partition(month_start DATE) RETURNS void AS $$
+    DECLARE
+        partition_name TEXT := format('item_prices_%s', to_char(month_start, 'YYYY_MM'));
+        range_start TIMESTAMP WITH TIME ZONE := month_start::timestamp AT TIME ZONE 'UTC';
+        range_end TIMESTAMP WITH TIME ZONE := (month_start + INTERVAL '1 month')::timestamp AT TIME ZONE 'UTC';
+    BEGIN
+        IF to_regclass(partition_name) IS NOT NULL THEN
+            RETURN;
+        END IF;
+
+        -- Rows of this month that already landed in the default partition have to move out of it
+        -- before the new partition can be attached
+        EXECUTE format('CREATE TABLE %I (LIKE item_prices INCLUDING DEFAULTS)', partition_name);
+        EXECUTE format(
+            'WITH moved AS (DELETE FROM item_prices_default '
+            'WHERE system_timestamp >= %L AND system_timestamp < %L RETURNING *) '
+            'INSERT INTO %I SELECT * FROM moved',
+            range_start, range_end, partition_name
+        );
+        EXECUTE format(
+            'ALTER TABLE item_prices ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+            partition_name, range_start, range_end
+        );
+    END;
+    $$ LANGUAGE plpgsql;
+
+    CREATE OR REPLACE FUNCTION ensure_item_prices_partitions(months_ahead INTEGER) RETURNS INTEGER AS $$
+    DECLARE
+        month_start DATE;
+        created INTEGER := 0;
+    BEGIN
+        FOR month_start IN
+            SELECT generate_series(
+                date_trunc('month', now() AT TIME ZONE 'UTC'),
+                date_trunc('month', now() AT TIME ZONE 'UTC') + make_interval(months => months_ahead),
+                INTERVAL '1 month'
+            )::date
+            UNION
+            SELECT DISTINCT date_trunc('month', system_timestamp AT TIME ZONE 'UTC')::date
+            FROM item_prices_default
+        LOOP
+            IF to_regclass(format('item_prices_%s', to_char(month_start, 'YYYY_MM'))) IS NULL THEN
+                PERFORM create_item_prices_partition(month_start);
+                created := created + 1;
+            END IF;
+        END LOOP;
+        RETURN created;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    -- The triggers of the old table are dropped with it and recreated on the new one by the
+    -- database setup, which also refreshes the derived tables from the migrated rows
+    DO $$
+    BEGIN
+        IF to_regclass('item_prices_unpartitioned') IS NOT NULL THEN
+            INSERT INTO item_prices (id, item, price, currency, created_at, updated_at, system_timestamp)
+            SELECT id, item, price, currency, created_at, updated_at, system_timestamp
+            FROM item_prices_unpartitioned;
+            DROP TABLE item_prices_unpartitioned CASCADE;
+        END IF;
+    END $$;
     """
     execute_query(query)
     logger.info("Item prices table created successfully.")
 
 
+def _item_prices_is_unpartitioned() -> bool:
+    relkind = execute_query("SELECT relkind FROM pg_class WHERE oid = to_regclass('item_prices');")
+    return relkind is not None and any(kind == "r" for (kind,) in relkind)
+
+
+def migrate_item_prices() -> bool:
+    """Migrate an item_prices table created before it was partitioned, returning whether it was needed.
+
+    The migration drops the triggers of the old table, so the whole setup runs, which recreates them
+    and refreshes the derived tables from the migrated rows.
+    """
+    if _using_duckdb() or not _item_prices_is_unpartitioned():
+        return False
+
+    logger.warning("item_prices was created before it was partitioned, migrating it")
+    database_setup()
+    return True
+
+
+def ensure_item_prices_partitions(months_ahead: int = DEFAULT_PARTITION_MONTHS_AHEAD) -> int:
+    """Create the monthly partitions for the coming months and for any rows parked in the default partition."""
+    if _using_duckdb():
+        return 0  # DuckDB tables are not partitioned
+
+    if _item_prices_is_unpartitioned():
+        raise RuntimeError(
+            "item_prices was created before it was partitioned, run `python -m src.database_manager` to migrate it"
+        )
+    result = execute_query("SELECT ensure_item_prices_partitions(%s);", (months_ahead,))
+    created = result[0][0] if result else 0
+    if created:
+        logger.info("Created %s item_prices partitions", created)
+    return created
+
+
 def create_checkpoint_table() -> None:
+    if _using_duckdb():
+        _duckdb().create_object("processing_checkpoints")
+        return
+
     query = """
     CREATE TABLE IF NOT EXISTS processing_checkpoints (
-        checkpoint_name VARCHAR(50) PRIMARY KEY,
+        checkpoint_name VARCHAR(255) PRIMARY KEY,
         last_processed_timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
         updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
     );
+    -- per-file checkpoints are named after the file, which does not fit the original VARCHAR(50)
+    ALTER TABLE processing_checkpoints ALTER COLUMN checkpoint_name TYPE VARCHAR(255);
     """
     execute_query(query)
     logger.info("Checkpoint table created successfully.")
 
 
-def update_checkpoint(checkpoint_name: str, timestamp: str) -> None:
+def update_checkpoint(checkpoint_name: str, timestamp: str, conn: connection | None = None) -> None:
     query = """
     INSERT INTO processing_checkpoints (checkpoint_name, last_processed_timestamp, updated_at)
     VALUES (%s, %s, CURRENT_TIMESTAMP)
@@ -157,8 +831,22 @@ def update_checkpoint(checkpoint_name: str, timestamp: str) -> None:
     """
     # Log the exact timestamp being stored
     logger.info("Updating checkpoint '%s' with timestamp: %s", checkpoint_name, timestamp)
-    execute_query(query, (checkpoint_name, timestamp))
+    # Inside a caller's transaction the checkpoint only becomes visible together with the data it covers
+    execute_query(query, (checkpoint_name, timestamp), conn=conn, commit=conn is None)
     logger.info("Checkpoint '%s' updated successfully", checkpoint_name)
+    _record_checkpoint_lag(checkpoint_name, timestamp)
+
+
+def _record_checkpoint_lag(checkpoint_name: str, timestamp: str) -> None:
+    # How far the newest loaded row is behind the time it was loaded
+    try:
+        checkpointed = datetime.fromisoformat(timestamp)
+    except (TypeError, ValueError):
+        return
+    if checkpointed.tzinfo is None:
+        checkpointed = checkpointed.replace(tzinfo=UTC)
+    lag = (datetime.now(tz=UTC) - checkpointed).total_seconds()
+    set_gauge("checkpoint_lag_seconds", lag, checkpoint=checkpoint_name)
 
 
 def get_latest_checkpoint(checkpoint_name: str) -> str | None:
@@ -174,90 +862,346 @@ def get_latest_checkpoint(checkpoint_name: str) -> str | None:
     return result[0][0], result[0][0].isoformat()  # Return ISO formatted timestamp string that pandas can parse
 
 
-def create_nok_prices_view() -> None:
+def create_ingestion_manifest_table() -> None:
+    if _using_duckdb():
+        _duckdb().create_object("ingestion_manifest")
+        return
+
+    query = """
+    CREATE TABLE IF NOT EXISTS ingestion_manifest (
+        file_path TEXT PRIMARY KEY,
+        file_size BIGINT NOT NULL,
+        file_mtime_ns BIGINT NOT NULL,
+        content_hash CHAR(64) NOT NULL,
+        row_count BIGINT NOT NULL,
+        min_system_timestamp TIMESTAMP WITH TIME ZONE,
+        max_system_timestamp TIMESTAMP WITH TIME ZONE,
+        ingested_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+    );
+    """
+    execute_query(query)
+    logger.info("Ingestion manifest table created successfully.")
+
+
+def create_nok_prices_as_of_view() -> None:
+    """Create a view converting every transaction at the NOK rate that was valid when it happened.
+
+    The as-of join picks the latest rate published on or before the transaction's day. LIMIT 1 over
+    the exchange_rates primary key (base_currency, currency_code, rate_date) turns that into one
+    backward index probe per transaction instead of scanning the currency's whole rate history.
+    """
+    if _using_duckdb():
+        _duckdb().create_object("transaction_prices_in_nok_as_of")
+        return
+
     query = """
-    CREATE OR REPLACE VIEW transaction_prices_in_nok AS
-    WITH latest_rates AS (
-        SELECT 
-            ip.id, 
-            ip.item, 
-            ip.price as original_price, 
-            ip.currency as original_currency, 
-            rate as latest_rate, 
-            last_updated_at as rate_valid_date, 
-            ip.created_at, 
-            ip.updated_at,
-            ip.system_timestamp
-        FROM item_prices as ip
-        LEFT JOIN currency_conversion_rates_base_nok as cr 
+    CREATE OR REPLACE VIEW transaction_prices_in_nok_as_of AS
+    SELECT
+        ip.id,
+        ip.system_timestamp,
+        ip.item,
+        ip.price AS original_price,
+        ip.currency AS original_currency,
+        er.rate,
+        er.rate_date,
+        ROUND(ip.price / er.rate, 2) AS price_in_nok
+    FROM item_prices AS ip
+    LEFT JOIN LATERAL (
+        SELECT rate, rate_date
+        FROM exchange_rates
+        WHERE base_currency = 'NOK'
+            AND currency_code = ip.currency
+            AND rate_date <= (ip.system_timestamp AT TIME ZONE 'UTC')::date
+        ORDER BY rate_date DESC
+        LIMIT 1
+    ) AS er ON true;
+    """
+    execute_query(query)
+    logger.info("NOK as-of prices view created successfully.")
+
+
+def drop_legacy_view(view_name: str) -> str:
+    # Older databases still have some of the derived tables as views, which DROP TABLE refuses to drop
+    return f"""
+    DO $$
+    BEGIN
+        IF EXISTS (SELECT 1 FROM pg_views WHERE viewname = '{view_name}') THEN
+            DROP VIEW {view_name};
+        END IF;
+    END $$;
+    """
+
+
+def create_nok_prices_table() -> None:
+    """Create transaction_prices_in_nok as a table kept up to date by triggers.
+
+    New item_prices rows are converted as they are inserted, and rate changes in
+    currency_conversion_rates_base_nok only rewrite the rows in the affected currencies. Both
+    triggers are statement level and work on transition tables, so a batch costs one set-based
+    statement instead of one per row.
+    """
+    if _using_duckdb():
+        _duckdb().create_object("transaction_prices_in_nok")
+        return
+
+    query = """
+    CREATE TABLE IF NOT EXISTS transaction_prices_in_nok (
+        id UUID NOT NULL,
+        system_timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
+        item VARCHAR(100) NOT NULL,
+        original_price DECIMAL(10, 2) NOT NULL,
+        original_currency VARCHAR(3) NOT NULL,
+        latest_rate DECIMAL(32, 16),
+        rate_valid_date DATE,
+        price_in_nok DECIMAL(20, 2),
+        PRIMARY KEY (id, system_timestamp)
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_transaction_prices_in_nok_currency
+        ON transaction_prices_in_nok (original_currency);
+
+    CREATE OR REPLACE FUNCTION convert_new_item_prices_to_nok() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO transaction_prices_in_nok
+        (id, system_timestamp, item, original_price, original_currency, latest_rate, rate_valid_date, price_in_nok)
+        SELECT
+            ip.id,
+            ip.system_timestamp,
+            ip.item,
+            ip.price,
+            ip.currency,
+            cr.rate,
+            cr.last_updated_at,
+            ROUND(ip.price / cr.rate, 2)
+        FROM new_item_prices AS ip
+        LEFT JOIN currency_conversion_rates_base_nok AS cr
             ON cr.currency_code = ip.currency
-    ),
-    calculate_converted_price AS (
-        SELECT 
-            id, 
-            item, 
-            original_price, 
-            original_currency, 
-            latest_rate, 
-            rate_valid_date,
-            ROUND(original_price / latest_rate, 2) as price_in_nok
-        FROM latest_rates
-        ORDER BY id, system_timestamp
-    )
-    SELECT * FROM calculate_converted_price;
+        ON CONFLICT (id, system_timestamp) DO NOTHING;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    CREATE OR REPLACE FUNCTION reconvert_nok_prices_for_new_rates() RETURNS trigger AS $$
+    BEGIN
+        UPDATE transaction_prices_in_nok AS tp
+        SET
+            latest_rate = cr.rate,
+            rate_valid_date = cr.last_updated_at,
+            price_in_nok = ROUND(tp.original_price / cr.rate, 2)
+        FROM new_rates AS cr
+        WHERE tp.original_currency = cr.currency_code
+            AND (tp.latest_rate IS DISTINCT FROM cr.rate OR tp.rate_valid_date IS DISTINCT FROM cr.last_updated_at);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    DROP TRIGGER IF EXISTS item_prices_to_nok ON item_prices;
+    CREATE TRIGGER item_prices_to_nok
+        AFTER INSERT ON item_prices
+        REFERENCING NEW TABLE AS new_item_prices
+        FOR EACH STATEMENT EXECUTE FUNCTION convert_new_item_prices_to_nok();
+
+    -- transition tables need one trigger per event
+    DROP TRIGGER IF EXISTS nok_rates_inserted ON currency_conversion_rates_base_nok;
+    CREATE TRIGGER nok_rates_inserted
+        AFTER INSERT ON currency_conversion_rates_base_nok
+        REFERENCING NEW TABLE AS new_rates
+        FOR EACH STATEMENT EXECUTE FUNCTION reconvert_nok_prices_for_new_rates();
+
+    DROP TRIGGER IF EXISTS nok_rates_updated ON currency_conversion_rates_base_nok;
+    CREATE TRIGGER nok_rates_updated
+        AFTER UPDATE ON currency_conversion_rates_base_nok
+        REFERENCING NEW TABLE AS new_rates
+        FOR EACH STATEMENT EXECUTE FUNCTION reconvert_nok_prices_for_new_rates();
+    """
+    execute_query(drop_legacy_view("transaction_prices_in_nok"))
+    execute_query(query)
+    refresh_nok_prices_table()
+    logger.info("NOK prices table created successfully.")
+
+
+def refresh_nok_prices_table() -> None:
+    # Full rebuild, only needed for rows that were loaded before the triggers existed
+    query = """
+    INSERT INTO transaction_prices_in_nok
+    (id, system_timestamp, item, original_price, original_currency, latest_rate, rate_valid_date, price_in_nok)
+    SELECT
+        ip.id,
+        ip.system_timestamp,
+        ip.item,
+        ip.price,
+        ip.currency,
+        cr.rate,
+        cr.last_updated_at,
+        ROUND(ip.price / cr.rate, 2)
+    FROM item_prices AS ip
+    LEFT JOIN currency_conversion_rates_base_nok AS cr
+        ON cr.currency_code = ip.currency
+    ON CONFLICT (id, system_timestamp) DO UPDATE SET
+        latest_rate = EXCLUDED.latest_rate,
+        rate_valid_date = EXCLUDED.rate_valid_date,
+        price_in_nok = EXCLUDED.price_in_nok;
+    """
+    execute_query(query)
+
+
+def reconcile_nok_prices() -> None:
+    """Reconvert the NOK prices that were converted with a rate that has changed since.
+
+    A batch of item_prices committed while the rates were being updated in another transaction is
+    converted with the rates its statement saw, and neither trigger revisits it afterwards.
+    """
+    if _using_duckdb():
+        # the NOK prices are a view in DuckDB and always use the current rates
+        return
+
+    query = """
+    UPDATE transaction_prices_in_nok AS tp
+    SET
+        latest_rate = cr.rate,
+        rate_valid_date = cr.last_updated_at,
+        price_in_nok = ROUND(tp.original_price / cr.rate, 2)
+    FROM currency_conversion_rates_base_nok AS cr
+    WHERE tp.original_currency = cr.currency_code
+        AND (tp.latest_rate IS DISTINCT FROM cr.rate OR tp.rate_valid_date IS DISTINCT FROM cr.last_updated_at);
     """
     execute_query(query)
-    logger.info("NOK prices view created successfully.")
+    logger.info("NOK prices reconciled with the current rates.")
 
 
-# If I was to prepare this data for forecasting, then a scd2 view/table like this would be my approach
+# If I was to prepare this data for forecasting, then a scd2 table like this would be my approach
 # Then I would fetch all historical data for exchange rates and get proper historical data for the prices
-# But that would be too much and a bit overkill for this case I think.
-def create_item_prices_scd2_view() -> None:
+def create_item_prices_scd2_table() -> None:
+    """Create item_prices_scd2 as a table that a trigger on item_prices keeps up to date.
+
+    Each insert statement adds the new versions and then relinks ``valid_to`` / ``is_current`` only
+    for the ids it touched, starting at the version just before the earliest new one. Versions that
+    arrive out of order are therefore slotted into the right place, and the cost of a batch depends
+    on the ids in it rather than on the size of the history.
+    """
+    if _using_duckdb():
+        _duckdb().create_object("item_prices_scd2")
+        return
+
     query = """
-    CREATE OR REPLACE VIEW item_prices_scd2 AS
-    WITH ranked_changes AS (
-        SELECT 
-            id,
-            item,
-            price,
-            currency,
-            created_at,
-            updated_at,
-            system_timestamp as valid_from,
-            LEAD(system_timestamp) OVER (
-                PARTITION BY id 
-                ORDER BY system_timestamp
-            ) as valid_to
-        FROM item_prices
-    )
-    SELECT 
+    CREATE TABLE IF NOT EXISTS item_prices_scd2 (
+        id UUID NOT NULL,
+        item VARCHAR(100) NOT NULL,
+        price DECIMAL(10, 2) NOT NULL,
+        currency VARCHAR(3) NOT NULL,
+        created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+        updated_at TIMESTAMP WITH TIME ZONE NOT NULL,
+        valid_from TIMESTAMP WITH TIME ZONE NOT NULL,
+        valid_to TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT '9999-12-31',
+        is_current BOOLEAN NOT NULL DEFAULT false,
+        -- also serves "price of id X at time T": WHERE id = X AND valid_from <= T ORDER BY valid_from DESC LIMIT 1
+        PRIMARY KEY (id, valid_from)
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_item_prices_scd2_current
+        ON item_prices_scd2 (id) WHERE is_current;
+
+    CREATE OR REPLACE FUNCTION maintain_item_prices_scd2() RETURNS trigger AS $$
+    BEGIN
+        -- new versions start out closed, the relink below decides which one is current
+        INSERT INTO item_prices_scd2 (id, item, price, currency, created_at, updated_at, valid_from)
+        SELECT id, item, price, currency, created_at, updated_at, system_timestamp
+        FROM new_item_prices
+        ON CONFLICT (id, valid_from) DO NOTHING;
+
+        WITH affected AS (
+            SELECT id, MIN(system_timestamp) AS first_new_version
+            FROM new_item_prices
+            GROUP BY id
+        ),
+        relinked AS (
+            SELECT
+                s.id,
+                s.valid_from,
+                LEAD(s.valid_from) OVER (PARTITION BY s.id ORDER BY s.valid_from) AS next_valid_from
+            FROM item_prices_scd2 AS s
+            JOIN affected AS a ON a.id = s.id
+            WHERE s.valid_from >= COALESCE(
+                (
+                    SELECT MAX(p.valid_from)
+                    FROM item_prices_scd2 AS p
+                    WHERE p.id = a.id AND p.valid_from < a.first_new_version
+                ),
+                a.first_new_version
+            )
+        )
+        UPDATE item_prices_scd2 AS s
+        SET
+            valid_to = COALESCE(r.next_valid_from, '9999-12-31'),
+            is_current = r.next_valid_from IS NULL
+        FROM relinked AS r
+        WHERE s.id = r.id
+            AND s.valid_from = r.valid_from
+            AND (s.valid_to, s.is_current)
+                IS DISTINCT FROM (COALESCE(r.next_valid_from, '9999-12-31'), r.next_valid_from IS NULL);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    DROP TRIGGER IF EXISTS item_prices_to_scd2 ON item_prices;
+    CREATE TRIGGER item_prices_to_scd2
+        AFTER INSERT ON item_prices
+        REFERENCING NEW TABLE AS new_item_prices
+        FOR EACH STATEMENT EXECUTE FUNCTION maintain_item_prices_scd2();
+    """
+    execute_query(drop_legacy_view("item_prices_scd2"))
+    execute_query(query)
+    refresh_item_prices_scd2_table()
+    logger.info("Item prices SCD2 table created successfully.")
+
+
+def refresh_item_prices_scd2_table() -> None:
+    # Full rebuild, only needed for rows that were loaded before the trigger existed
+    query = """
+    INSERT INTO item_prices_scd2
+    (id, item, price, currency, created_at, updated_at, valid_from, valid_to, is_current)
+    SELECT
         id,
         item,
         price,
         currency,
         created_at,
         updated_at,
-        valid_from,
-        COALESCE(valid_to, '9999-12-31'::timestamp with time zone) as valid_to,
-        CASE 
-            WHEN valid_to IS NULL THEN true 
-            ELSE false 
-        END as is_current
-    FROM ranked_changes
-    ORDER BY id, valid_from;
+        system_timestamp,
+        COALESCE(next_valid_from, '9999-12-31'),
+        next_valid_from IS NULL
+    FROM (
+        SELECT
+            *,
+            LEAD(system_timestamp) OVER (PARTITION BY id ORDER BY system_timestamp) AS next_valid_from
+        FROM item_prices
+    ) AS versions
+    ON CONFLICT (id, valid_from) DO UPDATE SET
+        valid_to = EXCLUDED.valid_to,
+        is_current = EXCLUDED.is_current;
     """
     execute_query(query)
-    logger.info("Item prices SCD2 view created successfully.")
 
 
 def reset_database() -> None:
     """Drop and recreate all tables."""
+    if _using_duckdb():
+        _duckdb().reset_database()
+        return
+
     queries = [
-        "DROP VIEW IF EXISTS transaction_prices_in_nok CASCADE;",
+        drop_legacy_view("transaction_prices_in_nok"),
+        "DROP TABLE IF EXISTS transaction_prices_in_nok CASCADE;",
+        drop_legacy_view("item_prices_scd2"),
+        "DROP TABLE IF EXISTS item_prices_scd2 CASCADE;",
+        "DROP VIEW IF EXISTS transaction_prices_in_nok_as_of CASCADE;",
         "DROP TABLE IF EXISTS processing_checkpoints CASCADE;",
+        "DROP TABLE IF EXISTS ingestion_manifest CASCADE;",
         "DROP TABLE IF EXISTS item_prices CASCADE;",
+        "DROP FUNCTION IF EXISTS ensure_item_prices_partitions(INTEGER);",
+        "DROP FUNCTION IF EXISTS create_item_prices_partition(DATE);",
         "DROP TABLE IF EXISTS currency_conversion_rates_base_NOK CASCADE;",
+        "DROP TABLE IF EXISTS exchange_rates CASCADE;",
         "DROP TABLE IF EXISTS currencies CASCADE;",
     ]
 
@@ -269,9 +1213,14 @@ def database_setup() -> None:
     # check_database_encoding() # used this to make sure the currency symbols would look right in the db.
     create_currency_table()  # this table must be created first because of foreign key constraint
     create_currency_conversion_rates_table("NOK")
+    create_exchange_rates_table()
     create_item_prices_table()
+    ensure_item_prices_partitions()
     create_checkpoint_table()
-    create_nok_prices_view()
+    create_ingestion_manifest_table()
+    create_nok_prices_table()
+    create_item_prices_scd2_table()
+    create_nok_prices_as_of_view()
 
 
 def main() -> None:
@@ -279,6 +1228,8 @@ def main() -> None:
         database_setup()
     except Exception:
         logger.exception("Database setup failed")
+    finally:
+        close_connection_pool()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,168 @@
+import json
+import logging
+import os
+import threading
+from contextlib import AbstractContextManager, nullcontext
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any, NamedTuple
+
+import psycopg2
+from psycopg2.extensions import connection
+
+from src.database_manager import batch_insert, close_connection_pool, savepoint, storage_backend
+from src.metrics import increment
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DEAD_LETTER_DIR = Path(__file__).parent.parent / "dead_letters"
+DEAD_LETTER_FILE_NAME = "rejected_rows.jsonl"
+
+_spool_lock = threading.Lock()
+
+
+class InsertOutcome(NamedTuple):
+    rows_inserted: int
+    # positions in params_list of the rows that were rejected and spooled
+    rejected: list[int]
+
+
+def dead_letter_dir() -> Path | None:
+    directory = os.getenv("DEAD_LETTER_DIR", str(DEFAULT_DEAD_LETTER_DIR))
+    return Path(directory) if directory else None
+
+
+def _row_errors() -> tuple[type[BaseException], ...]:
+    # Errors caused by the values of a row. Anything else, such as a lost connection, fails the whole
+    # batch again on every half and is left to the caller.
+    if storage_backend() == "duckdb":
+        import duckdb
+
+        return duckdb.DataError, duckdb.IntegrityError
+    return psycopg2.DataError, psycopg2.IntegrityError
+
+
+def _attempt(conn: connection | None) -> AbstractContextManager:
+    # Inside a transaction a failed statement aborts everything, a savepoint limits it to this attempt
+    return savepoint(conn, "bisect") if conn is not None else nullcontext()
+
+
+def spool_rejected_rows(
+    query: str, template: str | None, rejected: list[tuple[tuple[Any, ...], BaseException]], directory: Path
+) -> None:
+    failed_at = datetime.now(tz=UTC).isoformat()
+    lines = [
+        json.dumps(
+            {
+                "failed_at": failed_at,
+                "query": query,
+                "template": template,
+                "params": list(params),
+                "error": f"{type(error).__name__}: {str(error).strip()}",
+            },
+            default=str,
+        )
+        for params, error in rejected
+    ]
+    directory.mkdir(parents=True, exist_ok=True)
+    with _spool_lock, open(directory / DEAD_LETTER_FILE_NAME, "a", encoding="utf-8") as spool:
+        spool.write("\n".join(lines) + "\n")
+
+
+def insert_isolating_failures(
+    query: str,
+    params_list: list[tuple[Any, ...]],
+    template: str | None = None,
+    conn: connection | None = None,
+    page_size: int = 100,
+) -> InsertOutcome:
+    """``batch_insert`` that bisects a batch failing on bad rows and spools those rows instead of losing the batch.
+
+    A failing batch is split in halves until the rows that fail on their own are found, which takes
+    about k * log2(n) round trips for k bad rows in a batch of n. All other rows are inserted and the
+    rejected ones are appended, with their error, to the dead-letter file for ``replay_dead_letters``.
+    Without a dead-letter directory (``DEAD_LETTER_DIR`` set empty) the error is raised as before.
+    """
+    directory = dead_letter_dir()
+    if directory is None:
+        return InsertOutcome(batch_insert(query, params_list, template=template, conn=conn, page_size=page_size), [])
+
+    row_errors = _row_errors()
+    rejected: list[tuple[int, tuple[Any, ...], BaseException]] = []
+
+    def insert(start: int, end: int) -> int:
+        try:
+            with _attempt(conn):
+                return batch_insert(query, params_list[start:end], template=template, conn=conn, page_size=page_size)
+        except row_errors as e:
+            if end - start == 1:
+                rejected.append((start, params_list[start], e))
+                return 0
+        middle = (start + end) // 2
+        return insert(start, middle) + insert(middle, end)
+
+    rows_inserted = insert(0, len(params_list))
+    if rejected:
+        logger.error(
+            "Rejected %s of %s rows, spooled to %s: %s",
+            len(rejected),
+            len(params_list),
+            directory / DEAD_LETTER_FILE_NAME,
+            rejected[0][2],
+        )
+        spool_rejected_rows(query, template, [(params, error) for _, params, error in rejected], directory)
+        increment("dead_letter_rows_total", len(rejected))
+    return InsertOutcome(rows_inserted, [position for position, _, _ in rejected])
+
+
+def replay_dead_letters(directory: Path | None = None) -> tuple[int, int]:
+    """Insert the spooled rows again, returning ``(rows_replayed, rows_rejected_again)``.
+
+    The file is moved aside first, so rows that still fail are spooled to a fresh file and rows that
+    get rejected while the replay runs are not lost. A replay that was interrupted left its file
+    behind and it is picked up again, the inserts are idempotent.
+    """
+    directory = directory or dead_letter_dir()
+    if directory is None:
+        return 0, 0
+
+    spool_path = directory / DEAD_LETTER_FILE_NAME
+    with _spool_lock:
+        if spool_path.exists():
+            spool_path.rename(directory / f"replaying-{datetime.now(tz=UTC).strftime('%Y%m%dT%H%M%S%fZ')}.jsonl")
+    replay_paths = sorted(directory.glob("replaying-*.jsonl"))
+    if not replay_paths:
+        logger.info("No dead letters to replay")
+        return 0, 0
+
+    batches: dict[tuple[str, str | None], list[tuple[Any, ...]]] = {}
+    for replay_path in replay_paths:
+        with open(replay_path, encoding="utf-8") as spool:
+            for line in spool:
+                if line.strip():
+                    letter = json.loads(line)
+                    batches.setdefault((letter["query"], letter["template"]), []).append(tuple(letter["params"]))
+
+    rows_replayed = 0
+    rows_rejected = 0
+    for (query, template), params_list in batches.items():
+        outcome = insert_isolating_failures(query, params_list, template=template)
+        rows_replayed += len(params_list) - len(outcome.rejected)
+        rows_rejected += len(outcome.rejected)
+
+    for replay_path in replay_paths:
+        replay_path.unlink()
+    logger.info("Replayed %s dead letters, %s were rejected again", rows_replayed, rows_rejected)
+    return rows_replayed, rows_rejected
+
+
+def main() -> None:
+    try:
+        replay_dead_letters()
+    finally:
+        close_connection_pool()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    main()
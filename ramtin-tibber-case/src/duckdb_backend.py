@@ -0,0 +1,375 @@
+import io
+import logging
+import os
+import re
+import threading
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import IO, Any
+
+import duckdb
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DUCKDB_PATH = Path(__file__).parent.parent / "tibber.duckdb"
+BATCH_RELATION = "batch_rows"
+CSV_RELATION = "csv_rows"
+
+_connection: duckdb.DuckDBPyConnection | None = None
+_connection_pid: int | None = None
+_connection_lock = threading.Lock()
+
+# DuckDB has neither triggers nor partitioning. The tables PostgreSQL keeps up to date with triggers
+# are plain views here, computed with vectorized scans whenever they are queried.
+SCHEMA = {
+    "currencies": """
+    CREATE TABLE IF NOT EXISTS currencies (
+        currency_code VARCHAR(3) PRIMARY KEY,
+        currency_name VARCHAR(50) NOT NULL,
+        currency_symbol VARCHAR(10) NOT NULL,
+        _inserted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    """,
+    "currency_conversion_rates": """
+    CREATE TABLE IF NOT EXISTS currency_conversion_rates_base_{base_currency} (
+        currency_code VARCHAR(3) PRIMARY KEY REFERENCES currencies (currency_code),
+        rate DECIMAL(32, 16) NOT NULL,
+        last_updated_at DATE NOT NULL,
+        _inserted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    """,
+    "exchange_rates": """
+    CREATE TABLE IF NOT EXISTS exchange_rates (
+        base_currency VARCHAR(3) NOT NULL,
+        currency_code VARCHAR(3) NOT NULL,
+        rate_date DATE NOT NULL,
+        rate DECIMAL(32, 16) NOT NULL,
+        _inserted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (base_currency, currency_code, rate_date)
+    );
+    """,
+    "item_prices": """
+    CREATE TABLE IF NOT EXISTS item_prices (
+        id UUID NOT NULL,
+        item VARCHAR(100) NOT NULL,
+        price DECIMAL(10, 2) NOT NULL,
+        currency VARCHAR(3) NOT NULL,
+        created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+        updated_at TIMESTAMP WITH TIME ZONE NOT NULL,
+        system_timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
+        CONSTRAINT unique_id_timestamp UNIQUE (id, system_timestamp)
+    );
+    """,
+    "processing_checkpoints": """
+    CREATE TABLE IF NOT EXISTS processing_checkpoints (
+        checkpoint_name VARCHAR(255) PRIMARY KEY,
+        last_processed_timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
+        updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+    );
+    """,
+    "ingestion_manifest": """
+    CREATE TABLE IF NOT EXISTS ingestion_manifest (
+        file_path TEXT PRIMARY KEY,
+        file_size BIGINT NOT NULL,
+        file_mtime_ns BIGINT NOT NULL,
+        content_hash CHAR(64) NOT NULL,
+        row_count BIGINT NOT NULL,
+        min_system_timestamp TIMESTAMP WITH TIME ZONE,
+        max_system_timestamp TIMESTAMP WITH TIME ZONE,
+        ingested_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+    );
+    """,
+    # DuckDB divides decimals in DOUBLE, so a price exactly on a half cent can round differently
+    # than in PostgreSQL
+    "transaction_prices_in_nok": """
+    CREATE OR REPLACE VIEW transaction_prices_in_nok AS
+    SELECT
+        ip.id,
+        ip.system_timestamp,
+        ip.item,
+        ip.price AS original_price,
+        ip.currency AS original_currency,
+        cr.rate AS latest_rate,
+        cr.last_updated_at AS rate_valid_date,
+        CAST(ROUND(ip.price / cr.rate, 2) AS DECIMAL(20, 2)) AS price_in_nok
+    FROM item_prices AS ip
+    LEFT JOIN currency_conversion_rates_base_nok AS cr
+        ON cr.currency_code = ip.currency;
+    """,
+    "item_prices_scd2": """
+    CREATE OR REPLACE VIEW item_prices_scd2 AS
+    SELECT
+        id,
+        item,
+        price,
+        currency,
+        created_at,
+        updated_at,
+        system_timestamp AS valid_from,
+        COALESCE(next_valid_from, TIMESTAMPTZ '9999-12-31') AS valid_to,
+        next_valid_from IS NULL AS is_current
+    FROM (
+        SELECT
+            *,
+            LEAD(system_timestamp) OVER (PARTITION BY id ORDER BY system_timestamp) AS next_valid_from
+        FROM item_prices
+    ) AS versions;
+    """,
+    "transaction_prices_in_nok_as_of": """
+    CREATE OR REPLACE VIEW transaction_prices_in_nok_as_of AS
+    SELECT
+        ip.id,
+        ip.system_timestamp,
+        ip.item,
+        ip.price AS original_price,
+        ip.currency AS original_currency,
+        er.rate,
+        er.rate_date,
+        CAST(ROUND(ip.price / er.rate, 2) AS DECIMAL(20, 2)) AS price_in_nok
+    FROM item_prices AS ip
+    ASOF LEFT JOIN (
+        SELECT currency_code, rate_date, rate
+        FROM exchange_rates
+        WHERE base_currency = 'NOK'
+    ) AS er
+        ON er.currency_code = ip.currency
+        AND CAST(timezone('UTC', ip.system_timestamp) AS DATE) >= er.rate_date;
+    """,
+}
+
+# Dependents first, so every object can be dropped without CASCADE
+DROP_STATEMENTS = [
+    "DROP VIEW IF EXISTS transaction_prices_in_nok_as_of;",
+    "DROP VIEW IF EXISTS item_prices_scd2;",
+    "DROP VIEW IF EXISTS transaction_prices_in_nok;",
+    "DROP TABLE IF EXISTS processing_checkpoints;",
+    "DROP TABLE IF EXISTS ingestion_manifest;",
+    "DROP TABLE IF EXISTS item_prices;",
+    "DROP TABLE IF EXISTS currency_conversion_rates_base_nok;",
+    "DROP TABLE IF EXISTS exchange_rates;",
+    "DROP TABLE IF EXISTS currencies;",
+]
+
+
+def duckdb_path() -> str:
+    return os.getenv("DUCKDB_PATH", str(DEFAULT_DUCKDB_PATH))
+
+
+def get_connection() -> duckdb.DuckDBPyConnection:
+    """Return the process-wide database, opened on first use and again after a fork."""
+    global _connection, _connection_pid
+
+    with _connection_lock:
+        if _connection is None or _connection_pid != os.getpid():
+            _connection, _connection_pid = duckdb.connect(duckdb_path()), os.getpid()
+            logger.info("Opened DuckDB database %s", duckdb_path())
+        return _connection
+
+
+def close_connection() -> None:
+    global _connection, _connection_pid
+
+    with _connection_lock:
+        if _connection is not None and _connection_pid == os.getpid():
+            _connection.close()
+        _connection, _connection_pid = None, None
+
+
+@contextmanager
+def cursor() -> Iterator[duckdb.DuckDBPyConnection]:
+    # A DuckDB connection must not be shared between threads, each caller gets a cursor of its own
+    connection = get_connection()
+    with _connection_lock:
+        database_cursor = connection.cursor()
+    try:
+        yield database_cursor
+    finally:
+        database_cursor.close()
+
+
+@contextmanager
+def transaction() -> Iterator[duckdb.DuckDBPyConnection]:
+    with cursor() as database_cursor:
+        database_cursor.begin()
+        try:
+            yield database_cursor
+        except BaseException:
+            database_cursor.rollback()
+            raise
+        database_cursor.commit()
+
+
+def _cursor_or_own(conn: duckdb.DuckDBPyConnection | None):
+    return nullcontext(conn) if conn is not None else cursor()
+
+
+# PostgreSQL spellings in the pipeline's queries that DuckDB parses differently
+SQL_TRANSLATIONS = [
+    # the epoch-microseconds timestamps of RowFeed, a BIGINT times an INTERVAL overflows in DuckDB
+    (re.compile(r"%s \* INTERVAL '1 microsecond'"), "to_microseconds(%s)"),
+    # DuckDB binds a bare CURRENT_TIMESTAMP in ON CONFLICT DO UPDATE SET as a column name
+    (re.compile(r"=\s*CURRENT_TIMESTAMP\b"), "= now()"),
+]
+
+
+def to_duckdb_sql(query: str) -> str:
+    for pattern, replacement in SQL_TRANSLATIONS:
+        query = pattern.sub(replacement, query)
+    # psycopg2 placeholders to DuckDB's positional parameters
+    return query.replace("%s", "?")
+
+
+def _returns_rows(query: str) -> bool:
+    # DuckDB answers INSERT, UPDATE and DELETE with a row count, psycopg2 callers expect no rows
+    statement = query.split(None, 1)[0].upper() if query.strip() else ""
+    return statement in ("SELECT", "WITH", "SHOW", "VALUES", "DESCRIBE") or bool(
+        re.search(r"\bRETURNING\b", query, re.IGNORECASE)
+    )
+
+
+def execute_query(
+    query: str,
+    params: tuple[Any, ...] | None = None,
+    conn: duckdb.DuckDBPyConnection | None = None,
+    commit: bool = True,
+) -> list[tuple] | None:
+    with _cursor_or_own(conn) as database_cursor:
+        database_cursor.execute(to_duckdb_sql(query), params)
+        rows = database_cursor.fetchall() if _returns_rows(query) else None
+        if conn is not None and commit:
+            database_cursor.commit()
+        return rows
+
+
+def stream_chunks(
+    query: str,
+    params: tuple[Any, ...] | None,
+    fetch_size: int,
+    as_rows: bool,
+    conn: duckdb.DuckDBPyConnection | None = None,
+) -> Iterator[list[tuple] | pa.Table]:
+    """The chunks of database_manager.stream_query, fetched from DuckDB's streaming result."""
+    with _cursor_or_own(conn) as database_cursor:
+        database_cursor.execute(to_duckdb_sql(query), params)
+        if as_rows:
+            while rows := database_cursor.fetchmany(fetch_size):
+                yield rows
+            return
+        # to_arrow_reader replaces fetch_record_batch in newer DuckDB releases
+        arrow_reader = getattr(database_cursor, "to_arrow_reader", None) or database_cursor.fetch_record_batch
+        for batch in arrow_reader(fetch_size):
+            yield pa.Table.from_batches([batch])
+
+
+def batch_insert(
+    query: str,
+    params_list: list[tuple[Any, ...]],
+    template: str | None = None,
+    conn: duckdb.DuckDBPyConnection | None = None,
+) -> int:
+    """Insert ``params_list`` with one ``INSERT ... SELECT`` over the rows as an Arrow table.
+
+    Like execute_values, the ``VALUES`` part of ``query`` is replaced by ``template``, whose
+    placeholders are bound to the columns of the Arrow table in order, so expressions such as
+    casts in the template are evaluated once per column instead of once per row.
+    """
+    width = len(params_list[0])
+    column_names = [f"c{index}" for index in range(width)]
+    rows = pa.table([pa.array(list(column)) for column in zip(*params_list, strict=True)], names=column_names)
+
+    template = to_duckdb_sql(template or f"({', '.join(['%s'] * width)})")
+    placeholders = iter(column_names)
+    select_list = re.sub(r"\?", lambda _: next(placeholders), template.strip()[1:-1])
+
+    insert_into = query.split("VALUES")[0].strip()
+    on_conflict = ""
+    if "ON CONFLICT" in query:
+        on_conflict = f"ON CONFLICT {to_duckdb_sql(query.split('ON CONFLICT')[1]).strip().rstrip(';')}"
+    sql = f"{insert_into} SELECT {select_list} FROM {BATCH_RELATION} {on_conflict}"
+
+    with _cursor_or_own(conn) as database_cursor:
+        database_cursor.register(BATCH_RELATION, rows)
+        try:
+            result = database_cursor.execute(sql).fetchall()
+        finally:
+            database_cursor.unregister(BATCH_RELATION)
+    return len(result) if _returns_rows(sql) else result[0][0]
+
+
+def _binary_stream(csv_data: IO) -> IO[bytes]:
+    if isinstance(csv_data, io.TextIOWrapper):
+        return csv_data.buffer
+    if isinstance(csv_data, io.TextIOBase):
+        return io.BytesIO(csv_data.read().encode("utf-8"))
+    return csv_data
+
+
+def copy_insert(
+    table_name: str,
+    columns: Sequence[str],
+    csv_data: IO,
+    conflict_columns: Sequence[str],
+    where_clause: str | None = None,
+    params: tuple[Any, ...] | None = None,
+    max_column: str | None = None,
+    conn: duckdb.DuckDBPyConnection | None = None,
+) -> tuple[int, int, int, Any, Any, Any]:
+    """The DuckDB counterpart of database_manager.copy_insert, returning the fields of its CopyResult.
+
+    The CSV is streamed through pyarrow into a typed staging table and merged from there with the
+    same statements as in PostgreSQL.
+    """
+    column_list = ", ".join(columns)
+    staging_table = f"{table_name}_staging"
+    where_sql = f"WHERE {to_duckdb_sql(where_clause)}" if where_clause else ""
+    reader = pa_csv.open_csv(
+        _binary_stream(csv_data),
+        convert_options=pa_csv.ConvertOptions(
+            column_types=dict.fromkeys(columns, pa.string()), include_columns=list(columns)
+        ),
+    )
+
+    with _cursor_or_own(conn) as database_cursor:
+        database_cursor.execute(
+            f"CREATE OR REPLACE TEMP TABLE {staging_table} AS SELECT {column_list} FROM {table_name} LIMIT 0;"
+        )
+        database_cursor.register(CSV_RELATION, reader)
+        try:
+            database_cursor.execute(f"INSERT INTO {staging_table} SELECT {column_list} FROM {CSV_RELATION};")
+        finally:
+            database_cursor.unregister(CSV_RELATION)
+
+        filter_sql = f"FILTER ({where_sql})" if where_clause else ""
+        range_sql = "NULL, NULL, NULL"
+        if max_column:
+            range_sql = f"MAX({max_column}) {filter_sql}, MIN({max_column}), MAX({max_column})"
+        aggregate_params = params * (2 if max_column else 1) if where_clause and params else None
+        rows_copied, rows_attempted, max_value, staged_min, staged_max = database_cursor.execute(
+            f"SELECT COUNT(*), COUNT(*) {filter_sql}, {range_sql} FROM {staging_table};", aggregate_params
+        ).fetchone()
+
+        rows_inserted = database_cursor.execute(
+            f"""
+            INSERT INTO {table_name} ({column_list})
+            SELECT {column_list} FROM {staging_table}
+            {where_sql}
+            ON CONFLICT ({", ".join(conflict_columns)}) DO NOTHING;
+            """,
+            params if where_clause else None,
+        ).fetchone()[0]
+        database_cursor.execute(f"DROP TABLE {staging_table};")
+
+    return rows_copied, rows_attempted, rows_inserted, max_value, staged_min, staged_max
+
+
+def create_object(name: str, **format_args: str) -> None:
+    execute_query(SCHEMA[name].format(**format_args))
+    logger.info("DuckDB object %s created successfully.", name)
+
+
+def reset_database() -> None:
+    for query in DROP_STATEMENTS:
+        execute_query(query)
@@ -4,21 +4,20 @@ from typing import Any
 
 import requests
 
-from src.database_manager import batch_insert
+from src.currency_conversion import invalidate_rate_cache
+from src.dead_letter import insert_isolating_failures
+from src.rate_backfill import insert_exchange_rates, rates_to_rows
+from src.vatcomply_client import HTTP_OK, get_currencies_json, get_rates_json
 
 logger = logging.getLogger(__name__)
 
-HTTP_OK = 200
-REQUEST_TIMEOUT = 3
-
 
 def get_currencies() -> dict[str, dict[str, str]] | None:
-    url = "https://api.vatcomply.com/currencies"
     try:
-        response = requests.get(url, timeout=REQUEST_TIMEOUT)
+        response = get_currencies_json()
 
         if response.status_code == HTTP_OK:
-            return response.json()
+            return response.body
         logger.error("Request failed with status code %s", response.status_code)
         return None
     except requests.RequestException:
@@ -32,12 +31,11 @@ def get_currency_conversion_rates(currency_code: str, date: str | None = None) -
     if date is None:
         date = datetime.now(tz=UTC).date().strftime("%Y-%m-%d")
 
-    url = f"https://api.vatcomply.com/rates?base={currency_code}&date={date}"
     try:
-        response = requests.get(url, timeout=REQUEST_TIMEOUT)
+        response = get_rates_json(currency_code, date)
 
         if response.status_code == HTTP_OK:
-            return response.json()
+            return response.body
         logger.error("Request failed with status code %s", response.status_code)
         return None
     except requests.RequestException:
@@ -92,7 +90,7 @@ def insert_currencies() -> int:
 
             # Execute all inserts in the batch with a single database operation
             try:
-                batch_rows_inserted = batch_insert(query_template, params_list)
+                batch_rows_inserted = insert_isolating_failures(query_template, params_list).rows_inserted
                 inserted_count += batch_rows_inserted
                 logger.info("Batch inserted %s rows", batch_rows_inserted)
             except Exception:
@@ -149,26 +147,40 @@ def insert_rates(rates_data: dict[str, Any] | None = None) -> int:
                 params_list.append((currency_code, rate, date))
 
             try:
-                batch_rows_inserted = batch_insert(query_template, params_list)
+                batch_rows_inserted = insert_isolating_failures(query_template, params_list).rows_inserted
                 inserted_count += batch_rows_inserted
                 logger.info("Batch inserted %s rows", batch_rows_inserted)
             except Exception:
                 logger.exception("Error inserting batch")
 
         logger.info("Successfully stored/updated %s rates in the database.", inserted_count)
+        if inserted_count:
+            invalidate_rate_cache()
         return inserted_count
     except Exception:
         logger.exception("Error during rates insertion")
         return inserted_count
 
 
-def get_currencies_and_rates() -> None:
-    logger.info("Inserting currencies into the database...")
-    currency_count = insert_currencies()
-
+def update_latest_rates() -> int:
+    # Rates reference the currencies table, so they have to be inserted after the currencies
     logger.info("Inserting rates into the database...")
     rates = get_currency_conversion_rates("NOK")
     rates_count = insert_rates(rates)
+    if rates is not None:
+        # today's rates are also kept in the dated history used for point-in-time conversion, NOK is
+        # the anchor every cross rate is derived from when read, so no other base has to be fetched
+        try:
+            insert_exchange_rates(rates_to_rows(rates))
+        except Exception:
+            logger.exception("Error storing rates history")
+    return rates_count
+
+
+def get_currencies_and_rates() -> None:
+    logger.info("Inserting currencies into the database...")
+    currency_count = insert_currencies()
+    rates_count = update_latest_rates()
 
     logger.info(
         "Summary: Inserted/updated %s currencies and %s conversion rates.",
@@ -0,0 +1,123 @@
+import hashlib
+import logging
+import os
+from typing import NamedTuple
+
+from psycopg2.extensions import connection
+
+from src.database_manager import execute_query
+
+logger = logging.getLogger(__name__)
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+class ManifestEntry(NamedTuple):
+    file_path: str
+    file_size: int
+    file_mtime_ns: int
+    content_hash: str
+    row_count: int
+    min_system_timestamp: str | None
+    max_system_timestamp: str | None
+
+
+class FileFingerprint(NamedTuple):
+    file_size: int
+    file_mtime_ns: int
+
+
+def file_fingerprint(file_path: str) -> FileFingerprint:
+    stat_result = os.stat(file_path)
+    return FileFingerprint(stat_result.st_size, stat_result.st_mtime_ns)
+
+
+def compute_content_hash(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        while block := file.read(HASH_BLOCK_SIZE):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_manifest() -> dict[str, ManifestEntry]:
+    query = """
+    SELECT file_path, file_size, file_mtime_ns, content_hash, row_count,
+           min_system_timestamp, max_system_timestamp
+    FROM ingestion_manifest;
+    """
+    result = execute_query(query) or []
+    return {row[0]: ManifestEntry(*row) for row in result}
+
+
+def record_ingested_file(
+    file_path: str,
+    fingerprint: FileFingerprint,
+    content_hash: str,
+    row_count: int,
+    min_system_timestamp: str | None,
+    max_system_timestamp: str | None,
+    conn: connection | None = None,
+) -> None:
+    query = """
+    INSERT INTO ingestion_manifest
+    (file_path, file_size, file_mtime_ns, content_hash, row_count, min_system_timestamp, max_system_timestamp)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+    ON CONFLICT (file_path) DO UPDATE SET
+        file_size = EXCLUDED.file_size,
+        file_mtime_ns = EXCLUDED.file_mtime_ns,
+        content_hash = EXCLUDED.content_hash,
+        row_count = EXCLUDED.row_count,
+        min_system_timestamp = EXCLUDED.min_system_timestamp,
+        max_system_timestamp = EXCLUDED.max_system_timestamp,
+        ingested_at = CURRENT_TIMESTAMP;
+    """
+    execute_query(
+        query,
+        (
+            file_path,
+            fingerprint.file_size,
+            fingerprint.file_mtime_ns,
+            content_hash,
+            row_count,
+            min_system_timestamp,
+            max_system_timestamp,
+        ),
+        conn=conn,
+        commit=conn is None,
+    )
+    logger.info("Recorded %s in the ingestion manifest (%s rows)", file_path, row_count)
+
+
+def _touch_manifest_entry(file_path: str, fingerprint: FileFingerprint) -> None:
+    query = "UPDATE ingestion_manifest SET file_mtime_ns = %s WHERE file_path = %s;"
+    execute_query(query, (fingerprint.file_mtime_ns, file_path))
+
+
+def is_already_ingested(file_path: str, manifest: dict[str, ManifestEntry]) -> bool:
+    entry = manifest.get(file_path)
+    if entry is None:
+        return False
+
+    fingerprint = file_fingerprint(file_path)
+    if fingerprint.file_size != entry.file_size:
+        return False
+    if fingerprint.file_mtime_ns == entry.file_mtime_ns:
+        return True
+
+    # Same size but touched since it was loaded: only hash the contents to tell a rewrite from a touch
+    if compute_content_hash(file_path) != entry.content_hash:
+        return False
+
+    _touch_manifest_entry(file_path, fingerprint)
+    return True
+
+
+def filter_new_files(file_paths: list[str], manifest: dict[str, ManifestEntry]) -> list[str]:
+    new_files = []
+    for file_path in file_paths:
+        if is_already_ingested(file_path, manifest):
+            logger.info("Skipping %s, already ingested and unchanged", file_path)
+        else:
+            new_files.append(file_path)
+    return new_files
@@ -0,0 +1,80 @@
+import logging
+from collections.abc import Iterable
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from src.database_manager import stream_query
+
+logger = logging.getLogger(__name__)
+
+
+def key_hashes(ids: Iterable[Any], system_timestamps: Iterable[Any]) -> np.ndarray:
+    """64-bit hashes of (id, system_timestamp) keys, the same for a parsed chunk and for rows read from the table."""
+    # The database returns uuid.UUID and datetime objects, a parsed chunk strings and datetime64
+    ids = pd.Series(np.asarray(ids, dtype=object)).astype(str).str.lower()
+    if not isinstance(system_timestamps, pd.Series):
+        system_timestamps = pd.Series(list(system_timestamps))
+    timestamps = pd.to_datetime(system_timestamps, utc=True).dt.as_unit("us").astype("int64")
+    keys = pd.DataFrame({"id": ids.to_numpy(), "system_timestamp": timestamps.to_numpy()})
+    return pd.util.hash_pandas_object(keys, index=False).to_numpy()
+
+
+class KeyIndex:
+    """The keys known to be in item_prices, kept as a sorted array of their 64-bit hashes.
+
+    At 8 bytes per key an index of millions of keys stays small. A hash collision would make a new
+    row look loaded, but with ten million keys that chance is below 10^-12 per row.
+    Keys written inside a transaction are held as pending until it commits.
+    """
+
+    def __init__(self, hashes: np.ndarray | None = None) -> None:
+        self._hashes = np.unique(hashes) if hashes is not None else np.empty(0, dtype=np.uint64)
+        self._pending: list[np.ndarray] = []
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def new_rows(self, hashes: np.ndarray) -> np.ndarray:
+        """Mask of the rows whose key is not in the index and did not already occur earlier in ``hashes``."""
+        positions = np.searchsorted(self._hashes, hashes)
+        known = self._hashes[np.minimum(positions, len(self._hashes) - 1)] == hashes if len(self._hashes) else False
+        first_occurrence = np.zeros(len(hashes), dtype=bool)
+        first_occurrence[np.unique(hashes, return_index=True)[1]] = True
+        return first_occurrence & ~known
+
+    def add(self, hashes: np.ndarray) -> None:
+        if len(hashes):
+            self._hashes = np.union1d(self._hashes, hashes)
+
+    def add_pending(self, hashes: np.ndarray) -> None:
+        self._pending.append(hashes)
+
+    def commit_pending(self) -> None:
+        if self._pending:
+            self.add(np.concatenate(self._pending))
+        self._pending = []
+
+    def discard_pending(self) -> None:
+        self._pending = []
+
+
+def seed_key_index(checkpoint_timestamp: str | None) -> KeyIndex:
+    """Build the index from the keys newer than the checkpoint.
+
+    Older rows are dropped by the checkpoint filter before they are ever inserted, so only newer keys
+    can meet a duplicate: rows of a file that was interrupted, or loaded under its own checkpoint.
+    """
+    if checkpoint_timestamp is None:
+        return KeyIndex()
+
+    # streamed in chunks, the rows of a large backlog are never held at once
+    query = "SELECT id, system_timestamp FROM item_prices WHERE system_timestamp > %s;"
+    hashes = [
+        key_hashes(chunk["id"], chunk["system_timestamp"])
+        for chunk in stream_query(query, (checkpoint_timestamp,), output="pandas")
+    ]
+    index = KeyIndex(np.concatenate(hashes) if hashes else None)
+    logger.info("Seeded the key index with %s keys newer than %s", len(index), checkpoint_timestamp)
+    return index
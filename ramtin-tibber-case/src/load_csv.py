@@ -1,13 +1,63 @@
 import logging
+import multiprocessing
+import os
+import queue
 import re
+import threading
+import time
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import AbstractContextManager, nullcontext
+from datetime import datetime
 from pathlib import Path
+from typing import Any, NamedTuple, TypedDict, TypeVar
 
+import numpy as np
 import pandas as pd
-
-from src.database_manager import batch_insert, get_latest_checkpoint, update_checkpoint
+import pyarrow as pa
+from psycopg2.extensions import connection
+
+from src.csv_schema import iter_item_prices_batches, read_item_prices_table, to_data_frame
+from src.database_manager import (
+    copy_insert,
+    create_ingestion_manifest_table,
+    ensure_item_prices_partitions,
+    get_latest_checkpoint,
+    migrate_item_prices,
+    savepoint,
+    storage_backend,
+    transaction,
+    update_checkpoint,
+)
+from src.dead_letter import insert_isolating_failures
+from src.ingestion_manifest import (
+    compute_content_hash,
+    file_fingerprint,
+    filter_new_files,
+    load_manifest,
+    record_ingested_file,
+)
+from src.key_index import KeyIndex, key_hashes, seed_key_index
+from src.metrics import REGISTRY, increment, observe, timer
+from src.parquet_archive import archive_chunk, archive_csv_file
+from src.row_feed import RowFeed, arrow_csv_buffer
 
 logger = logging.getLogger(__name__)
 
+CHECKPOINT_NAME = "item_prices_ingestion"
+ITEM_PRICES_COLUMNS = ["id", "item", "price", "currency", "created_at", "updated_at", "system_timestamp"]
+ITEM_PRICES_CONFLICT_COLUMNS = ["id", "system_timestamp"]
+
+# "batch" sends parameterized INSERT batches, "copy" streams the data through COPY into a staging
+# table and merges it into item_prices with a single set-based INSERT ... SELECT.
+LOAD_MODES = ("batch", "copy")
+DEFAULT_CHUNK_SIZE = 100_000
+DEFAULT_BATCH_SIZE = 100
+# In transactional mode a file is one transaction, split into savepoints of this many rows
+DEFAULT_SAVEPOINT_SIZE = 1_000
+
+T = TypeVar("T")
+
 
 def natural_sort_key(s: str) -> list[str]:
     return [int(text) if text.isdigit() else text.lower() for text in re.split(r"(\d+)", s)]
@@ -28,20 +78,34 @@ def get_csv_files_in_order(directory: str = "data") -> list[str]:
     return [str(data_dir / file) for file in csv_files]
 
 
+def _timestamp_to_str(timestamp: Any) -> str:
+    return timestamp if isinstance(timestamp, str) else timestamp.isoformat()
+
+
+def _optional_timestamp_to_str(timestamp: Any) -> str | None:
+    return None if timestamp is None else _timestamp_to_str(timestamp)
+
+
+def _human_readable(timestamp: str) -> str:
+    return pd.Timestamp(timestamp).to_pydatetime().astimezone().strftime("%Y-%m-%d %H:%M:%S")
+
+
 def parse_csv_file(
     file_path: str, checkpoint_timestamp: str | None = None, human_readable_dt: str | None = None
 ) -> pd.DataFrame:
     logger.info("Parsing file: %s", file_path)
 
     try:
-        data_frame = pd.read_csv(file_path)
-
         if checkpoint_timestamp:
             logger.info("Filtering rows with system_timestamp > %s", human_readable_dt)
-            checkpoint_dt = pd.to_datetime(checkpoint_timestamp)
-            data_frame["system_timestamp"] = pd.to_datetime(data_frame["system_timestamp"])
-            original_count = len(data_frame)
-            data_frame = data_frame[data_frame["system_timestamp"] > checkpoint_dt]
+
+        with timer("csv_parse_duration_seconds", unit="file"):
+            original_count, table = read_item_prices_table(file_path, checkpoint_timestamp)
+            data_frame = to_data_frame(table)
+        increment("csv_rows_parsed_total", original_count)
+        increment("csv_rows_filtered_total", original_count - len(data_frame))
+
+        if checkpoint_timestamp:
             filtered_count = len(data_frame)
             logger.info(
                 "Filtered out %s rows, keeping %s rows",
@@ -56,78 +120,675 @@ def parse_csv_file(
         return pd.DataFrame()
 
 
-def insert_data_into_database(data_frame: pd.DataFrame) -> None:
+class CsvChunk(NamedTuple):
+    rows_parsed: int
+    min_timestamp: datetime | None
+    max_timestamp: datetime | None
+    data_frame: pd.DataFrame
+    table: pa.Table | None = None
+
+
+def iter_csv_chunks(
+    file_path: str, checkpoint_timestamp: str | None = None, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Iterator[CsvChunk]:
+    """Yield filtered chunks of roughly ``chunk_size`` rows, with the unfiltered row count and time range."""
+    batches = iter_item_prices_batches(file_path, checkpoint_timestamp, chunk_size)
+    while True:
+        started = time.perf_counter()
+        batch = next(batches, None)
+        if batch is None:
+            return
+        chunk = CsvChunk(
+            batch.rows_parsed, batch.min_timestamp, batch.max_timestamp, to_data_frame(batch.table), batch.table
+        )
+        observe("csv_parse_duration_seconds", time.perf_counter() - started, unit="chunk")
+        increment("csv_rows_parsed_total", chunk.rows_parsed)
+        increment("csv_rows_filtered_total", chunk.rows_parsed - len(chunk.data_frame))
+        yield chunk
+
+
+def _prefetch(iterable: Iterable[T], depth: int = 1) -> Iterator[T]:
+    """Produce items from ``iterable`` on a background thread, keeping at most ``depth`` items buffered.
+
+    This lets the next CSV chunk be read and parsed while the current one is being inserted, without
+    letting the reader run ahead of the database and grow memory.
+    """
+    buffer: queue.Queue = queue.Queue(maxsize=depth)
+    stopped = threading.Event()
+
+    def put(item: Any) -> bool:
+        while not stopped.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+        except BaseException as e:  # re-raised in the consuming thread
+            put(_PrefetchError(e))
+            return
+        put(_PREFETCH_DONE)
+
+    producer = threading.Thread(target=produce, name="csv-prefetch", daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _PREFETCH_DONE:
+                return
+            if isinstance(item, _PrefetchError):
+                raise item.error
+            yield item
+    finally:
+        stopped.set()
+        producer.join()
+
+
+class _PrefetchError:
+    def __init__(self, error: BaseException) -> None:
+        self.error = error
+
+
+_PREFETCH_DONE = object()
+
+
+def _sub_transaction(conn: connection | None) -> AbstractContextManager:
+    # A failed statement aborts the surrounding transaction, a savepoint limits the damage to one sub-batch
+    return savepoint(conn) if conn is not None else nullcontext()
+
+
+def _drop_known_keys(data_frame: pd.DataFrame, key_index: KeyIndex) -> tuple[pd.DataFrame, Any]:
+    hashes = key_hashes(data_frame["id"], data_frame["system_timestamp"])
+    new_rows = key_index.new_rows(hashes)
+    rows_skipped = len(data_frame) - int(new_rows.sum())
+    if rows_skipped:
+        logger.info(
+            "Some rows were skipped as known duplicates before sending. Rows: %s, Skipped: %s",
+            len(data_frame),
+            rows_skipped,
+        )
+        increment("db_rows_deduplicated_total", rows_skipped, table="item_prices")
+        data_frame, hashes = data_frame[new_rows], hashes[new_rows]
+    return data_frame, hashes
+
+
+def _insert_batches(
+    data_frame: pd.DataFrame,
+    conn: connection | None = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    key_index: KeyIndex | None = None,
+) -> tuple[int, int]:
+    """Insert ``data_frame`` in batches, returning ``(rows_inserted, batches_failed)``.
+
+    With ``key_index`` rows whose key is already loaded, or repeated within the frame, are dropped
+    before they are sent, and the keys of every batch that went through are added to the index.
+
+    Rows rejected for their values are spooled to the dead-letter file and do not fail their batch.
+    """
+    query_template = """
+    INSERT INTO item_prices
+    (id, item, price, currency, created_at, updated_at, system_timestamp)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+    ON CONFLICT (id, system_timestamp) DO NOTHING;
+    """
+
+    rows_inserted = 0
+    batches_failed = 0
+    if key_index is not None:
+        data_frame, hashes = _drop_known_keys(data_frame, key_index)
+    row_feed = RowFeed(data_frame, ITEM_PRICES_COLUMNS)
+
+    for batch_number, params_list in enumerate(row_feed.batches(batch_size)):
+        try:
+            with _sub_transaction(conn):
+                outcome = insert_isolating_failures(
+                    query_template, params_list, template=row_feed.template, conn=conn, page_size=batch_size
+                )
+            rows_inserted += outcome.rows_inserted
+            logger.info("Batch inserted %s rows", outcome.rows_inserted)
+        except Exception:
+            logger.exception("Error inserting batch")
+            batches_failed += 1
+            continue
+
+        if key_index is not None:
+            # In a transaction the keys only count as loaded once it commits
+            batch_hashes = hashes[batch_number * batch_size : (batch_number + 1) * batch_size]
+            batch_hashes = np.delete(batch_hashes, outcome.rejected)
+            if conn is None:
+                key_index.add(batch_hashes)
+            else:
+                key_index.add_pending(batch_hashes)
+
+    return rows_inserted, batches_failed
+
+
+def copy_arrow_table(data: pd.DataFrame | pa.Table) -> int:
+    result = copy_insert(
+        "item_prices",
+        ITEM_PRICES_COLUMNS,
+        arrow_csv_buffer(data, ITEM_PRICES_COLUMNS),
+        ITEM_PRICES_CONFLICT_COLUMNS,
+    )
+    logger.info(
+        "Copied %s rows into the database (%s skipped)",
+        result.rows_inserted,
+        result.rows_attempted - result.rows_inserted,
+    )
+    return result.rows_inserted
+
+
+def insert_data_into_database(
+    data_frame: pd.DataFrame, checkpoint_name: str | None = CHECKPOINT_NAME, key_index: KeyIndex | None = None
+) -> int:
     if data_frame.empty:
         logger.warning("No data to insert into database")
-        return
+        return 0
 
     try:
-        query_template = """
-        INSERT INTO item_prices
-        (id, item, price, currency, created_at, updated_at, system_timestamp)
-        VALUES (%s, %s, %s, %s, %s, %s, %s)
-        ON CONFLICT (id, system_timestamp) DO NOTHING;
-        """
-
-        batch_size = 100
-        rows_inserted = 0
-        latest_timestamp = None
+        rows_inserted, batches_failed = _insert_batches(data_frame, key_index=key_index)
+        logger.info("Successfully inserted %s rows into the database", rows_inserted)
 
-        for batch_df in [data_frame[i : i + batch_size] for i in range(0, len(data_frame), batch_size)]:
-            params_list = [tuple(row) for row in batch_df.values]
+        # A failed batch holds the checkpoint back so the rows are retried on the next run
+        if checkpoint_name and not batches_failed:
+            update_checkpoint(checkpoint_name, _timestamp_to_str(data_frame["system_timestamp"].max()))
+        return rows_inserted
 
-            try:
-                batch_rows_inserted = batch_insert(query_template, params_list)
-                rows_inserted += batch_rows_inserted
-                logger.info("Batch inserted %s rows", batch_rows_inserted)
+    except Exception:
+        logger.exception("Error inserting data into database")
+        return 0
 
-                batch_max_timestamp = batch_df["system_timestamp"].max()
-                if latest_timestamp is None or batch_max_timestamp > latest_timestamp:
-                    latest_timestamp = batch_max_timestamp
 
-            except Exception:
-                logger.exception("Error inserting batch")
+def copy_data_into_database(data_frame: pd.DataFrame, checkpoint_name: str | None = CHECKPOINT_NAME) -> int:
+    if data_frame.empty:
+        logger.warning("No data to insert into database")
+        return 0
 
+    try:
+        rows_inserted = copy_arrow_table(data_frame)
         logger.info("Successfully inserted %s rows into the database", rows_inserted)
 
-        if latest_timestamp is not None:
-            update_checkpoint(
-                "item_prices_ingestion",
-                latest_timestamp if isinstance(latest_timestamp, str) else latest_timestamp.isoformat(),
+        if checkpoint_name:
+            update_checkpoint(checkpoint_name, _timestamp_to_str(data_frame["system_timestamp"].max()))
+        return rows_inserted
+    except Exception:
+        logger.exception("Error copying data into database")
+        return 0
+
+
+class FileLoadResult(NamedTuple):
+    file_path: str
+    rows_inserted: int
+    latest_timestamp: str | None
+    succeeded: bool
+    rows_parsed: int = 0
+    min_timestamp: str | None = None
+    max_timestamp: str | None = None
+
+
+def copy_csv_file_into_database(
+    file_path: str,
+    checkpoint_timestamp: str | None = None,
+    checkpoint_name: str = CHECKPOINT_NAME,
+    conn: connection | None = None,
+    archive_dir: str | None = None,
+) -> FileLoadResult:
+    # The file is streamed to the server as-is; the checkpoint filter runs inside the merge statement
+    # so the CSV never has to be parsed on the client, unless it is archived.
+    logger.info("Copying file: %s", file_path)
+
+    try:
+        with open(file_path, encoding="utf-8") as csv_file, _sub_transaction(conn):
+            result = copy_insert(
+                "item_prices",
+                ITEM_PRICES_COLUMNS,
+                csv_file,
+                ITEM_PRICES_CONFLICT_COLUMNS,
+                where_clause="system_timestamp > %s" if checkpoint_timestamp else None,
+                params=(checkpoint_timestamp,) if checkpoint_timestamp else None,
+                max_column="system_timestamp",
+                conn=conn,
             )
 
+        increment("csv_rows_parsed_total", result.rows_copied)
+        increment("csv_rows_filtered_total", result.rows_copied - result.rows_attempted)
+        logger.info(
+            "Copied %s rows from %s, filtered out %s, inserted %s (%s skipped)",
+            result.rows_copied,
+            file_path,
+            result.rows_copied - result.rows_attempted,
+            result.rows_inserted,
+            result.rows_attempted - result.rows_inserted,
+        )
+
+        if archive_dir:
+            archive_csv_file(file_path, archive_dir, checkpoint_timestamp, DEFAULT_CHUNK_SIZE)
+
+        latest_timestamp = None
+        if result.max_value is not None:
+            latest_timestamp = result.max_value.isoformat()
+            update_checkpoint(checkpoint_name, latest_timestamp, conn=conn)
+        return FileLoadResult(
+            file_path,
+            result.rows_inserted,
+            latest_timestamp,
+            True,
+            result.rows_copied,
+            _optional_timestamp_to_str(result.staged_min),
+            _optional_timestamp_to_str(result.staged_max),
+        )
     except Exception:
-        logger.exception("Error inserting data into database")
+        logger.exception("Error copying file %s into database", file_path)
+        return FileLoadResult(file_path, 0, None, False)
+
+
+def stream_csv_file_into_database(
+    file_path: str,
+    checkpoint_timestamp: str | None = None,
+    human_readable_dt: str | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    checkpoint_name: str = CHECKPOINT_NAME,
+    conn: connection | None = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    archive_dir: str | None = None,
+    key_index: KeyIndex | None = None,
+) -> FileLoadResult:
+    """Parse, filter and insert ``file_path`` chunk by chunk, advancing the checkpoint once at the end.
+
+    At most three chunks are alive at any time (one being inserted, one buffered, one being parsed),
+    so memory use is bounded by ``chunk_size`` rather than by the size of the file.
+
+    Without ``conn`` every batch commits on its own. With ``conn`` all batches and the checkpoint are
+    written in the caller's transaction, each batch under its own savepoint.
+
+    With ``archive_dir`` every chunk is also written to the Parquet archive once it is inserted. A
+    chunk that fails to archive holds the checkpoint back like a failed batch.
+    """
+    logger.info("Streaming file: %s (chunks of %s rows)", file_path, chunk_size)
+    if checkpoint_timestamp:
+        logger.info("Filtering rows with system_timestamp > %s", human_readable_dt)
+
+    rows_parsed = 0
+    rows_kept = 0
+    rows_inserted = 0
+    latest_kept: datetime | None = None
+    min_timestamp: datetime | None = None
+    max_timestamp: datetime | None = None
+    succeeded = True
 
+    try:
+        chunks = _prefetch(iter_csv_chunks(file_path, checkpoint_timestamp, chunk_size))
+        for chunk_index, csv_chunk in enumerate(chunks):
+            chunk = csv_chunk.data_frame
+            rows_parsed += csv_chunk.rows_parsed
+            rows_kept += len(chunk)
+            if csv_chunk.min_timestamp is not None and csv_chunk.max_timestamp is not None:
+                if min_timestamp is None or csv_chunk.min_timestamp < min_timestamp:
+                    min_timestamp = csv_chunk.min_timestamp
+                if max_timestamp is None or csv_chunk.max_timestamp > max_timestamp:
+                    max_timestamp = csv_chunk.max_timestamp
+            if chunk.empty:
+                continue
+
+            chunk_rows_inserted, batches_failed = _insert_batches(chunk, conn, batch_size, key_index)
+            rows_inserted += chunk_rows_inserted
+            if batches_failed:
+                succeeded = False
+            if archive_dir:
+                archive_chunk(csv_chunk.table, archive_dir, file_path, chunk_index)
+            # Every kept row is newer than the checkpoint, so a chunk that kept any rows has the same
+            # maximum before and after filtering, and the reader already computed it.
+            if csv_chunk.max_timestamp is not None and (latest_kept is None or csv_chunk.max_timestamp > latest_kept):
+                latest_kept = csv_chunk.max_timestamp
+    except Exception:
+        logger.exception("Error reading file %s", file_path)
+        succeeded = False
+
+    logger.info("Parsed %s rows from %s", rows_parsed, file_path)
+    if checkpoint_timestamp:
+        logger.info("Filtered out %s rows, keeping %s rows", rows_parsed - rows_kept, rows_kept)
+    logger.info("Successfully inserted %s rows into the database", rows_inserted)
+
+    # A file with failed batches keeps its checkpoint, and the sequential load stops after it, so the
+    # whole file is replayed on the next run
+    latest_timestamp = _timestamp_to_str(latest_kept) if latest_kept is not None and succeeded else None
+    if latest_timestamp is not None:
+        update_checkpoint(checkpoint_name, latest_timestamp, conn=conn)
+    return FileLoadResult(
+        file_path,
+        rows_inserted,
+        latest_timestamp,
+        succeeded,
+        rows_parsed,
+        _optional_timestamp_to_str(min_timestamp),
+        _optional_timestamp_to_str(max_timestamp),
+    )
+
+
+def file_checkpoint_name(file_path: str) -> str:
+    return f"{CHECKPOINT_NAME}:{Path(file_path).name}"
+
+
+def _read_checkpoint(checkpoint_name: str) -> tuple[str | None, str | None]:
+    checkpoint_result = get_latest_checkpoint(checkpoint_name)
+    if not checkpoint_result:
+        return None, None
+
+    _, checkpoint_timestamp = checkpoint_result
+    return checkpoint_timestamp, _human_readable(checkpoint_timestamp)
+
+
+def _latest_of(*timestamps: str | None) -> str | None:
+    present = [timestamp for timestamp in timestamps if timestamp is not None]
+    if not present:
+        return None
+    return max(present, key=pd.Timestamp)
+
+
+def _load_file(
+    file_path: str,
+    mode: str,
+    chunk_size: int,
+    checkpoint_timestamp: str | None,
+    human_readable: str | None,
+    checkpoint_name: str = CHECKPOINT_NAME,
+    use_manifest: bool = False,
+    transactional: bool = False,
+    savepoint_size: int = DEFAULT_SAVEPOINT_SIZE,
+    archive_dir: str | None = None,
+    key_index: KeyIndex | None = None,
+) -> FileLoadResult:
+    if use_manifest:
+        # Fingerprint before reading, so a file that changes while it is loaded is picked up again next run
+        fingerprint = file_fingerprint(file_path)
+        content_hash = compute_content_hash(file_path)
+
+    # In transactional mode the rows, the checkpoint and the manifest entry of a file are committed
+    # together, so after a crash the checkpoint never points past data that was rolled back.
+    try:
+        with transaction() if transactional else nullcontext() as conn:
+            if mode == "copy":
+                result = copy_csv_file_into_database(
+                    file_path, checkpoint_timestamp, checkpoint_name, conn, archive_dir
+                )
+            else:
+                batch_size = savepoint_size if transactional else DEFAULT_BATCH_SIZE
+                result = stream_csv_file_into_database(
+                    file_path,
+                    checkpoint_timestamp,
+                    human_readable,
+                    chunk_size,
+                    checkpoint_name,
+                    conn,
+                    batch_size,
+                    archive_dir,
+                    key_index,
+                )
+
+            if use_manifest and result.succeeded:
+                record_ingested_file(
+                    file_path,
+                    fingerprint,
+                    content_hash,
+                    result.rows_parsed,
+                    result.min_timestamp,
+                    result.max_timestamp,
+                    conn,
+                )
+    except BaseException:
+        if key_index is not None:
+            key_index.discard_pending()
+        raise
+    if key_index is not None:
+        key_index.commit_pending()
+    return result
+
+
+def _init_worker(log_level: int) -> None:
+    logging.basicConfig(
+        level=log_level,
+        format="%(asctime)s - %(processName)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+
+def _load_file_in_worker(
+    file_path: str,
+    mode: str,
+    chunk_size: int,
+    global_checkpoint_timestamp: str | None,
+    use_manifest: bool = False,
+    transactional: bool = False,
+    savepoint_size: int = DEFAULT_SAVEPOINT_SIZE,
+    archive_dir: str | None = None,
+) -> FileLoadResult:
+    # Rows at or below the global high-water mark were committed by an earlier run. Rows at or below
+    # this file's own checkpoint were committed by an earlier, interrupted run of this same file.
+    checkpoint_name = file_checkpoint_name(file_path)
+    file_checkpoint_timestamp, _ = _read_checkpoint(checkpoint_name)
+    checkpoint_timestamp = _latest_of(global_checkpoint_timestamp, file_checkpoint_timestamp)
+    logger.info("Processing file %s with checkpoint: %s", file_path, checkpoint_timestamp)
+
+    result = _load_file(
+        file_path,
+        mode,
+        chunk_size,
+        checkpoint_timestamp,
+        checkpoint_timestamp,
+        checkpoint_name,
+        use_manifest,
+        transactional,
+        savepoint_size,
+        archive_dir,
+    )
+    return result._replace(latest_timestamp=_latest_of(result.latest_timestamp, file_checkpoint_timestamp))
+
+
+def _load_file_in_worker_process(parent_pid: int, *args: Any) -> tuple[FileLoadResult, dict | None]:
+    # A worker process has its own metrics registry, its values travel back with the result and are
+    # merged into the parent's. Anything a forked worker inherited from the parent is dropped first.
+    in_worker_process = os.getpid() != parent_pid
+    if in_worker_process:
+        REGISTRY.drain()
+    result = _load_file_in_worker(*args)
+    return result, REGISTRY.drain() if in_worker_process else None
+
+
+def load_csv_files_in_parallel(
+    file_paths: list[str],
+    mode: str = "batch",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    workers: int = 4,
+    use_manifest: bool = False,
+    transactional: bool = False,
+    savepoint_size: int = DEFAULT_SAVEPOINT_SIZE,
+    archive_dir: str | None = None,
+) -> bool:
+    """Load independent files concurrently in a process pool, returning whether every file was loaded.
+
+    Every file tracks its own progress in a per-file checkpoint. The global ``item_prices_ingestion``
+    checkpoint only advances across the contiguous prefix of files (in processing order) that have
+    completed successfully, so a resumed run never skips a file that was still in flight.
+    """
+    global_checkpoint_timestamp, _ = _read_checkpoint(CHECKPOINT_NAME)
+    high_water_mark = global_checkpoint_timestamp
+    results: dict[int, FileLoadResult] = {}
+    next_index = 0
+    blocked = False
+
+    # Spawned rather than forked: the other pipeline stages run on threads, and a forked child could
+    # inherit a lock one of them holds, such as the connection pool's, and wait on it forever
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(logging.getLogger().getEffectiveLevel(),),
+    ) as executor:
+        futures = {
+            executor.submit(
+                _load_file_in_worker_process,
+                os.getpid(),
+                file_path,
+                mode,
+                chunk_size,
+                global_checkpoint_timestamp,
+                use_manifest,
+                transactional,
+                savepoint_size,
+                archive_dir,
+            ): index
+            for index, file_path in enumerate(file_paths)
+        }
+
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                results[index], worker_metrics = future.result()
+                if worker_metrics is not None:
+                    REGISTRY.merge(worker_metrics)
+            except Exception:
+                logger.exception("Worker failed while loading %s", file_paths[index])
+                results[index] = FileLoadResult(file_paths[index], 0, None, False)
+
+            previous_high_water_mark = high_water_mark
+            while not blocked and next_index in results:
+                result = results[next_index]
+                if not result.succeeded:
+                    logger.error("Global checkpoint held back: %s did not complete", result.file_path)
+                    blocked = True
+                    break
+                high_water_mark = _latest_of(high_water_mark, result.latest_timestamp)
+                next_index += 1
+
+            if high_water_mark is not None and high_water_mark != previous_high_water_mark:
+                update_checkpoint(CHECKPOINT_NAME, high_water_mark)
+
+    rows_inserted = sum(result.rows_inserted for result in results.values())
+    logger.info("Parallel load inserted %s rows from %s files", rows_inserted, len(file_paths))
+    return all(result.succeeded for result in results.values())
+
+
+def _load_csv_files_sequentially(
+    file_paths: list[str],
+    mode: str,
+    chunk_size: int,
+    use_manifest: bool,
+    transactional: bool,
+    savepoint_size: int,
+    archive_dir: str | None = None,
+    deduplicate_keys: bool = False,
+) -> bool:
+    # The checkpoint is read once and then tracked in memory, since only this loop advances it
+    checkpoint_timestamp, human_readable = _read_checkpoint(CHECKPOINT_NAME)
+    # A copy merge runs on the server and never sends known keys twice anyway
+    key_index = seed_key_index(checkpoint_timestamp) if deduplicate_keys and mode == "batch" else None
+    for file_path in file_paths:
+        if checkpoint_timestamp:
+            logger.info("Processing file %s with checkpoint: %s", file_path, human_readable)
+        else:
+            logger.info("Processing file %s with no checkpoint", file_path)
+
+        result = _load_file(
+            file_path,
+            mode,
+            chunk_size,
+            checkpoint_timestamp,
+            human_readable,
+            use_manifest=use_manifest,
+            transactional=transactional,
+            savepoint_size=savepoint_size,
+            archive_dir=archive_dir,
+            key_index=key_index,
+        )
+        if not result.succeeded:
+            # A later file would advance the global checkpoint past the rows of this one, which
+            # then get filtered out when it is loaded again
+            logger.error("Stopping after %s did not complete, it is loaded again on the next run", file_path)
+            return False
+        checkpoint_timestamp = _latest_of(checkpoint_timestamp, result.latest_timestamp)
+        if checkpoint_timestamp is not None:
+            human_readable = _human_readable(checkpoint_timestamp)
+    return True
+
+
+class LoadOptions(TypedDict, total=False):
+    """The ``load_csv_files`` keyword arguments main reads from the environment."""
+
+    mode: str
+    workers: int
+    transactional: bool
+    archive_dir: str | None
+    deduplicate_keys: bool
+
+
+def load_csv_files(
+    mode: str = "batch",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    workers: int = 1,
+    use_manifest: bool = True,
+    transactional: bool = False,
+    savepoint_size: int = DEFAULT_SAVEPOINT_SIZE,
+    directory: str = "data",
+    archive_dir: str | None = None,
+    files: list[str] | None = None,
+    deduplicate_keys: bool = True,
+) -> bool:
+    """Load the new CSV files in ``directory``, or only ``files`` when given, into item_prices.
+
+    Errors are logged rather than raised, the return value tells whether every file was loaded.
+
+    With ``archive_dir`` the ingested rows are also kept in a Parquet dataset partitioned by date,
+    see src.parquet_archive. With ``deduplicate_keys`` a sequential batch load drops rows whose key
+    is already loaded before sending them, see src.key_index.
+    """
+    if mode not in LOAD_MODES:
+        raise ValueError(f"Unknown load mode {mode!r}, expected one of {LOAD_MODES}")
+    if storage_backend() == "duckdb":
+        if transactional:
+            raise ValueError("Transactional loads need savepoints, which DuckDB does not have")
+        if workers > 1:
+            # a DuckDB file can only be opened for writing by one process at a time
+            logger.warning("DuckDB loads files sequentially, ignoring workers=%s", workers)
+            workers = 1
 
-def load_csv_files() -> None:
     try:
-        logger.info("Starting CSV processing")
+        logger.info("Starting CSV processing (mode: %s)", mode)
 
-        file_paths = get_csv_files_in_order()
+        file_paths = files if files is not None else get_csv_files_in_order(directory)
         logger.info("Found %s CSV files to process", len(file_paths))
 
-        for file_path in file_paths:
-            # Get the latest checkpoint before processing each file
-            checkpoint_result = get_latest_checkpoint("item_prices_ingestion")
-            datetime_object = None
-            checkpoint_timestamp = None
-            human_readable = None
-
-            if checkpoint_result:
-                datetime_object, checkpoint_timestamp = checkpoint_result
-                human_readable = datetime_object.astimezone().strftime("%Y-%m-%d %H:%M:%S")
-                logger.info("Processing file %s with checkpoint: %s", file_path, human_readable)
-            else:
-                logger.info("Processing file %s with no checkpoint", file_path)
+        migrate_item_prices()
+        if use_manifest:
+            create_ingestion_manifest_table()
+            file_paths = filter_new_files(file_paths, load_manifest())
+            logger.info("%s CSV files are new or changed since the last run", len(file_paths))
 
-            data_frame = parse_csv_file(file_path, checkpoint_timestamp, human_readable)
-            if not data_frame.empty:
-                insert_data_into_database(data_frame)
+        if workers > 1 and len(file_paths) > 1:
+            loaded = load_csv_files_in_parallel(
+                file_paths, mode, chunk_size, workers, use_manifest, transactional, savepoint_size, archive_dir
+            )
+        else:
+            loaded = _load_csv_files_sequentially(
+                file_paths, mode, chunk_size, use_manifest, transactional, savepoint_size, archive_dir, deduplicate_keys
+            )
 
-        logger.info("CSV processing completed successfully")
+        # Rows older than the existing partitions landed in the default partition, this gives their
+        # months a partition of their own and prepares the coming months for the next run
+        ensure_item_prices_partitions()
     except Exception:
         logger.exception("Error during CSV processing")
+        return False
+
+    if loaded:
+        logger.info("CSV processing completed successfully")
+    else:
+        logger.error("CSV processing completed, but not every file was loaded")
+    return loaded
 
 
 def main() -> None:
@@ -1,18 +1,128 @@
+import argparse
 import logging
-from src.database_manager import reset_database, database_setup
-from src.load_csv import load_csv_files
-from src.get_currencies_and_rates import get_currencies_and_rates
+import os
+import signal
+import threading
+from datetime import UTC, date, datetime
 
+from src.database_manager import close_connection_pool, reconcile_nok_prices, reset_database, database_setup
+from src.load_csv import LoadOptions, load_csv_files
+from src.get_currencies_and_rates import insert_currencies, update_latest_rates
+from src.metrics import export_metrics
+from src.rate_backfill import backfill_exchange_rates
+from src.scheduler import Stage, run_stages
+from src.vatcomply_client import close_session
+from src.watcher import DEFAULT_INTERVAL_SECONDS, DEFAULT_RATES_REFRESH_SECONDS, run_daemon
 
-def main():
-    reset_choice = input("Do you want to reset the database? (Y/N): ").strip().upper()
 
-    if reset_choice == "Y":
-        reset_database()
-        database_setup()
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Tibber data pipeline")
+    reset = parser.add_mutually_exclusive_group()
+    reset.add_argument("--reset", action="store_true", default=None, help="reset the database without asking")
+    reset.add_argument("--no-reset", dest="reset", action="store_false", help="keep the database without asking")
+    parser.add_argument(
+        "--watch", action="store_true", help="keep running and ingest new or grown CSV files as they land"
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=float(os.getenv("WATCH_INTERVAL_SECONDS", DEFAULT_INTERVAL_SECONDS)),
+        help="seconds between two polls of the data directory in watch mode",
+    )
+    parser.add_argument(
+        "--rates-refresh-interval",
+        type=float,
+        default=float(os.getenv("WATCH_RATES_REFRESH_SECONDS", DEFAULT_RATES_REFRESH_SECONDS)),
+        help="seconds between two refreshes of the currencies and rates in watch mode",
+    )
+    parser.add_argument("--directory", default="data", help="directory of the CSV files, relative to the project")
+    return parser.parse_args(argv)
+
+
+def _reset_and_set_up() -> None:
+    reset_database()
+    database_setup()
+
+
+def _load_csv_files(**load_options) -> None:
+    # load_csv_files logs its errors, the stage has to fail for nok_prices to be skipped
+    if not load_csv_files(**load_options):
+        raise RuntimeError("Not every CSV file was loaded")
+
+
+def _backfill(backfill_start: str) -> None:
+    # one anchor currency is fetched per day, the NOK as-of conversion reads the rates of the NOK anchor
+    backfill_exchange_rates([os.getenv("RATES_BACKFILL_BASE", "NOK")], date.fromisoformat(backfill_start))
+
+
+def pipeline_stages(reset: bool, backfill_start: str | None, **load_options) -> list[Stage]:
+    """The stages of a one-shot run and what each needs to have finished first.
+
+    item_prices does not reference the currencies, so the network-bound API fetch overlaps the CSV
+    load. Only the NOK prices wait for both, to pick up rates that changed while files were loading.
+    """
+    after_setup = ("setup",) if reset else ()
+    stages = [Stage("setup", _reset_and_set_up)] if reset else []
+    stages += [
+        Stage("currencies", insert_currencies, after_setup),
+        Stage("rates", update_latest_rates, ("currencies",)),
+        Stage("csv_files", lambda: _load_csv_files(**load_options), after_setup),
+        Stage("nok_prices", reconcile_nok_prices, ("rates", "csv_files")),
+    ]
+    if backfill_start:
+        stages.append(Stage("backfill", lambda: _backfill(backfill_start), after_setup))
+    return stages
+
+
+def _stop_on_signals(stop: threading.Event) -> None:
+    def handle(signum, frame) -> None:
+        logging.getLogger(__name__).info("Received signal %s, stopping after the current cycle", signum)
+        stop.set()
+
+    signal.signal(signal.SIGINT, handle)
+    signal.signal(signal.SIGTERM, handle)
+
+
+def main(argv: list[str] | None = None):
+    args = parse_args(argv)
+    # Without --reset or --no-reset a one-shot run asks, a daemon never does
+    reset = args.reset
+    if reset is None:
+        reset = not args.watch and input("Do you want to reset the database? (Y/N): ").strip().upper() == "Y"
+    started_at = datetime.now(tz=UTC)
+    load_options: LoadOptions = {
+        "mode": os.getenv("CSV_LOAD_MODE", "batch"),
+        "workers": int(os.getenv("CSV_LOAD_WORKERS", "1")),
+        "transactional": os.getenv("CSV_LOAD_TRANSACTIONAL", "false").lower() in ("1", "true", "yes"),
+        "archive_dir": os.getenv("PARQUET_ARCHIVE_DIR") or None,
+        "deduplicate_keys": os.getenv("CSV_LOAD_DEDUPLICATE", "true").lower() in ("1", "true", "yes"),
+    }
+    backfill_start = os.getenv("RATES_BACKFILL_START")
+
+    try:
+        if not args.watch:
+            run_stages(pipeline_stages(reset, backfill_start, directory=args.directory, **load_options))
+            return
 
-    get_currencies_and_rates()
-    load_csv_files()
+        # The daemon refreshes the currencies and rates itself, on every rates refresh interval
+        if reset:
+            _reset_and_set_up()
+        if backfill_start:
+            _backfill(backfill_start)
+        stop = threading.Event()
+        _stop_on_signals(stop)
+        run_daemon(
+            args.directory,
+            args.interval,
+            args.rates_refresh_interval,
+            stop,
+            started_at=started_at,
+            **load_options,
+        )
+    finally:
+        close_session()
+        close_connection_pool()
+        export_metrics(started_at)
 
 
 if __name__ == "__main__":
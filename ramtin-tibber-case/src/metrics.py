@@ -0,0 +1,269 @@
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_METRICS_DIR = Path(__file__).parent.parent / "metrics"
+PROMETHEUS_FILE_NAME = "tibber_pipeline.prom"
+METRIC_PREFIX = "tibber_"
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Every metric the pipeline records, with its Prometheus type and help text
+METRICS = {
+    "vatcomply_requests_total": ("counter", "Requests to the vatcomply API by endpoint and outcome"),
+    "vatcomply_request_duration_seconds": ("histogram", "Latency of vatcomply requests sent over the network"),
+    "csv_parse_duration_seconds": ("histogram", "Time to read and parse a CSV file or chunk"),
+    "csv_rows_parsed_total": ("counter", "CSV rows read, before the checkpoint filter"),
+    "csv_rows_filtered_total": ("counter", "CSV rows dropped by the checkpoint filter"),
+    "db_query_duration_seconds": ("histogram", "execute_query latency by statement type"),
+    "db_insert_duration_seconds": ("histogram", "Latency of one batch insert or COPY merge"),
+    "db_rows_attempted_total": ("counter", "Rows sent to an insert"),
+    "db_rows_inserted_total": ("counter", "Rows inserted, the others were skipped by ON CONFLICT"),
+    "db_conflict_skip_ratio": ("gauge", "Share of attempted rows skipped by ON CONFLICT so far"),
+    "db_rows_deduplicated_total": ("counter", "Rows dropped as known duplicates before they were sent"),
+    "db_rows_streamed_total": ("counter", "Rows read through stream_query"),
+    "dead_letter_rows_total": ("counter", "Rows rejected by the database and spooled to the dead-letter file"),
+    "checkpoint_lag_seconds": ("gauge", "Age of a checkpoint's timestamp when it was last advanced"),
+    "parquet_archive_duration_seconds": ("histogram", "Time to write one chunk to the Parquet archive"),
+    "parquet_rows_archived_total": ("counter", "Rows written to the Parquet archive"),
+    "pipeline_stage_duration_seconds": ("histogram", "Wall time of each stage of the pipeline"),
+}
+
+LabelKey = tuple[tuple[str, str], ...]
+
+
+def _label_key(labels: dict[str, Any]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(labels: LabelKey, extra: tuple[str, str] | None = None) -> str:
+    pairs = [*labels, extra] if extra else list(labels)
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped, strict=True)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class MetricsRegistry:
+    """Counters, gauges and histograms for one process, safe to update from several threads."""
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters: dict[tuple[str, LabelKey], float] = {}
+        self._gauges: dict[tuple[str, LabelKey], float] = {}
+        # per series: the count of every bucket (not cumulative) followed by the +Inf count, sum, count and max
+        self._histograms: dict[tuple[str, LabelKey], list[float]] = {}
+
+    def increment(self, name: str, value: float = 1, **labels: Any) -> None:
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels: Any) -> None:
+        with self._lock:
+            self._gauges[(name, _label_key(labels))] = value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        key = (name, _label_key(labels))
+        bucket = next((index for index, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        with self._lock:
+            series = self._histograms.setdefault(key, [0.0] * (len(self.buckets) + 1) + [0.0, 0.0, -math.inf])
+            series[bucket] += 1
+            series[-3] += value
+            series[-2] += 1
+            series[-1] = max(series[-1], value)
+
+    def counter_value(self, name: str, **labels: Any) -> float:
+        with self._lock:
+            return self._counters.get((name, _label_key(labels)), 0)
+
+    def _snapshot_locked(self) -> dict[str, list]:
+        return {
+            "counters": [(name, labels, value) for (name, labels), value in self._counters.items()],
+            "gauges": [(name, labels, value) for (name, labels), value in self._gauges.items()],
+            "histograms": [(name, labels, list(series)) for (name, labels), series in self._histograms.items()],
+        }
+
+    def snapshot(self) -> dict[str, list]:
+        """Return the current values in a picklable form that ``merge`` accepts in another process."""
+        with self._lock:
+            return self._snapshot_locked()
+
+    def drain(self) -> dict[str, list]:
+        """Return the current values like ``snapshot`` and start over from zero."""
+        with self._lock:
+            snapshot = self._snapshot_locked()
+            self._counters, self._gauges, self._histograms = {}, {}, {}
+        return snapshot
+
+    def merge(self, snapshot: dict[str, list]) -> None:
+        with self._lock:
+            for name, labels, value in snapshot["counters"]:
+                key = (name, tuple(map(tuple, labels)))
+                self._counters[key] = self._counters.get(key, 0) + value
+            for name, labels, value in snapshot["gauges"]:
+                self._gauges[(name, tuple(map(tuple, labels)))] = value
+            for name, labels, other in snapshot["histograms"]:
+                key = (name, tuple(map(tuple, labels)))
+                if key not in self._histograms:
+                    self._histograms[key] = list(other)
+                    continue
+                series = self._histograms[key]
+                for index in range(len(other) - 1):
+                    series[index] += other[index]
+                series[-1] = max(series[-1], other[-1])
+
+    def to_prometheus_text(self) -> str:
+        snapshot = self.snapshot()
+        series_by_name: dict[str, list[str]] = {}
+
+        for name, labels, value in sorted(snapshot["counters"] + snapshot["gauges"]):
+            series_by_name.setdefault(name, []).append(
+                f"{METRIC_PREFIX}{name}{_format_labels(labels)} {_format_value(value)}"
+            )
+        for name, labels, series in sorted(snapshot["histograms"]):
+            lines = series_by_name.setdefault(name, [])
+            cumulative = 0.0
+            for bound, count in zip((*self.buckets, math.inf), series[:-3], strict=True):
+                cumulative += count
+                bucket_labels = _format_labels(labels, ("le", _format_value(bound)))
+                lines.append(f"{METRIC_PREFIX}{name}_bucket{bucket_labels} {_format_value(cumulative)}")
+            lines.append(f"{METRIC_PREFIX}{name}_sum{_format_labels(labels)} {_format_value(series[-3])}")
+            lines.append(f"{METRIC_PREFIX}{name}_count{_format_labels(labels)} {_format_value(series[-2])}")
+
+        output = []
+        for name in sorted(series_by_name):
+            metric_type, help_text = METRICS.get(name, ("untyped", name))
+            output.append(f"# HELP {METRIC_PREFIX}{name} {help_text}")
+            output.append(f"# TYPE {METRIC_PREFIX}{name} {metric_type}")
+            output.extend(series_by_name[name])
+        return "\n".join(output) + "\n"
+
+    def _quantile(self, series: list[float], quantile: float) -> float:
+        # interpolated within the bucket holding the quantile, like Prometheus' histogram_quantile
+        rank = quantile * series[-2]
+        cumulative = 0.0
+        lower = 0.0
+        for bound, count in zip((*self.buckets, math.inf), series[:-3], strict=True):
+            if count and cumulative + count >= rank:
+                upper = min(bound, series[-1])
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+            lower = bound
+        return series[-1]
+
+    def summary(self) -> dict[str, dict[str, Any]]:
+        snapshot = self.snapshot()
+        histograms = {}
+        for name, labels, series in snapshot["histograms"]:
+            histograms[f"{name}{_format_labels(labels)}"] = {
+                "count": int(series[-2]),
+                "sum": round(series[-3], 6),
+                "mean": round(series[-3] / series[-2], 6),
+                "p50": round(self._quantile(series, 0.5), 6),
+                "p95": round(self._quantile(series, 0.95), 6),
+                "max": round(series[-1], 6),
+            }
+        return {
+            "counters": {f"{name}{_format_labels(labels)}": value for name, labels, value in snapshot["counters"]},
+            "gauges": {f"{name}{_format_labels(labels)}": value for name, labels, value in snapshot["gauges"]},
+            "histograms": histograms,
+        }
+
+
+REGISTRY = MetricsRegistry()
+
+
+def increment(name: str, value: float = 1, **labels: Any) -> None:
+    REGISTRY.increment(name, value, **labels)
+
+
+def set_gauge(name: str, value: float, **labels: Any) -> None:
+    REGISTRY.set_gauge(name, value, **labels)
+
+
+def observe(name: str, value: float, **labels: Any) -> None:
+    REGISTRY.observe(name, value, **labels)
+
+
+@contextmanager
+def timer(name: str, **labels: Any) -> Iterator[None]:
+    """Observe how long the block took in the ``name`` histogram, also when it raises."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        REGISTRY.observe(name, time.perf_counter() - started, **labels)
+
+
+def record_insert(table: str, method: str, rows_attempted: int, rows_inserted: int) -> None:
+    REGISTRY.increment("db_rows_attempted_total", rows_attempted, table=table, method=method)
+    REGISTRY.increment("db_rows_inserted_total", rows_inserted, table=table, method=method)
+    attempted = REGISTRY.counter_value("db_rows_attempted_total", table=table, method=method)
+    inserted = REGISTRY.counter_value("db_rows_inserted_total", table=table, method=method)
+    if attempted:
+        REGISTRY.set_gauge("db_conflict_skip_ratio", 1 - inserted / attempted, table=table, method=method)
+
+
+def metrics_dir() -> Path | None:
+    directory = os.getenv("METRICS_DIR", str(DEFAULT_METRICS_DIR))
+    return Path(directory) if directory else None
+
+
+def _write_atomically(path: Path, text: str) -> None:
+    # A scraper or textfile collector reading the file never sees it half written
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as temp_file:
+            temp_file.write(text)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def export_metrics(started_at: datetime, directory: Path | None = None) -> Path | None:
+    """Write the Prometheus text file and a JSON summary of this run, returning the summary's path.
+
+    The .prom file is replaced on every run, ready for node_exporter's textfile collector, while
+    every run keeps its own ``run-<start time>.json``.
+    """
+    directory = directory or metrics_dir()
+    if directory is None:
+        return None
+
+    finished_at = datetime.now(tz=UTC)
+    summary_path = directory / f"run-{started_at.strftime('%Y%m%dT%H%M%SZ')}.json"
+    summary = {
+        "started_at": started_at.isoformat(),
+        "finished_at": finished_at.isoformat(),
+        "duration_seconds": round((finished_at - started_at).total_seconds(), 3),
+        **REGISTRY.summary(),
+    }
+    # Runs in the pipeline's finally block, so a failure here must not hide the pipeline's own error
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        _write_atomically(directory / PROMETHEUS_FILE_NAME, REGISTRY.to_prometheus_text())
+        _write_atomically(summary_path, json.dumps(summary, indent=2, sort_keys=True) + "\n")
+    except OSError:
+        logger.exception("Could not write metrics to %s", directory)
+        return None
+    logger.info("Wrote run metrics to %s", summary_path)
+    return summary_path
@@ -0,0 +1,109 @@
+import logging
+from collections.abc import Sequence
+from datetime import UTC, date, datetime
+from pathlib import Path
+from typing import Any
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.fs as pa_fs
+
+from src.csv_schema import TIMESTAMP_TYPE, iter_item_prices_batches
+from src.metrics import increment, timer
+
+logger = logging.getLogger(__name__)
+
+PARTITION_COLUMN = "system_date"
+PARTITIONING = ds.partitioning(pa.schema([pa.field(PARTITION_COLUMN, pa.date32())]), flavor="hive")
+COMPRESSION = "zstd"
+# Small enough that a time-range filter skips most of a day's file by its row-group statistics
+ROW_GROUP_SIZE = 64 * 1024
+
+
+def archive_chunk(table: pa.Table, directory: str | Path, file_name: str, chunk_index: int) -> int:
+    """Append one chunk of ``item_prices`` rows to the Parquet archive, partitioned by UTC date.
+
+    Files are named after the source CSV file, the chunk and the first and last ``system_timestamp``
+    in it. Replaying a file from the same checkpoint overwrites what it archived before instead of
+    duplicating it, while a reload of a grown file from a newer checkpoint writes files of its own.
+    """
+    if not table.num_rows:
+        return 0
+
+    # Sorted rows give every row group a narrow system_timestamp range in its statistics
+    table = table.sort_by("system_timestamp")
+    first, last = (_file_name_timestamp(table["system_timestamp"][index].as_py()) for index in (0, -1))
+    table = table.append_column(PARTITION_COLUMN, pc.cast(table["system_timestamp"], pa.date32()))
+    file_format = ds.ParquetFileFormat()
+
+    with timer("parquet_archive_duration_seconds"):
+        ds.write_dataset(
+            table,
+            str(directory),
+            format=file_format,
+            file_options=file_format.make_write_options(compression=COMPRESSION, write_statistics=True),
+            partitioning=PARTITIONING,
+            basename_template=f"{Path(file_name).stem}-{first}-{last}-{chunk_index}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+            min_rows_per_group=0,
+            max_rows_per_group=ROW_GROUP_SIZE,
+        )
+    increment("parquet_rows_archived_total", table.num_rows)
+    return table.num_rows
+
+
+def _file_name_timestamp(timestamp: datetime) -> str:
+    return timestamp.strftime("%Y%m%dT%H%M%S%fZ")
+
+
+def archive_csv_file(
+    file_path: str, directory: str | Path, checkpoint_timestamp: Any | None = None, chunk_size: int = 100_000
+) -> int:
+    """Archive the rows of ``file_path`` newer than the checkpoint, for loads that never parse the file."""
+    rows_archived = 0
+    for chunk_index, batch in enumerate(iter_item_prices_batches(file_path, checkpoint_timestamp, chunk_size)):
+        rows_archived += archive_chunk(batch.table, directory, file_path, chunk_index)
+    logger.info("Archived %s rows of %s to %s", rows_archived, file_path, directory)
+    return rows_archived
+
+
+def open_archive(directory: str | Path) -> ds.Dataset:
+    # Memory mapped, so scans read the column chunks straight from the page cache
+    return ds.dataset(
+        str(directory),
+        format="parquet",
+        partitioning=PARTITIONING,
+        filesystem=pa_fs.LocalFileSystem(use_mmap=True),
+    )
+
+
+def _utc_date(timestamp: datetime) -> date:
+    return timestamp.astimezone(UTC).date() if timestamp.tzinfo else timestamp.date()
+
+
+def _timestamp_scalar(timestamp: datetime) -> pa.Scalar:
+    return pa.scalar(timestamp.astimezone(UTC) if timestamp.tzinfo else timestamp, TIMESTAMP_TYPE)
+
+
+def read_archive(
+    directory: str | Path,
+    columns: Sequence[str] | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+) -> pa.Table:
+    """Read ``columns`` of the archived rows with ``start <= system_timestamp < end``.
+
+    Partitions outside the range are never opened, and within a partition row groups are skipped
+    by their statistics.
+    """
+    expression = ds.scalar(True)
+    if start is not None:
+        expression &= (ds.field("system_timestamp") >= _timestamp_scalar(start)) & (
+            ds.field(PARTITION_COLUMN) >= _utc_date(start)
+        )
+    if end is not None:
+        expression &= (ds.field("system_timestamp") < _timestamp_scalar(end)) & (
+            ds.field(PARTITION_COLUMN) <= _utc_date(end)
+        )
+    return open_archive(directory).to_table(columns=list(columns) if columns else None, filter=expression)
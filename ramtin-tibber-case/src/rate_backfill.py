@@ -0,0 +1,242 @@
+import asyncio
+import logging
+import random
+from collections.abc import Iterable, Iterator
+from datetime import UTC, date, datetime, timedelta
+from typing import Any, NamedTuple
+
+import requests
+
+from src.database_manager import batch_insert
+from src.vatcomply_client import HTTP_OK, ClientResponse, get_cached_rates_json, get_rates_json
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_REQUESTS_PER_SECOND = 10.0
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BACKOFF_SECONDS = 0.5
+MAX_BACKOFF_SECONDS = 30.0
+INSERT_BATCH_SIZE = 1_000
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+
+class BackfillResult(NamedTuple):
+    requests_made: int
+    requests_failed: int
+    rows_inserted: int
+
+
+class RateLimiter:
+    """Spaces out request starts so that all tasks together stay under ``requests_per_second``."""
+
+    def __init__(self, requests_per_second: float | None) -> None:
+        self._interval = 1 / requests_per_second if requests_per_second else 0.0
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        if not self._interval:
+            return
+
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            now = loop.time()
+            delay = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self._interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def date_range(start_date: date, end_date: date) -> Iterator[date]:
+    for offset in range((end_date - start_date).days + 1):
+        yield start_date + timedelta(days=offset)
+
+
+def _retry_delay(attempt: int, backoff_seconds: float, response: ClientResponse | None) -> float:
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after and retry_after.isdigit():
+        return float(retry_after)
+    # exponential backoff with jitter, so retries from concurrent tasks do not arrive in lockstep
+    return min(backoff_seconds * 2**attempt, MAX_BACKOFF_SECONDS) * random.uniform(1, 1.5)
+
+
+async def fetch_rates(
+    base_currency: str,
+    rate_date: date,
+    semaphore: asyncio.Semaphore,
+    limiter: RateLimiter,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    backoff_seconds: float = DEFAULT_BACKOFF_SECONDS,
+) -> dict[str, Any] | None:
+    # Days that are already cached cost neither a request nor a rate limiter slot
+    if (cached := get_cached_rates_json(base_currency, rate_date.isoformat())) is not None:
+        return cached
+
+    for attempt in range(max_retries + 1):
+        response = None
+        await limiter.wait()
+        async with semaphore:
+            try:
+                # requests is blocking, so each call runs on the default thread pool
+                response = await asyncio.to_thread(get_rates_json, base_currency, rate_date.isoformat())
+            except requests.RequestException as e:
+                logger.warning("Request for %s rates on %s failed: %s", base_currency, rate_date, e)
+
+        if response is not None:
+            if response.status_code == HTTP_OK:
+                return response.body
+            if response.status_code not in RETRYABLE_STATUS_CODES:
+                logger.error(
+                    "Request for %s rates on %s failed with status code %s",
+                    base_currency,
+                    rate_date,
+                    response.status_code,
+                )
+                return None
+
+        if attempt < max_retries:
+            await asyncio.sleep(_retry_delay(attempt, backoff_seconds, response))
+
+    logger.error("Giving up on %s rates for %s after %s attempts", base_currency, rate_date, max_retries + 1)
+    return None
+
+
+def rates_to_rows(rates_data: dict[str, Any]) -> list[tuple[str, str, str, Any]]:
+    # vatcomply answers weekends and holidays with the last published day, whose date is in the body
+    base_currency = rates_data["base"]
+    rate_date = rates_data["date"]
+    return [(base_currency, currency_code, rate_date, rate) for currency_code, rate in rates_data["rates"].items()]
+
+
+def insert_exchange_rates(params_list: list[tuple[str, str, str, Any]]) -> int:
+    query_template = """
+    INSERT INTO exchange_rates (base_currency, currency_code, rate_date, rate)
+    VALUES (%s, %s, %s, %s)
+    ON CONFLICT (base_currency, currency_code, rate_date)
+    DO UPDATE SET rate = EXCLUDED.rate;
+    """
+    # one page, so the returned rowcount covers the whole batch
+    return batch_insert(query_template, params_list, page_size=len(params_list))
+
+
+async def _write_rates(rates_queue: asyncio.Queue) -> int:
+    rows_inserted = 0
+    # keyed on the primary key: several requested days map onto the same published day, and one
+    # statement may not touch the same row twice with ON CONFLICT DO UPDATE
+    pending: dict[tuple[str, str, str], tuple[str, str, str, Any]] = {}
+
+    async def flush() -> None:
+        nonlocal rows_inserted
+        batch = list(pending.values())
+        pending.clear()
+        try:
+            rows_inserted += await asyncio.to_thread(insert_exchange_rates, batch)
+            logger.info("Batch inserted %s exchange rates", len(batch))
+        except Exception:
+            logger.exception("Error inserting exchange rates batch")
+
+    while (rates_data := await rates_queue.get()) is not None:
+        try:
+            for row in rates_to_rows(rates_data):
+                pending[row[:3]] = row
+        except (KeyError, AttributeError, TypeError, ValueError):
+            logger.exception("Skipping malformed rates response")
+        if len(pending) >= INSERT_BATCH_SIZE:
+            await flush()
+
+    if pending:
+        await flush()
+    return rows_inserted
+
+
+async def _backfill(
+    base_currencies: Iterable[str],
+    start_date: date,
+    end_date: date,
+    concurrency: int,
+    requests_per_second: float | None,
+    max_retries: int,
+    backoff_seconds: float,
+) -> BackfillResult:
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = RateLimiter(requests_per_second)
+    # Bounded, so fetching cannot run far ahead of the database
+    rates_queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    writer = asyncio.create_task(_write_rates(rates_queue))
+    requests_failed = 0
+
+    async def fetch_and_enqueue(base_currency: str, rate_date: date) -> None:
+        nonlocal requests_failed
+        try:
+            rates_data = await fetch_rates(base_currency, rate_date, semaphore, limiter, max_retries, backoff_seconds)
+        except Exception:
+            # an unexpected error, such as a body that is not JSON, only fails its own day
+            logger.exception("Fetching %s rates for %s failed", base_currency, rate_date)
+            rates_data = None
+        if rates_data is None:
+            requests_failed += 1
+        else:
+            await rates_queue.put(rates_data)
+
+    tasks = [
+        fetch_and_enqueue(base_currency, rate_date)
+        for base_currency in base_currencies
+        for rate_date in date_range(start_date, end_date)
+    ]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        # Even when the fetching is cancelled, the rows already fetched are written
+        await rates_queue.put(None)
+        rows_inserted = await writer
+
+    return BackfillResult(len(tasks), requests_failed, rows_inserted)
+
+
+def backfill_exchange_rates(
+    base_currencies: Iterable[str],
+    start_date: date,
+    end_date: date | None = None,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    requests_per_second: float | None = DEFAULT_REQUESTS_PER_SECOND,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    backoff_seconds: float = DEFAULT_BACKOFF_SECONDS,
+    derive_cross_rates: bool = True,
+) -> BackfillResult:
+    """Fetch daily rates for every base currency between ``start_date`` and ``end_date`` into exchange_rates.
+
+    At most ``concurrency`` requests are in flight and request starts are spaced to stay under
+    ``requests_per_second``. Throttled (429) and server error responses are retried with exponential
+    backoff. Responses are inserted in batches while the remaining days are still being fetched.
+
+    With ``derive_cross_rates`` a single base currency is the anchor: only its published rates are
+    stored and every other pair is derived from them when read, see src.cross_rates.load_cross_rates.
+    A second base would only fetch and store rates the anchor already implies, so it is rejected.
+    """
+    end_date = end_date or datetime.now(tz=UTC).date()
+    base_currencies = list(base_currencies)
+    if derive_cross_rates and len(base_currencies) != 1:
+        raise ValueError(f"Cross rates are derived from one anchor currency, got {', '.join(base_currencies)}")
+    logger.info(
+        "Backfilling %s rates from %s to %s", ", ".join(base_currencies), start_date.isoformat(), end_date.isoformat()
+    )
+
+    result = asyncio.run(
+        _backfill(
+            base_currencies,
+            start_date,
+            end_date,
+            concurrency,
+            requests_per_second,
+            max_retries,
+            backoff_seconds,
+        )
+    )
+    logger.info(
+        "Backfill made %s requests (%s failed) and stored %s exchange rates",
+        result.requests_made,
+        result.requests_failed,
+        result.rows_inserted,
+    )
+    return result
@@ -0,0 +1,74 @@
+import io
+from collections.abc import Iterator, Sequence
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+
+EPOCH_MICROSECONDS_PLACEHOLDER = "(TIMESTAMP WITH TIME ZONE 'epoch' + %s * INTERVAL '1 microsecond')"
+
+
+class RowFeed:
+    """Column-wise view of a DataFrame that produces parameter tuples for ``batch_insert``.
+
+    Every column is converted once into a flat numpy array instead of going through
+    ``DataFrame.values``, which would copy the whole frame into a 2D object array and box each
+    value. Timestamps are sent as integer microseconds since the epoch and fixed-point decimals as
+    their unscaled integer, with ``template`` turning them back into the right types in SQL.
+    String and categorical columns only hold references to strings that already exist, so a row
+    costs one tuple plus a few small ints.
+    """
+
+    def __init__(self, data_frame: pd.DataFrame, columns: Sequence[str]) -> None:
+        self._length = len(data_frame)
+        self._arrays: list[np.ndarray] = []
+        placeholders = []
+
+        for name in columns:
+            array, placeholder = _column_feed(data_frame[name])
+            self._arrays.append(array)
+            placeholders.append(placeholder)
+
+        self.template = f"({', '.join(placeholders)})"
+
+    def __len__(self) -> int:
+        return self._length
+
+    def batches(self, batch_size: int) -> Iterator[list[tuple]]:
+        for start in range(0, self._length, batch_size):
+            end = start + batch_size
+            yield list(zip(*(array[start:end].tolist() for array in self._arrays), strict=True))
+
+
+def _column_feed(column: pd.Series) -> tuple[np.ndarray, str]:
+    dtype = column.dtype
+
+    if isinstance(dtype, pd.DatetimeTZDtype) or (isinstance(dtype, np.dtype) and dtype.kind == "M"):
+        # .values is the UTC datetime64 data, viewing it as int64 does not copy
+        microseconds = column.dt.as_unit("us").values.view("int64")
+        return microseconds, EPOCH_MICROSECONDS_PLACEHOLDER
+
+    if isinstance(dtype, pd.ArrowDtype) and pa.types.is_decimal(dtype.pyarrow_dtype):
+        scale = dtype.pyarrow_dtype.scale
+        unscaled = pc.cast(pc.multiply(pa.array(column.array), pa.scalar(10**scale)), pa.int64())
+        return unscaled.to_numpy(zero_copy_only=False), f"(%s::numeric / {10**scale})"
+
+    return column.to_numpy(dtype=object), "%s"
+
+
+def arrow_csv_buffer(data: pd.DataFrame | pa.Table, columns: Sequence[str]) -> io.BytesIO:
+    """Serialize ``columns`` of a DataFrame or Arrow table to CSV for COPY, entirely inside Arrow."""
+    table = data if isinstance(data, pa.Table) else pa.Table.from_pandas(data[list(columns)], preserve_index=False)
+    table = table.select(list(columns))
+
+    # the CSV writer cannot handle dictionary columns, decode them back to plain strings
+    for index, field in enumerate(table.schema):
+        if pa.types.is_dictionary(field.type):
+            table = table.set_column(index, field.name, pc.cast(table[field.name], field.type.value_type))
+
+    buffer = io.BytesIO()
+    pa_csv.write_csv(table, buffer)
+    buffer.seek(0)
+    return buffer
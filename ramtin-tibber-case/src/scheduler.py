@@ -0,0 +1,139 @@
+import logging
+import time
+from collections.abc import Callable, Sequence
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, NamedTuple
+
+from src.metrics import observe
+
+logger = logging.getLogger(__name__)
+
+
+class Stage(NamedTuple):
+    name: str
+    run: Callable[[], Any]
+    depends_on: tuple[str, ...] = ()
+
+
+class StageResult(NamedTuple):
+    name: str
+    # seconds since the scheduler started
+    started: float
+    finished: float
+    error: BaseException | None = None
+    skipped: bool = False
+
+    @property
+    def succeeded(self) -> bool:
+        return self.error is None and not self.skipped
+
+    @property
+    def seconds(self) -> float:
+        return self.finished - self.started
+
+
+def _check_graph(stages: Sequence[Stage]) -> None:
+    names = [stage.name for stage in stages]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Stage names must be unique, got {names}")
+    for stage in stages:
+        unknown = set(stage.depends_on) - set(names)
+        if unknown:
+            raise ValueError(f"Stage {stage.name!r} depends on unknown stages {sorted(unknown)}")
+
+    # Kahn's algorithm, whatever is never freed of its dependencies is part of a cycle
+    blocked = {stage.name: set(stage.depends_on) for stage in stages}
+    ready = [name for name, dependencies in blocked.items() if not dependencies]
+    while ready:
+        done = ready.pop()
+        for name, dependencies in blocked.items():
+            if done in dependencies:
+                dependencies.remove(done)
+                if not dependencies:
+                    ready.append(name)
+    cyclic = sorted(name for name, dependencies in blocked.items() if dependencies)
+    if cyclic:
+        raise ValueError(f"Stages {cyclic} depend on each other in a cycle")
+
+
+def _run_timed(stage: Stage, origin: float) -> StageResult:
+    started = time.perf_counter() - origin
+    error = None
+    try:
+        stage.run()
+    except Exception as e:
+        logger.exception("Stage %s failed", stage.name)
+        error = e
+    finished = time.perf_counter() - origin
+    observe("pipeline_stage_duration_seconds", finished - started, stage=stage.name)
+    return StageResult(stage.name, started, finished, error)
+
+
+def critical_path(stages: Sequence[Stage], results: dict[str, StageResult]) -> list[str]:
+    """The chain of stages that ended last, following the dependency that finished last at every step."""
+    depends_on = {stage.name: stage.depends_on for stage in stages}
+    path = [max(results.values(), key=lambda result: result.finished).name]
+    while dependencies := depends_on[path[-1]]:
+        path.append(max(dependencies, key=lambda name: results[name].finished))
+    return path[::-1]
+
+
+def run_stages(stages: Sequence[Stage], max_workers: int | None = None) -> dict[str, StageResult]:
+    """Run ``stages`` on a thread pool, each as soon as everything it depends on has succeeded.
+
+    A failed stage skips the stages that depend on it while independent stages carry on. Once
+    everything has finished, the error of the first failed stage (in the order given) is re-raised.
+    """
+    _check_graph(stages)
+    origin = time.perf_counter()
+    waiting = list(stages)
+    results: dict[str, StageResult] = {}
+    running: dict[Future, str] = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(stages) or 1, thread_name_prefix="stage") as executor:
+        while waiting or running:
+            # skipping a stage can unblock its own dependents, so repeat until nothing changes
+            progressed = True
+            while progressed:
+                progressed = False
+                for stage in list(waiting):
+                    if not all(name in results for name in stage.depends_on):
+                        continue
+                    waiting.remove(stage)
+                    progressed = True
+                    failed = [name for name in stage.depends_on if not results[name].succeeded]
+                    if failed:
+                        logger.error("Skipping stage %s, %s did not succeed", stage.name, ", ".join(failed))
+                        now = time.perf_counter() - origin
+                        results[stage.name] = StageResult(stage.name, now, now, skipped=True)
+                    else:
+                        running[executor.submit(_run_timed, stage, origin)] = stage.name
+
+            if running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[running.pop(future)] = future.result()
+
+    _log_report(stages, results)
+    for stage in stages:
+        error = results[stage.name].error
+        if error is not None:
+            raise error
+    return results
+
+
+def _log_report(stages: Sequence[Stage], results: dict[str, StageResult]) -> None:
+    if not results:
+        return
+    for stage in stages:
+        result = results[stage.name]
+        status = "skipped" if result.skipped else "failed" if result.error else "ok"
+        logger.info(
+            "Stage %-12s %-7s started at %7.2f s, took %7.2f s", stage.name, status, result.started, result.seconds
+        )
+    path = critical_path(stages, results)
+    logger.info(
+        "Pipeline took %.2f s, critical path: %s",
+        max(result.finished for result in results.values()),
+        " -> ".join(path),
+    )
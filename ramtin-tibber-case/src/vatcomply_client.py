@@ -0,0 +1,206 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections.abc import Mapping
+from datetime import UTC, date, datetime
+from pathlib import Path
+from typing import Any, NamedTuple
+from urllib.parse import urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.metrics import increment, timer
+
+logger = logging.getLogger(__name__)
+
+HTTP_OK = 200
+HTTP_NOT_MODIFIED = 304
+REQUEST_TIMEOUT = 3
+DEFAULT_VATCOMPLY_BASE_URL = "https://api.vatcomply.com"
+DEFAULT_CACHE_DIR = Path(__file__).parent.parent / ".cache" / "vatcomply"
+
+# The currency list hardly ever changes, today's rates change once per business day
+CURRENCIES_MAX_AGE = 24 * 60 * 60
+TODAY_RATES_MAX_AGE = 60 * 60
+SESSION_POOL_SIZE = 16
+
+_session: requests.Session | None = None
+_session_pid: int | None = None
+_session_lock = threading.Lock()
+
+
+class ClientResponse(NamedTuple):
+    status_code: int
+    body: Any | None
+    headers: Mapping[str, str]
+    from_cache: bool = False
+
+
+class CacheEntry(NamedTuple):
+    url: str
+    fetched_at: float
+    immutable: bool
+    etag: str | None
+    last_modified: str | None
+    body: Any
+
+
+class ResponseCache:
+    """JSON responses on disk, one file per URL, written atomically so concurrent fetches can share it."""
+
+    def __init__(self, directory: str | Path) -> None:
+        self.directory = Path(directory)
+
+    def _path(self, url: str) -> Path:
+        return self.directory / f"{hashlib.sha256(url.encode()).hexdigest()}.json"
+
+    def get(self, url: str) -> CacheEntry | None:
+        try:
+            with open(self._path(url), encoding="utf-8") as cache_file:
+                entry = CacheEntry(**json.load(cache_file))
+        except FileNotFoundError:
+            return None
+        except (ValueError, TypeError):
+            logger.warning("Ignoring unreadable cache entry for %s", url)
+            return None
+        return entry if entry.url == url else None
+
+    def put(self, entry: CacheEntry) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as temp_file:
+                json.dump(entry._asdict(), temp_file)
+            os.replace(temp_path, self._path(entry.url))
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+
+def vatcomply_base_url() -> str:
+    # Overridable so the pipeline can be pointed at a mirror or a local stand-in server
+    return os.getenv("VATCOMPLY_BASE_URL", DEFAULT_VATCOMPLY_BASE_URL).rstrip("/")
+
+
+def get_response_cache() -> ResponseCache | None:
+    cache_dir = os.getenv("VATCOMPLY_CACHE_DIR", str(DEFAULT_CACHE_DIR))
+    return ResponseCache(cache_dir) if cache_dir else None
+
+
+def get_session() -> requests.Session:
+    """Return the process-wide keep-alive session, building a new one after a fork like the connection pool."""
+    global _session, _session_pid
+
+    with _session_lock:
+        if _session is None or _session_pid != os.getpid():
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=SESSION_POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session, _session_pid = session, os.getpid()
+        return _session
+
+
+def close_session() -> None:
+    global _session, _session_pid
+
+    with _session_lock:
+        if _session is not None and _session_pid == os.getpid():
+            _session.close()
+        _session, _session_pid = None, None
+
+
+def rates_max_age(rate_date: date | str | None) -> float | None:
+    """Cache lifetime for a /rates response: ``None`` (forever) for past dates, a short TTL otherwise."""
+    today = datetime.now(tz=UTC).date()
+    if rate_date is not None and date.fromisoformat(str(rate_date)) < today:
+        return None
+    return TODAY_RATES_MAX_AGE
+
+
+def _build_url(path: str, params: Mapping[str, str] | None) -> str:
+    query = f"?{urlencode(params)}" if params else ""
+    return f"{vatcomply_base_url()}{path}{query}"
+
+
+def _is_fresh(entry: CacheEntry, max_age: float | None) -> bool:
+    return entry.immutable or bool(max_age and time.time() - entry.fetched_at < max_age)
+
+
+def get_cached_json(path: str, params: Mapping[str, str] | None = None, max_age: float | None = 0) -> Any | None:
+    """Return the cached body for ``path`` if it is still fresh, without any network access."""
+    cache = get_response_cache()
+    entry = cache.get(_build_url(path, params)) if cache else None
+    return entry.body if entry is not None and _is_fresh(entry, max_age) else None
+
+
+def get_json(path: str, params: Mapping[str, str] | None = None, max_age: float | None = 0) -> ClientResponse:
+    """GET ``path`` on the vatcomply API through the shared session and the on-disk cache.
+
+    A cached response younger than ``max_age`` seconds is returned without touching the network,
+    ``max_age=None`` marks the response as never expiring. Older entries are revalidated with
+    If-None-Match / If-Modified-Since, so an unchanged resource costs a 304 instead of a download.
+    """
+    url = _build_url(path, params)
+    cache = get_response_cache()
+    entry = cache.get(url) if cache else None
+
+    if entry is not None and _is_fresh(entry, max_age):
+        increment("vatcomply_requests_total", endpoint=path, outcome="cache")
+        return ClientResponse(HTTP_OK, entry.body, {}, from_cache=True)
+
+    headers = {}
+    if entry is not None:
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+
+    try:
+        with timer("vatcomply_request_duration_seconds", endpoint=path):
+            response = get_session().get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+    except requests.RequestException:
+        increment("vatcomply_requests_total", endpoint=path, outcome="error")
+        raise
+    increment("vatcomply_requests_total", endpoint=path, outcome=str(response.status_code))
+
+    if response.status_code == HTTP_NOT_MODIFIED and entry is not None:
+        body = entry.body
+    elif response.status_code == HTTP_OK:
+        body = response.json()
+    else:
+        return ClientResponse(response.status_code, None, response.headers)
+
+    if cache:
+        cache.put(
+            CacheEntry(
+                url,
+                time.time(),
+                max_age is None,
+                response.headers.get("ETag") or (entry.etag if entry else None),
+                response.headers.get("Last-Modified") or (entry.last_modified if entry else None),
+                body,
+            )
+        )
+    return ClientResponse(HTTP_OK, body, response.headers, from_cache=response.status_code == HTTP_NOT_MODIFIED)
+
+
+def get_currencies_json() -> ClientResponse:
+    return get_json("/currencies", max_age=CURRENCIES_MAX_AGE)
+
+
+def _rates_params(base_currency: str, rate_date: date | str) -> dict[str, str]:
+    return {"base": base_currency, "date": str(rate_date)}
+
+
+def get_rates_json(base_currency: str, rate_date: date | str) -> ClientResponse:
+    return get_json("/rates", _rates_params(base_currency, rate_date), max_age=rates_max_age(rate_date))
+
+
+def get_cached_rates_json(base_currency: str, rate_date: date | str) -> dict[str, Any] | None:
+    return get_cached_json("/rates", _rates_params(base_currency, rate_date), max_age=rates_max_age(rate_date))
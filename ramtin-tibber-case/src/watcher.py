@@ -0,0 +1,99 @@
+import logging
+import threading
+import time
+from datetime import UTC, datetime
+from typing import Any
+
+from src.database_manager import create_ingestion_manifest_table
+from src.get_currencies_and_rates import get_currencies_and_rates
+from src.ingestion_manifest import FileFingerprint, ManifestEntry, file_fingerprint, load_manifest
+from src.load_csv import get_csv_files_in_order, load_csv_files
+from src.metrics import export_metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL_SECONDS = 30.0
+DEFAULT_RATES_REFRESH_SECONDS = 3600.0
+
+
+class DirectoryWatcher:
+    """Polls a directory for CSV files that are new or have grown since they were last loaded.
+
+    A changed file is only handed out once its size and modification time are the same on two
+    consecutive polls, so a file that is still being copied in is not loaded half written.
+    """
+
+    def __init__(self, directory: str = "data") -> None:
+        self.directory = directory
+        self._loaded: dict[str, FileFingerprint] = {}
+        self._pending: dict[str, FileFingerprint] = {}
+
+    def mark_loaded(self, manifest: dict[str, ManifestEntry]) -> None:
+        for file_path, entry in manifest.items():
+            self._loaded[file_path] = FileFingerprint(entry.file_size, entry.file_mtime_ns)
+            if self._pending.get(file_path) == self._loaded[file_path]:
+                del self._pending[file_path]
+
+    def poll(self) -> list[str]:
+        ready = []
+        for file_path in get_csv_files_in_order(self.directory):
+            try:
+                fingerprint = file_fingerprint(file_path)
+            except FileNotFoundError:
+                continue
+
+            if self._loaded.get(file_path) == fingerprint:
+                self._pending.pop(file_path, None)
+            elif self._pending.get(file_path) == fingerprint:
+                ready.append(file_path)
+            else:
+                self._pending[file_path] = fingerprint
+        return ready
+
+
+def run_daemon(
+    directory: str = "data",
+    interval: float = DEFAULT_INTERVAL_SECONDS,
+    rates_refresh_interval: float = DEFAULT_RATES_REFRESH_SECONDS,
+    stop: threading.Event | None = None,
+    max_cycles: int | None = None,
+    started_at: datetime | None = None,
+    **load_options: Any,
+) -> None:
+    """Ingest new and grown files in ``directory`` every ``interval`` seconds until ``stop`` is set.
+
+    The connection pool, the vatcomply session and its cache stay open for the whole run, so a cycle
+    only pays for the files that actually changed. Rates are refreshed at most every
+    ``rates_refresh_interval`` seconds, and metrics are exported after every cycle that loaded files.
+    """
+    stop = stop or threading.Event()
+    started_at = started_at or datetime.now(tz=UTC)
+    create_ingestion_manifest_table()
+    watcher = DirectoryWatcher(directory)
+    watcher.mark_loaded(load_manifest())
+    rates_refreshed_at: float | None = None
+    cycles = 0
+    logger.info("Watching %s for new CSV files every %s seconds", directory, interval)
+
+    while not stop.is_set():
+        try:
+            if rates_refreshed_at is None or time.monotonic() - rates_refreshed_at >= rates_refresh_interval:
+                get_currencies_and_rates()
+                rates_refreshed_at = time.monotonic()
+
+            ready = watcher.poll()
+            if ready:
+                logger.info("%s CSV files are new or have grown: %s", len(ready), ready)
+                load_csv_files(directory=directory, files=ready, **load_options)
+                # A file that failed to load is not in the manifest and is picked up again next cycle
+                watcher.mark_loaded(load_manifest())
+                export_metrics(started_at)
+        except Exception:
+            logger.exception("Watch cycle failed, retrying in %s seconds", interval)
+
+        cycles += 1
+        if max_cycles is not None and cycles >= max_cycles:
+            break
+        stop.wait(interval)
+
+    logger.info("Stopped watching %s after %s cycles", directory, cycles)
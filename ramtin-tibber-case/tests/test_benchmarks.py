@@ -0,0 +1,68 @@
+import os
+import sys
+from unittest.mock import patch
+
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.generate_data import generate_item_prices, parse_currency_weights
+from benchmarks.run_benchmarks import StageResult, compare_to_baselines, run_stage
+from src.csv_schema import iter_item_prices_batches
+
+
+def test_generated_files_parse_with_the_declared_schema(tmp_path):
+    paths = generate_item_prices(tmp_path, 5_000, files=2, duplicate_ratio=0.1, currency_weights={"NOK": 1, "EUR": 1})
+
+    assert [path.name for path in paths] == ["batch1.csv", "batch2.csv"]
+    assert sum(batch.rows_parsed for path in paths for batch in iter_item_prices_batches(str(path))) == 5_000
+
+    data_frame = pd.concat(pd.read_csv(path) for path in paths)
+    assert data_frame.duplicated().sum() == 500
+    assert set(data_frame["currency"]) == {"NOK", "EUR"}
+    # every id keeps its item and currency across its versions
+    assert (data_frame.groupby("id")[["item", "currency"]].nunique() == 1).all().all()
+    assert data_frame["id"].nunique() < 4_500
+
+
+def test_generator_is_deterministic(tmp_path):
+    first = generate_item_prices(tmp_path / "first", 1_000, seed=7)[0].read_bytes()
+    second = generate_item_prices(tmp_path / "second", 1_000, seed=7)[0].read_bytes()
+    other_seed = generate_item_prices(tmp_path / "other", 1_000, seed=8)[0].read_bytes()
+
+    assert first == second
+    assert first != other_seed
+
+
+def test_parse_currency_weights():
+    assert parse_currency_weights("nok:0.6, EUR:0.4") == {"NOK": 0.6, "EUR": 0.4}
+
+
+def test_compare_to_baselines_flags_slower_and_larger_stages():
+    baselines = {"parse": {"rows_per_second": 1000.0, "peak_rss_mb": 100.0}}
+
+    within = StageResult("parse", 10, 1.0, 850.0, 115.0, 1.0, 1.0, 1.0)
+    slower = StageResult("parse", 10, 1.0, 700.0, 100.0, 1.0, 1.0, 1.0)
+    larger = StageResult("parse", 10, 1.0, 1000.0, 130.0, 1.0, 1.0, 1.0)
+    unknown = StageResult("load_copy", 10, 1.0, 1.0, 1000.0, 1.0, 1.0, 1.0)
+
+    assert compare_to_baselines([within, unknown], baselines) == []
+    assert len(compare_to_baselines([slower], baselines)) == 1
+    assert "peak RSS" in compare_to_baselines([larger], baselines)[0]
+
+
+@patch("src.database_manager.database_setup")
+@patch("src.database_manager.reset_database")
+def test_load_stage_counts_rows_up_front_and_fails_when_a_file_is_not_loaded(_, __, tmp_path, monkeypatch):
+    monkeypatch.setenv("DB_NAME", "tibber_benchmark")
+    generate_item_prices(tmp_path, 2_000, files=2)
+
+    with patch("src.load_csv.load_csv_files", return_value=True) as mock_load_csv_files:
+        result = run_stage("load_copy", str(tmp_path), 500, "tibber_benchmark")
+
+    assert result.rows == 2_000
+    assert mock_load_csv_files.call_args[0] == ("copy", 500)
+
+    with patch("src.load_csv.load_csv_files", return_value=False):
+        with pytest.raises(RuntimeError, match="Not every CSV file"):
+            run_stage("load_copy", str(tmp_path), 500, "tibber_benchmark")
@@ -0,0 +1,44 @@
+import os
+import sys
+from datetime import date
+from decimal import Decimal
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.cross_rates import cross_rate_matrix, load_cross_rates, round_significant
+
+
+def test_cross_rate_matrix_triangulates_through_the_base():
+    currencies, matrix = cross_rate_matrix({"USD": 0.095, "EUR": 0.087, "SEK": 0.98}, "NOK")
+
+    assert currencies == ["EUR", "NOK", "SEK", "USD"]
+    eur, nok, sek, usd = range(4)
+    assert matrix[nok, usd] == 0.095
+    assert matrix[usd, nok] == pytest.approx(1 / 0.095, rel=1e-11)
+    assert matrix[eur, sek] == pytest.approx(0.98 / 0.087, rel=1e-11)
+    assert np.all(np.diag(matrix) == 1.0)
+    # round trips agree to the stored precision
+    assert np.allclose(matrix * matrix.T, 1.0, rtol=1e-11)
+
+
+def test_round_significant_keeps_small_rates():
+    values = np.array([1 / 3, 2 / 3 * 1e-5, 123456.789123456789])
+
+    assert round_significant(values, 6).tolist() == [0.333333, 6.66667e-06, 123457.0]
+
+
+@patch("src.cross_rates.execute_query")
+def test_cross_rates_are_derived_from_the_stored_anchor_rates(mock_execute_query):
+    mock_execute_query.return_value = [("EUR", Decimal("1")), ("NOK", Decimal("11.5")), ("USD", Decimal("1.1"))]
+
+    currencies, matrix = load_cross_rates("EUR", date(2024, 1, 6))
+
+    assert currencies == ["EUR", "NOK", "USD"]
+    assert matrix[1, 2] == round_significant(np.array([1.1 / 11.5]))[0]
+    assert mock_execute_query.call_args[0][1] == ("EUR", "EUR", date(2024, 1, 6))
+
+    mock_execute_query.return_value = []
+    assert load_cross_rates("EUR", date(1999, 1, 1)) is None
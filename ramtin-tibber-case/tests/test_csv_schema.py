@@ -0,0 +1,61 @@
+import os
+import sys
+from decimal import Decimal
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.csv_schema import iter_item_prices_batches, read_item_prices_table, to_data_frame
+
+HEADER = "id,item,price,currency,created_at,updated_at,system_timestamp\n"
+
+
+@pytest.fixture
+def csv_file(tmp_path):
+    file_path = tmp_path / "batch1.csv"
+    file_path.write_text(
+        HEADER + "11111111-1111-1111-1111-111111111111,Pulse,199.99,NOK,"
+        "2025-03-01T08:00:00+01:00,2025-03-01T08:05:00+01:00,2025-03-01T08:10:00+01:00\n"
+        "22222222-2222-2222-2222-222222222222,Smart Pulse,249.50,EUR,"
+        "2025-03-01T09:15:00+01:00,2025-03-01T09:20:00+01:00,2025-03-01T09:30:00+01:00\n"
+    )
+    return str(file_path)
+
+
+def test_columns_are_parsed_with_declared_types(csv_file):
+    _, table = read_item_prices_table(csv_file)
+    data_frame = to_data_frame(table)
+
+    assert isinstance(data_frame["item"].dtype, pd.CategoricalDtype)
+    assert isinstance(data_frame["currency"].dtype, pd.CategoricalDtype)
+    assert data_frame["price"].dtype == pd.ArrowDtype(pa.decimal128(10, 2))
+    assert data_frame["price"].iloc[0] == Decimal("199.99")
+    assert str(data_frame["system_timestamp"].dtype) == "datetime64[us, UTC]"
+    assert data_frame["system_timestamp"].iloc[0] == pd.Timestamp("2025-03-01T07:10:00Z")
+
+
+def test_checkpoint_predicate_is_applied_while_reading(csv_file):
+    batches = list(iter_item_prices_batches(csv_file, "2025-03-01T08:00:00+00:00"))
+
+    assert [batch.rows_parsed for batch in batches] == [2]
+    assert batches[0].table.num_rows == 1
+    assert batches[0].table["id"][0].as_py() == "22222222-2222-2222-2222-222222222222"
+    assert batches[0].min_timestamp == pd.Timestamp("2025-03-01T07:10:00Z")
+
+
+def test_invalid_rows_are_rejected(tmp_path):
+    bad_id = tmp_path / "bad_id.csv"
+    bad_id.write_text(
+        HEADER + "1,Pulse,1.00,NOK,2025-03-01T08:00:00+01:00,2025-03-01T08:00:00+01:00,2025-03-01T08:00:00+01:00\n"
+    )
+    missing_offset = tmp_path / "missing_offset.csv"
+    missing_offset.write_text(
+        HEADER + "11111111-1111-1111-1111-111111111111,Pulse,1.00,NOK,2025-03-01,2025-03-01,2025-03-01T08:00:00\n"
+    )
+
+    with pytest.raises(ValueError, match="not a UUID"):
+        read_item_prices_table(str(bad_id))
+    with pytest.raises(pa.ArrowInvalid):
+        read_item_prices_table(str(missing_offset))
@@ -0,0 +1,62 @@
+import os
+import random
+import sys
+from decimal import ROUND_HALF_UP, Decimal
+from unittest.mock import patch
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.csv_schema import PRICE_TYPE
+from src.currency_conversion import RateCache, convert_prices, get_rate_cache, invalidate_rate_cache
+
+RATES = RateCache({"USD": Decimal("0.0950000000000000"), "EUR": Decimal("0.0870000000000000"), "HALF": Decimal("2")})
+
+
+def decimal_prices(values):
+    return pd.Series(pd.arrays.ArrowExtensionArray(pa.array([Decimal(value) for value in values], PRICE_TYPE)))
+
+
+def test_ties_round_half_away_from_zero_like_postgres():
+    converted = convert_prices(decimal_prices(["0.05", "-0.05", "0.03"]), pd.Series(["HALF"] * 3), "NOK", RATES)
+
+    assert converted.tolist() == [Decimal("0.03"), Decimal("-0.03"), Decimal("0.02")]
+
+
+def test_unknown_currency_converts_to_null():
+    converted = convert_prices(pd.Series([10.0, 10.0]), pd.Series(["USD", "XXX"], dtype="category"), "NOK", RATES)
+
+    assert converted[0] == Decimal("105.26")
+    assert pd.isna(converted[1])
+
+
+def test_conversion_matches_exact_decimal_arithmetic():
+    random.seed(7)
+    prices = [Decimal(random.randint(-(10**6), 10**9)) / 100 for _ in range(20_000)]
+    currencies = [random.choice(["USD", "EUR", "HALF", "NOK"]) for _ in prices]
+
+    converted = convert_prices(decimal_prices(prices), pd.Series(currencies, dtype="category"), "EUR", RATES)
+
+    expected = [
+        (price / RATES.rates[currency] * RATES.rates["EUR"]).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+        for price, currency in zip(prices, currencies, strict=True)
+    ]
+    assert converted.tolist() == expected
+
+
+def test_rate_cache_is_loaded_once_until_invalidated():
+    invalidate_rate_cache()
+    with patch("src.currency_conversion.execute_query", return_value=[("USD", Decimal("0.095"))]) as mock_query:
+        assert get_rate_cache() is get_rate_cache()
+        invalidate_rate_cache()
+        get_rate_cache()
+
+    assert mock_query.call_count == 2
+    invalidate_rate_cache()
+
+
+def test_unknown_target_currency_is_rejected():
+    with pytest.raises(ValueError):
+        convert_prices(pd.Series([1.0]), pd.Series(["USD"]), "XXX", RATES)
@@ -1,7 +1,10 @@
+import io
 import os
 from datetime import datetime, timezone
+from decimal import Decimal
 from unittest.mock import MagicMock, patch
 
+import pyarrow as pa
 import pytest
 import psycopg2
 from psycopg2.extensions import connection
@@ -10,21 +13,46 @@ import sys
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from src.database_manager import (
+    ConnectionPool,
+    PoolExhaustedError,
+    close_connection_pool,
+    copy_insert,
+    create_item_prices_scd2_table,
+    create_item_prices_table,
+    create_nok_prices_as_of_view,
+    create_nok_prices_table,
+    ensure_item_prices_partitions,
     execute_query,
+    migrate_item_prices,
     batch_insert,
     update_checkpoint,
     get_latest_checkpoint,
+    savepoint,
+    stream_query,
+    transaction,
 )
 
 
-@pytest.fixture
-def mock_connection():
+def make_mock_connection():
     mock_conn = MagicMock(spec=connection)
+    mock_conn.closed = 0
     mock_cursor = MagicMock()
     mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
     return mock_conn, mock_cursor
 
 
+@pytest.fixture
+def mock_connection():
+    return make_mock_connection()
+
+
+@pytest.fixture(autouse=True)
+def reset_connection_pool():
+    close_connection_pool()
+    yield
+    close_connection_pool()
+
+
 @pytest.fixture
 def mock_env_vars(monkeypatch):
     monkeypatch.setenv("DB_HOST", "test_host")
@@ -44,7 +72,8 @@ def test_execute_query_non_select(mock_connection):
         mock_cursor.execute.assert_called_once_with("INSERT INTO test_table VALUES ('test')", None)
         mock_conn.commit.assert_called_once()
         assert result is None
-        mock_conn.close.assert_called_once()
+        # The connection goes back to the pool instead of being closed
+        mock_conn.close.assert_not_called()
 
 
 def test_batch_insert(mock_connection):
@@ -63,7 +92,7 @@ def test_batch_insert(mock_connection):
             assert rows == 3
             mock_execute_values.assert_called_once()
             mock_conn.commit.assert_called_once()
-            mock_conn.close.assert_called_once()
+            mock_conn.close.assert_not_called()
 
 
 def test_batch_insert_empty_list(mock_connection):
@@ -109,3 +138,277 @@ def test_update_and_get_checkpoint(mock_connection):
 
         assert checkpoint is not None
         assert test_timestamp in checkpoint
+
+
+def test_pooled_connection_is_reused(mock_connection):
+    mock_conn, mock_cursor = mock_connection
+    mock_cursor.rowcount = 1
+
+    with patch("src.database_manager.get_db_connection", return_value=mock_conn) as mock_connect:
+        with patch("src.database_manager.execute_values"):
+            execute_query("SELECT 1")
+            execute_query("SELECT 2")
+            batch_insert("INSERT INTO test_table (a) VALUES (%s)", [(1,)])
+
+        mock_connect.assert_called_once()
+
+
+def test_pool_replaces_closed_connection():
+    broken_conn, _ = make_mock_connection()
+    fresh_conn, _ = make_mock_connection()
+    pool = ConnectionPool(min_size=0, max_size=1, connection_factory=MagicMock(side_effect=[broken_conn, fresh_conn]))
+
+    with pool.checkout() as conn:
+        assert conn is broken_conn
+    broken_conn.closed = 1
+
+    with pool.checkout() as conn:
+        assert conn is fresh_conn
+    assert pool.size == 1
+
+
+def test_pool_health_check_pings_idle_connection():
+    mock_conn, mock_cursor = make_mock_connection()
+    pool = ConnectionPool(min_size=1, max_size=1, health_check_interval=0, connection_factory=lambda: mock_conn)
+    pool.fill()
+
+    with pool.checkout() as conn:
+        assert conn is mock_conn
+
+    mock_cursor.execute.assert_called_once_with("SELECT 1;")
+
+
+def test_pool_raises_when_exhausted():
+    mock_conn, _ = make_mock_connection()
+    pool = ConnectionPool(min_size=0, max_size=1, timeout=0.01, connection_factory=lambda: mock_conn)
+
+    with pool.checkout():
+        with pytest.raises(PoolExhaustedError):
+            pool.getconn()
+
+    pool.closeall()
+    mock_conn.close.assert_called_once()
+
+
+def test_copy_insert_merges_staging_table(mock_connection):
+    mock_conn, mock_cursor = mock_connection
+    max_timestamp = datetime(2025, 3, 1, tzinfo=timezone.utc)
+    mock_cursor.rowcount = 3
+    min_timestamp = datetime(2024, 12, 1, tzinfo=timezone.utc)
+    mock_cursor.fetchone.return_value = (2, max_timestamp, min_timestamp, max_timestamp)
+
+    def merge_rowcount(query, params=None):
+        if "INSERT INTO item_prices" in query:
+            mock_cursor.rowcount = 1
+
+    mock_cursor.execute.side_effect = merge_rowcount
+    csv_data = io.StringIO("id,system_timestamp\n1,2025-01-01\n")
+
+    with patch("src.database_manager.get_db_connection", return_value=mock_conn):
+        result = copy_insert(
+            "item_prices",
+            ["id", "system_timestamp"],
+            csv_data,
+            ["id", "system_timestamp"],
+            where_clause="system_timestamp > %s",
+            params=("2024-12-31",),
+            max_column="system_timestamp",
+        )
+
+    copy_sql, copied_data = mock_cursor.copy_expert.call_args[0]
+    assert "COPY item_prices_staging (id, system_timestamp) FROM STDIN" in copy_sql
+    assert copied_data is csv_data
+
+    merge_sql, merge_params = mock_cursor.execute.call_args[0]
+    assert "INSERT INTO item_prices (id, system_timestamp)" in merge_sql
+    assert "WHERE system_timestamp > %s" in merge_sql
+    assert "ON CONFLICT (id, system_timestamp) DO NOTHING" in merge_sql
+    assert merge_params == ("2024-12-31",)
+
+    aggregate_sql, aggregate_params = mock_cursor.execute.call_args_list[1][0]
+    assert "COUNT(*) FILTER (WHERE system_timestamp > %s)" in aggregate_sql
+    assert aggregate_params == ("2024-12-31", "2024-12-31")
+
+    assert result == (3, 2, 1, max_timestamp, min_timestamp, max_timestamp)
+    mock_conn.commit.assert_called_once()
+
+
+def test_transaction_commits_once_and_rolls_back_on_error(mock_connection):
+    mock_conn, mock_cursor = mock_connection
+    mock_cursor.rowcount = 1
+
+    with patch("src.database_manager.get_db_connection", return_value=mock_conn):
+        with patch("src.database_manager.execute_values"):
+            with transaction() as conn:
+                batch_insert("INSERT INTO items (name) VALUES (%s)", [("item1",)], conn=conn)
+                update_checkpoint("test_checkpoint", "2023-01-01T00:00:00+00:00", conn=conn)
+                mock_conn.commit.assert_not_called()
+
+        mock_conn.commit.assert_called_once()
+
+        mock_conn.reset_mock()
+        with pytest.raises(RuntimeError):
+            with transaction():
+                raise RuntimeError("boom")
+
+        mock_conn.rollback.assert_called()
+        mock_conn.commit.assert_not_called()
+
+
+def test_savepoint_rolls_back_only_the_failed_block(mock_connection):
+    mock_conn, mock_cursor = mock_connection
+
+    with savepoint(mock_conn):
+        pass
+    with pytest.raises(RuntimeError):
+        with savepoint(mock_conn):
+            raise RuntimeError("boom")
+
+    statements = [call[0][0] for call in mock_cursor.execute.call_args_list]
+    assert statements == [
+        "SAVEPOINT sub_batch;",
+        "RELEASE SAVEPOINT sub_batch;",
+        "SAVEPOINT sub_batch;",
+        "ROLLBACK TO SAVEPOINT sub_batch;",
+    ]
+    mock_conn.rollback.assert_not_called()
+
+
+def test_nok_prices_table_is_maintained_by_statement_triggers():
+    with patch("src.database_manager.execute_query") as mock_execute_query:
+        create_nok_prices_table()
+
+    drop_view, create_table, refresh = (call[0][0] for call in mock_execute_query.call_args_list)
+    assert "DROP VIEW transaction_prices_in_nok" in drop_view
+    assert "CREATE TABLE IF NOT EXISTS transaction_prices_in_nok" in create_table
+    assert "REFERENCING NEW TABLE AS new_item_prices" in create_table
+    assert create_table.count("FOR EACH STATEMENT") == 3
+    assert "INSERT INTO transaction_prices_in_nok" in refresh
+
+
+def test_scd2_table_relinks_only_affected_ids():
+    with patch("src.database_manager.execute_query") as mock_execute_query:
+        create_item_prices_scd2_table()
+
+    drop_view, create_table, refresh = (call[0][0] for call in mock_execute_query.call_args_list)
+    assert "DROP VIEW item_prices_scd2" in drop_view
+    assert "ON item_prices_scd2 (id) WHERE is_current" in create_table
+    assert "JOIN affected AS a ON a.id = s.id" in create_table
+    assert "REFERENCING NEW TABLE AS new_item_prices" in create_table
+    assert "LEAD(system_timestamp) OVER (PARTITION BY id ORDER BY system_timestamp)" in refresh
+
+
+def test_item_prices_is_partitioned_by_month():
+    with patch("src.database_manager.execute_query") as mock_execute_query:
+        create_item_prices_table()
+        mock_execute_query.side_effect = [[("p",)], [(2,)]]
+        created = ensure_item_prices_partitions(months_ahead=1)
+
+    create_table = mock_execute_query.call_args_list[0][0][0]
+    assert "PARTITION BY RANGE (system_timestamp)" in create_table
+    assert "PARTITION OF item_prices DEFAULT" in create_table
+    assert "USING BRIN (system_timestamp)" in create_table
+    mock_execute_query.assert_called_with("SELECT ensure_item_prices_partitions(%s);", (1,))
+    assert created == 2
+
+
+def test_unpartitioned_item_prices_is_migrated_by_the_setup():
+    with patch("src.database_manager.execute_query") as mock_execute_query:
+        create_item_prices_table()
+        mock_execute_query.return_value = [("r",)]
+        with pytest.raises(RuntimeError, match="python -m src.database_manager"):
+            ensure_item_prices_partitions()
+
+    create_table = mock_execute_query.call_args_list[0][0][0]
+    # the old table is moved aside before the partitioned one is created and copied from after it
+    assert create_table.index("RENAME TO item_prices_unpartitioned") < create_table.index("CREATE TABLE IF NOT")
+    assert create_table.index("FROM item_prices_unpartitioned") > create_table.index("PARTITION BY RANGE")
+    mock_execute_query.assert_called_with("SELECT relkind FROM pg_class WHERE oid = to_regclass('item_prices');")
+
+
+@pytest.mark.parametrize("relkind, migrated", [("r", True), ("p", False)])
+def test_migrate_item_prices_runs_the_setup_only_for_an_unpartitioned_table(relkind, migrated):
+    with (
+        patch("src.database_manager.execute_query", return_value=[(relkind,)]),
+        patch("src.database_manager.database_setup") as mock_database_setup,
+    ):
+        assert migrate_item_prices() is migrated
+
+    # the setup recreates the triggers the migration drops along with the old table
+    assert mock_database_setup.called is migrated
+
+
+def test_as_of_view_probes_rates_by_index_order():
+    with patch("src.database_manager.execute_query") as mock_execute_query:
+        create_nok_prices_as_of_view()
+
+    query = mock_execute_query.call_args[0][0]
+    assert "LEFT JOIN LATERAL" in query
+    assert "rate_date <= (ip.system_timestamp AT TIME ZONE 'UTC')::date" in query
+    assert "ORDER BY rate_date DESC" in query
+    assert "LIMIT 1" in query
+
+
+def test_stream_query_fetches_from_a_named_cursor_in_chunks(mock_connection):
+    mock_conn, mock_cursor = mock_connection
+    rows = [
+        ("Pulse", Decimal("100.00"), datetime(2023, 1, 1, tzinfo=timezone.utc)),
+        ("Watty", Decimal("10.00"), datetime(2023, 1, 2, tzinfo=timezone.utc)),
+        ("Pulse", Decimal("120.00"), datetime(2023, 1, 3, tzinfo=timezone.utc)),
+    ]
+    mock_cursor.fetchmany.side_effect = [rows[:2], rows[2:], []]
+    mock_cursor.description = [
+        MagicMock(type_code=25, precision=None, scale=None),
+        MagicMock(type_code=1700, precision=20, scale=2),
+        MagicMock(type_code=1184, precision=None, scale=None),
+    ]
+    for column, name in zip(mock_cursor.description, ["item", "price", "system_timestamp"], strict=True):
+        column.name = name
+
+    with patch("src.database_manager.get_db_connection", return_value=mock_conn):
+        chunks = stream_query("SELECT item, price, system_timestamp FROM item_prices", fetch_size=2, output="arrow")
+        # nothing is queried until the first chunk is asked for
+        mock_conn.cursor.assert_not_called()
+        tables = list(chunks)
+
+    assert mock_conn.cursor.call_args.kwargs["name"].startswith("stream_")
+    assert mock_cursor.itersize == 2
+    assert [table.num_rows for table in tables] == [2, 1]
+    assert tables[0].schema == tables[1].schema
+    assert tables[0].schema.field("price").type == pa.decimal128(20, 2)
+    assert pa.concat_tables(tables).to_pylist()[2] == {
+        "item": "Pulse",
+        "price": Decimal("120.00"),
+        "system_timestamp": datetime(2023, 1, 3, tzinfo=timezone.utc),
+    }
+    mock_conn.commit.assert_not_called()
+
+
+def test_stream_query_yields_rows_and_rejects_unknown_outputs(mock_connection):
+    mock_conn, mock_cursor = mock_connection
+    mock_cursor.fetchmany.side_effect = [[(1,), (2,)], [(3,)], []]
+
+    with patch("src.database_manager.get_db_connection", return_value=mock_conn):
+        assert list(stream_query("SELECT generate_series(1, 3)", fetch_size=2)) == [(1,), (2,), (3,)]
+
+    with pytest.raises(ValueError, match="polars"):
+        stream_query("SELECT 1", output="polars")
+
+
+def test_stream_query_fixes_inferred_types_from_the_first_chunk(mock_connection):
+    mock_conn, mock_cursor = mock_connection
+    # ROUND(...) is an unconstrained NUMERIC, its precision is not in the description
+    mock_cursor.fetchmany.side_effect = [[(None, Decimal("1.50"))], [("x", Decimal("12345.67"))], []]
+    mock_cursor.description = [
+        MagicMock(type_code=705, precision=None, scale=None),
+        MagicMock(type_code=1700, precision=None, scale=None),
+    ]
+    for column, name in zip(mock_cursor.description, ["label", "price_in_nok"], strict=True):
+        column.name = name
+
+    with patch("src.database_manager.get_db_connection", return_value=mock_conn):
+        tables = list(stream_query("SELECT label, ROUND(price, 2) FROM prices", fetch_size=1, output="arrow"))
+
+    assert [table.schema.field("price_in_nok").type for table in tables] == [pa.decimal128(38, 2)] * 2
+    # a column without values in the first chunk gets its type from the first chunk that has one
+    assert tables[1].schema.field("label").type == pa.string()
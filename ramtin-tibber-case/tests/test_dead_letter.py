@@ -0,0 +1,84 @@
+import json
+import os
+import sys
+from unittest.mock import patch
+
+import psycopg2
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.dead_letter import DEAD_LETTER_FILE_NAME, insert_isolating_failures, replay_dead_letters
+
+QUERY = "INSERT INTO currencies (currency_code, currency_name) VALUES %s ON CONFLICT DO NOTHING;"
+
+
+def rejecting(bad_codes, calls=None):
+    def insert(query, params_list, **kwargs):
+        if calls is not None:
+            calls.append(len(params_list))
+        if any(params[0] in bad_codes for params in params_list):
+            raise psycopg2.DataError("value too long for type character(3)")
+        return len(params_list)
+
+    return insert
+
+
+@pytest.fixture
+def spool_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("DEAD_LETTER_DIR", str(tmp_path))
+    return tmp_path
+
+
+@patch("src.dead_letter.batch_insert")
+def test_bad_rows_are_isolated_and_spooled_while_the_rest_is_inserted(mock_batch_insert, spool_dir):
+    params_list = [(f"C{i:02d}", "Currency") for i in range(16)]
+    params_list[5] = ("EURO", "Euro")
+    params_list[12] = ("DOLLAR", "Dollar")
+    calls = []
+    mock_batch_insert.side_effect = rejecting({"EURO", "DOLLAR"}, calls)
+
+    outcome = insert_isolating_failures(QUERY, params_list)
+
+    assert outcome.rows_inserted == 14
+    assert outcome.rejected == [5, 12]
+    # two bad rows in 16 take far fewer round trips than inserting row by row
+    assert len(calls) < 16
+    letters = [json.loads(line) for line in (spool_dir / DEAD_LETTER_FILE_NAME).read_text().splitlines()]
+    assert [letter["params"] for letter in letters] == [["EURO", "Euro"], ["DOLLAR", "Dollar"]]
+    assert letters[0]["query"] == QUERY
+    assert letters[0]["error"].startswith("DataError: value too long")
+
+
+@patch("src.dead_letter.batch_insert")
+def test_other_errors_are_raised_without_bisecting(mock_batch_insert, spool_dir):
+    mock_batch_insert.side_effect = psycopg2.OperationalError("server closed the connection")
+
+    with pytest.raises(psycopg2.OperationalError):
+        insert_isolating_failures(QUERY, [("NOK", "Norwegian krone"), ("SEK", "Swedish krona")])
+
+    assert mock_batch_insert.call_count == 1
+    assert not (spool_dir / DEAD_LETTER_FILE_NAME).exists()
+
+
+@patch("src.dead_letter.batch_insert")
+def test_bad_rows_fail_the_batch_when_dead_lettering_is_disabled(mock_batch_insert, monkeypatch):
+    monkeypatch.setenv("DEAD_LETTER_DIR", "")
+    mock_batch_insert.side_effect = rejecting({"EURO"})
+
+    with pytest.raises(psycopg2.DataError):
+        insert_isolating_failures(QUERY, [("NOK", "Norwegian krone"), ("EURO", "Euro")])
+
+
+@patch("src.dead_letter.batch_insert")
+def test_replay_inserts_fixed_rows_and_spools_the_rest_again(mock_batch_insert, spool_dir):
+    mock_batch_insert.side_effect = rejecting({"EURO", "DOLLAR"})
+    insert_isolating_failures(QUERY, [("NOK", "Norwegian krone"), ("EURO", "Euro"), ("DOLLAR", "Dollar")])
+
+    # the column was widened, only DOLLAR still fails
+    mock_batch_insert.side_effect = rejecting({"DOLLAR"})
+    assert replay_dead_letters() == (1, 1)
+
+    letters = [json.loads(line) for line in (spool_dir / DEAD_LETTER_FILE_NAME).read_text().splitlines()]
+    assert [letter["params"] for letter in letters] == [["DOLLAR", "Dollar"]]
+    assert list(spool_dir.glob("replaying-*.jsonl")) == []
+    assert replay_dead_letters(spool_dir / "empty") == (0, 0)
@@ -0,0 +1,143 @@
+import os
+import sys
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+pytest.importorskip("duckdb")
+
+from src import duckdb_backend
+from src.cross_rates import load_cross_rates
+from src.database_manager import (
+    batch_insert,
+    close_connection_pool,
+    database_setup,
+    execute_query,
+    get_latest_checkpoint,
+    reset_database,
+    savepoint,
+    storage_backend,
+    stream_query,
+    transaction,
+    update_checkpoint,
+)
+from src.load_csv import load_csv_files
+
+HEADER = "id,item,price,currency,created_at,updated_at,system_timestamp"
+ROWS = [
+    "123e4567-e89b-12d3-a456-426614174000,Pulse,100.00,NOK,"
+    "2023-01-01T00:00:00Z,2023-01-01T00:00:00Z,2023-01-01T00:00:00Z",
+    "123e4567-e89b-12d3-a456-426614174000,Pulse,120.00,NOK,"
+    "2023-01-01T00:00:00Z,2023-01-02T00:00:00Z,2023-01-02T00:00:00Z",
+    "123e4567-e89b-12d3-a456-426614174001,Watty,10.00,EUR,"
+    "2023-01-01T00:00:00Z,2023-01-01T00:00:00Z,2023-01-01T00:00:00Z",
+]
+
+
+@pytest.fixture
+def duckdb_database(monkeypatch, tmp_path):
+    monkeypatch.setenv("DB_BACKEND", "duckdb")
+    monkeypatch.setenv("DUCKDB_PATH", str(tmp_path / "tibber.duckdb"))
+    monkeypatch.setenv("METRICS_DIR", "")
+    database_setup()
+    batch_insert(
+        "INSERT INTO currencies (currency_code, currency_name, currency_symbol) VALUES %s",
+        [("NOK", "Norwegian Krone", "kr"), ("EUR", "Euro", "€")],
+    )
+    batch_insert(
+        "INSERT INTO currency_conversion_rates_base_nok (currency_code, rate, last_updated_at) VALUES %s",
+        [("NOK", Decimal("1"), "2023-01-01"), ("EUR", Decimal("0.0875"), "2023-01-01")],
+    )
+    yield tmp_path
+    close_connection_pool()
+
+
+def write_csv_files(directory, *files):
+    directory.mkdir()
+    for index, rows in enumerate(files, start=1):
+        (directory / f"batch{index}.csv").write_text("\n".join([HEADER, *rows]) + "\n")
+    return str(directory)
+
+
+def test_storage_backend_rejects_unknown_values(monkeypatch):
+    monkeypatch.setenv("DB_BACKEND", "sqlite")
+
+    with pytest.raises(ValueError, match="sqlite"):
+        storage_backend()
+
+
+def test_placeholders_and_postgres_spellings_are_translated():
+    assert duckdb_backend.to_duckdb_sql("SELECT %s * INTERVAL '1 microsecond'") == "SELECT to_microseconds(?)"
+    assert duckdb_backend.to_duckdb_sql("DO UPDATE SET updated_at = CURRENT_TIMESTAMP") == (
+        "DO UPDATE SET updated_at = now()"
+    )
+
+
+@pytest.mark.parametrize("mode", ["batch", "copy"])
+def test_csv_files_load_into_duckdb_and_views_convert_prices(duckdb_database, mode):
+    directory = write_csv_files(duckdb_database / "data", [ROWS[0], ROWS[2]], ROWS[:2])
+
+    load_csv_files(mode=mode, directory=directory)
+
+    assert execute_query("SELECT COUNT(*) FROM item_prices") == [(3,)]
+    assert get_latest_checkpoint("item_prices_ingestion")[1] == "2023-01-02T00:00:00+00:00"
+    prices = execute_query("SELECT item, price_in_nok FROM transaction_prices_in_nok ORDER BY system_timestamp, item")
+    assert prices == [("Pulse", Decimal("100.00")), ("Watty", Decimal("114.29")), ("Pulse", Decimal("120.00"))]
+    current = execute_query("SELECT item, price FROM item_prices_scd2 WHERE is_current ORDER BY item")
+    assert current == [("Pulse", Decimal("120.00")), ("Watty", Decimal("10.00"))]
+
+
+def test_stream_query_reads_duckdb_in_chunks(duckdb_database):
+    load_csv_files(directory=write_csv_files(duckdb_database / "data", ROWS))
+    query = "SELECT item, price FROM item_prices WHERE price > %s ORDER BY system_timestamp, item"
+
+    assert list(stream_query(query, (Decimal("50"),), fetch_size=1)) == [
+        ("Pulse", Decimal("100.00")),
+        ("Pulse", Decimal("120.00")),
+    ]
+    chunks = list(stream_query(query, (Decimal("0"),), fetch_size=2, output="pandas"))
+    assert sum(len(chunk) for chunk in chunks) == 3
+    assert list(chunks[0].columns) == ["item", "price"]
+
+
+def test_checkpoint_is_updated_in_place(duckdb_database):
+    update_checkpoint("item_prices_ingestion", "2023-01-01T00:00:00+00:00")
+    update_checkpoint("item_prices_ingestion", "2023-01-03T00:00:00+00:00")
+
+    assert get_latest_checkpoint("item_prices_ingestion")[1] == "2023-01-03T00:00:00+00:00"
+    assert execute_query("SELECT COUNT(*) FROM processing_checkpoints") == [(1,)]
+
+
+def test_transaction_rolls_back_and_savepoints_are_postgres_only(duckdb_database):
+    with pytest.raises(RuntimeError), transaction() as conn:
+        update_checkpoint("item_prices_ingestion", "2023-01-01T00:00:00+00:00", conn=conn)
+        raise RuntimeError("load failed")
+
+    assert get_latest_checkpoint("item_prices_ingestion") is None
+    with pytest.raises(ValueError, match="savepoints"), transaction() as conn, savepoint(conn):
+        pass
+    with pytest.raises(ValueError, match="Transactional"):
+        load_csv_files(transactional=True, directory=str(duckdb_database))
+
+    reset_database()
+    assert execute_query("SELECT COUNT(*) FROM information_schema.tables WHERE table_name = 'item_prices'") == [(0,)]
+
+
+def test_cross_rates_are_read_from_the_latest_anchor_day(duckdb_database):
+    batch_insert(
+        "INSERT INTO exchange_rates (base_currency, currency_code, rate_date, rate) VALUES %s",
+        [
+            ("NOK", "EUR", "2024-01-04", Decimal("0.086")),
+            ("NOK", "EUR", "2024-01-05", Decimal("0.087")),
+            ("NOK", "USD", "2024-01-05", Decimal("0.095")),
+        ],
+    )
+
+    # Saturday has no rates of its own, Friday's are the latest published
+    currencies, matrix = load_cross_rates("NOK", date(2024, 1, 6))
+
+    assert currencies == ["EUR", "NOK", "USD"]
+    assert matrix[0, 2] == pytest.approx(0.095 / 0.087, rel=1e-11)
+    assert load_cross_rates("NOK", date(2024, 1, 3)) is None
@@ -36,7 +36,7 @@ def mock_rates_data():
 
 def test_insert_currencies_success(mock_currencies_data):
     with patch("src.get_currencies_and_rates.get_currencies", return_value=mock_currencies_data):
-        with patch("src.get_currencies_and_rates.batch_insert") as mock_batch_insert:
+        with patch("src.dead_letter.batch_insert") as mock_batch_insert:
             mock_batch_insert.return_value = 3
 
             result = insert_currencies()
@@ -62,7 +62,7 @@ def test_insert_currencies_batch_processing():
         mock_data[currency_code] = {"name": f"Currency {i}", "symbol": f"${i}"}
 
     with patch("src.get_currencies_and_rates.get_currencies", return_value=mock_data):
-        with patch("src.get_currencies_and_rates.batch_insert") as mock_batch_insert:
+        with patch("src.dead_letter.batch_insert") as mock_batch_insert:
             mock_batch_insert.side_effect = [50, 50, 1]
 
             result = insert_currencies()
@@ -82,7 +82,7 @@ def test_insert_currencies_batch_processing():
 
 
 def test_insert_rates_success(mock_rates_data):
-    with patch("src.get_currencies_and_rates.batch_insert") as mock_batch_insert:
+    with patch("src.dead_letter.batch_insert") as mock_batch_insert:
         mock_batch_insert.return_value = 3
 
         result = insert_rates(mock_rates_data)
@@ -109,7 +109,7 @@ def test_insert_rates_batch_processing():
 
     mock_data = {"base": "NOK", "date": "2023-03-16", "rates": mock_rates}
 
-    with patch("src.get_currencies_and_rates.batch_insert") as mock_batch_insert:
+    with patch("src.dead_letter.batch_insert") as mock_batch_insert:
         mock_batch_insert.side_effect = [50, 50, 1]  # 3 batches: 50 + 50 + 1 = 101
 
         result = insert_rates(mock_data)
@@ -133,3 +133,17 @@ def test_insert_rates_batch_processing():
             assert isinstance(param[0], str)
             assert isinstance(param[1], float)
             assert param[2] == "2023-03-16"
+
+
+def test_get_currencies_and_rates_keeps_rates_history(mock_rates_data):
+    with patch("src.get_currencies_and_rates.insert_currencies", return_value=0):
+        with patch("src.get_currencies_and_rates.get_currency_conversion_rates", return_value=mock_rates_data):
+            with patch("src.get_currencies_and_rates.insert_rates", return_value=3):
+                with patch("src.get_currencies_and_rates.insert_exchange_rates") as mock_insert_exchange_rates:
+                    get_currencies_and_rates()
+
+    # only the NOK anchor is stored, the cross rates are derived when they are read
+    params_list = mock_insert_exchange_rates.call_args[0][0]
+    assert ("NOK", "USD", "2023-03-16", 0.095) in params_list
+    assert {base for base, _, _, _ in params_list} == {"NOK"}
+    assert len(params_list) == 3
@@ -0,0 +1,58 @@
+import os
+import sys
+from unittest.mock import patch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.ingestion_manifest import (
+    ManifestEntry,
+    compute_content_hash,
+    file_fingerprint,
+    filter_new_files,
+    is_already_ingested,
+)
+
+
+def make_entry(file_path):
+    fingerprint = file_fingerprint(file_path)
+    return ManifestEntry(
+        file_path,
+        fingerprint.file_size,
+        fingerprint.file_mtime_ns,
+        compute_content_hash(file_path),
+        2,
+        "2023-01-01T00:00:00+00:00",
+        "2023-01-02T00:00:00+00:00",
+    )
+
+
+def test_unchanged_file_is_skipped_without_reading(tmp_path):
+    csv_file = tmp_path / "batch1.csv"
+    csv_file.write_text("id,system_timestamp\n1,2023-01-01\n")
+    manifest = {str(csv_file): make_entry(str(csv_file))}
+
+    with patch("src.ingestion_manifest.compute_content_hash") as mock_hash:
+        assert is_already_ingested(str(csv_file), manifest)
+        mock_hash.assert_not_called()
+
+
+def test_touched_file_with_same_content_is_skipped(tmp_path):
+    csv_file = tmp_path / "batch1.csv"
+    csv_file.write_text("id,system_timestamp\n1,2023-01-01\n")
+    manifest = {str(csv_file): make_entry(str(csv_file))}
+    os.utime(csv_file, ns=(0, manifest[str(csv_file)].file_mtime_ns + 1_000_000))
+
+    with patch("src.ingestion_manifest.execute_query") as mock_execute_query:
+        assert is_already_ingested(str(csv_file), manifest)
+        assert "UPDATE ingestion_manifest" in mock_execute_query.call_args[0][0]
+
+
+def test_new_and_changed_files_are_kept(tmp_path):
+    unchanged = tmp_path / "batch1.csv"
+    changed = tmp_path / "batch2.csv"
+    new = tmp_path / "batch3.csv"
+    for csv_file in (unchanged, changed, new):
+        csv_file.write_text("id,system_timestamp\n1,2023-01-01\n")
+    manifest = {str(unchanged): make_entry(str(unchanged)), str(changed): make_entry(str(changed))}
+    changed.write_text("id,system_timestamp\n1,2023-01-01\n2,2023-01-02\n")
+
+    assert filter_new_files([str(unchanged), str(changed), str(new)], manifest) == [str(changed), str(new)]
@@ -0,0 +1,88 @@
+import os
+import sys
+import uuid
+from datetime import UTC, datetime, timedelta, timezone
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.key_index import KeyIndex, key_hashes, seed_key_index
+from src.load_csv import _insert_batches
+
+FIRST_ID = "123e4567-e89b-12d3-a456-426614174000"
+SECOND_ID = "123e4567-e89b-12d3-a456-426614174001"
+
+
+def item_prices(*keys):
+    timestamps = pd.Series(pd.to_datetime([timestamp for _, timestamp in keys], utc=True)).dt.as_unit("us")
+    return pd.DataFrame(
+        {
+            "id": [key_id for key_id, _ in keys],
+            "item": "Pulse",
+            "price": 10.0,
+            "currency": "NOK",
+            "created_at": timestamps,
+            "updated_at": timestamps,
+            "system_timestamp": timestamps,
+        }
+    )
+
+
+def test_hashes_match_between_parsed_chunks_and_database_rows():
+    from_database = key_hashes([uuid.UUID(FIRST_ID)], [datetime(2023, 1, 1, 1, tzinfo=timezone(timedelta(hours=1)))])
+    from_csv = item_prices((FIRST_ID.upper(), "2023-01-01T00:00:00Z"))
+
+    assert (key_hashes(from_csv["id"], from_csv["system_timestamp"]) == from_database).all()
+
+
+def test_new_rows_drops_known_keys_and_repeats_within_the_batch():
+    hashes = np.array([3, 1, 2, 1, 4], dtype=np.uint64)
+    index = KeyIndex(np.array([2], dtype=np.uint64))
+
+    assert index.new_rows(hashes).tolist() == [True, True, False, False, True]
+
+    index.add_pending(np.array([3], dtype=np.uint64))
+    index.discard_pending()
+    index.add_pending(np.array([4], dtype=np.uint64))
+    index.commit_pending()
+    assert index.new_rows(hashes).tolist() == [True, True, False, False, False]
+
+
+@patch("src.dead_letter.batch_insert")
+def test_insert_batches_only_learns_keys_of_batches_that_went_through(mock_batch_insert):
+    data_frame = item_prices(
+        (FIRST_ID, "2023-01-01T00:00:00Z"),
+        (FIRST_ID, "2023-01-01T00:00:00Z"),
+        (SECOND_ID, "2023-01-01T00:00:00Z"),
+        (SECOND_ID, "2023-01-02T00:00:00Z"),
+    )
+    known = item_prices((SECOND_ID, "2023-01-01T00:00:00Z"))
+    index = KeyIndex(key_hashes(known["id"], known["system_timestamp"]))
+    mock_batch_insert.side_effect = [1, RuntimeError("connection lost")]
+
+    rows_inserted, batches_failed = _insert_batches(data_frame, batch_size=1, key_index=index)
+
+    sent = [call.args[1][0][0] for call in mock_batch_insert.call_args_list]
+    assert sent == [FIRST_ID, SECOND_ID]
+    assert (rows_inserted, batches_failed) == (1, 1)
+    # the failed batch is sent again by the next run
+    assert len(index) == 2
+    retry = item_prices((SECOND_ID, "2023-01-02T00:00:00Z"))
+    assert index.new_rows(key_hashes(retry["id"], retry["system_timestamp"])).all()
+
+
+@patch("src.key_index.stream_query")
+def test_index_is_seeded_from_keys_newer_than_the_checkpoint(mock_stream_query):
+    chunks = [
+        pd.DataFrame({"id": [FIRST_ID], "system_timestamp": [datetime(2023, 1, 2, tzinfo=UTC)]}),
+        pd.DataFrame({"id": [SECOND_ID], "system_timestamp": [datetime(2023, 1, 2, tzinfo=UTC)]}),
+    ]
+    mock_stream_query.return_value = iter(chunks)
+
+    index = seed_key_index("2023-01-01T00:00:00+00:00")
+
+    assert len(index) == 2
+    assert mock_stream_query.call_args[0][1] == ("2023-01-01T00:00:00+00:00",)
+    assert len(seed_key_index(None)) == 0
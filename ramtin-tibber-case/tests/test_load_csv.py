@@ -2,15 +2,27 @@ import os
 import sys
 import pandas as pd
 import pytest
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from unittest.mock import MagicMock, patch
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 sys.modules["database_manager"] = MagicMock()
 
+from src.database_manager import CopyResult
 from src.load_csv import (
     natural_sort_key,
+    copy_csv_file_into_database,
+    copy_data_into_database,
+    FileLoadResult,
     insert_data_into_database,
+    iter_csv_chunks,
+    load_csv_files,
+    load_csv_files_in_parallel,
+    stream_csv_file_into_database,
+    _load_file,
+    _prefetch,
 )
 
 
@@ -29,6 +41,21 @@ def mock_dataframe_with_timestamps():
     )
 
 
+@pytest.fixture
+def csv_file(tmp_path):
+    file_path = tmp_path / "batch1.csv"
+    file_path.write_text(
+        "id,item,price,currency,created_at,updated_at,system_timestamp\n"
+        "11111111-1111-1111-1111-111111111111,Pulse,199.99,NOK,"
+        "2023-01-01T00:00:00+01:00,2023-01-01T00:05:00+01:00,2023-01-01T00:00:00+00:00\n"
+        "22222222-2222-2222-2222-222222222222,Smart Pulse,249.50,EUR,"
+        "2023-01-02T00:00:00+01:00,2023-01-02T00:05:00+01:00,2023-01-02T00:00:00+00:00\n"
+        "33333333-3333-3333-3333-333333333333,Pulse,10.00,USD,"
+        "2023-01-03T00:00:00+01:00,2023-01-03T00:05:00+01:00,2023-01-03T01:00:00+01:00\n"
+    )
+    return str(file_path)
+
+
 def test_natural_sort_key_mixed_content():
     assert natural_sort_key("abc123def") == ["abc", 123, "def"]
     assert natural_sort_key("abc") == ["abc"]
@@ -42,12 +69,12 @@ def test_natural_sort_key_for_sorting():
 
 
 def test_insert_empty_dataframe():
-    with patch("src.load_csv.batch_insert") as mock_batch_insert:
+    with patch("src.dead_letter.batch_insert") as mock_batch_insert:
         insert_data_into_database(pd.DataFrame())
         mock_batch_insert.assert_not_called()
 
 
-@patch("src.load_csv.batch_insert")
+@patch("src.dead_letter.batch_insert")
 @patch("src.load_csv.update_checkpoint")
 def test_insert_data_into_database(mock_update_checkpoint, mock_batch_insert, mock_dataframe_with_timestamps):
     mock_batch_insert.return_value = 3  # 3 rows inserted
@@ -59,3 +86,141 @@ def test_insert_data_into_database(mock_update_checkpoint, mock_batch_insert, mo
 
     # Check that update_checkpoint was called with the latest timestamp
     mock_update_checkpoint.assert_called_once_with("item_prices_ingestion", "2023-01-03T00:00:00")
+
+
+@patch("src.load_csv.copy_insert")
+@patch("src.load_csv.update_checkpoint")
+def test_copy_data_into_database(mock_update_checkpoint, mock_copy_insert, mock_dataframe_with_timestamps):
+    mock_copy_insert.return_value = CopyResult(3, 3, 3)
+
+    copy_data_into_database(mock_dataframe_with_timestamps)
+
+    table_name, columns, csv_buffer, conflict_columns = mock_copy_insert.call_args[0]
+    assert table_name == "item_prices"
+    assert conflict_columns == ["id", "system_timestamp"]
+    copied = pd.read_csv(csv_buffer)
+    assert list(copied.columns) == columns
+    assert len(copied) == 3
+    mock_update_checkpoint.assert_called_once_with("item_prices_ingestion", "2023-01-03T00:00:00")
+
+
+@patch("src.load_csv.copy_insert")
+@patch("src.load_csv.update_checkpoint")
+def test_copy_csv_file_filters_on_checkpoint(mock_update_checkpoint, mock_copy_insert, tmp_path):
+    csv_file = tmp_path / "batch1.csv"
+    csv_file.write_text("id,item,price,currency,created_at,updated_at,system_timestamp\n")
+    latest = pd.Timestamp("2023-01-03T00:00:00+00:00")
+    mock_copy_insert.return_value = CopyResult(3, 2, 1, latest)
+
+    copy_csv_file_into_database(str(csv_file), "2023-01-01T00:00:00+00:00")
+
+    kwargs = mock_copy_insert.call_args[1]
+    assert kwargs["where_clause"] == "system_timestamp > %s"
+    assert kwargs["params"] == ("2023-01-01T00:00:00+00:00",)
+    mock_update_checkpoint.assert_called_once_with("item_prices_ingestion", latest.isoformat(), conn=None)
+
+
+def test_load_csv_files_rejects_unknown_mode():
+    with pytest.raises(ValueError):
+        load_csv_files(mode="bogus")
+
+
+def test_iter_csv_chunks_filters_each_chunk(csv_file):
+    chunks = list(iter_csv_chunks(csv_file, "2023-01-01T00:00:00+00:00"))
+
+    assert sum(chunk.rows_parsed for chunk in chunks) == 3
+    data_frame = pd.concat([chunk.data_frame for chunk in chunks])
+    assert list(data_frame["id"]) == ["22222222-2222-2222-2222-222222222222", "33333333-3333-3333-3333-333333333333"]
+    assert chunks[0].min_timestamp == pd.Timestamp("2023-01-01T00:00:00", tz="UTC")
+
+
+@patch("src.dead_letter.batch_insert")
+@patch("src.load_csv.update_checkpoint")
+def test_stream_csv_file_updates_checkpoint_once(mock_update_checkpoint, mock_batch_insert, csv_file):
+    mock_batch_insert.side_effect = lambda query, params_list, **kwargs: len(params_list)
+
+    result = stream_csv_file_into_database(csv_file)
+
+    assert result.rows_inserted == 3
+    assert result.succeeded
+    assert result.rows_parsed == 3
+    assert result.min_timestamp == "2023-01-01T00:00:00+00:00"
+    mock_update_checkpoint.assert_called_once_with("item_prices_ingestion", "2023-01-03T00:00:00+00:00", conn=None)
+
+
+def test_prefetch_preserves_order_and_propagates_errors():
+    assert list(_prefetch(iter(range(5)), depth=2)) == [0, 1, 2, 3, 4]
+
+    def failing():
+        yield 1
+        raise RuntimeError("boom")
+
+    consumed = []
+    with pytest.raises(RuntimeError, match="boom"):
+        for item in _prefetch(failing()):
+            consumed.append(item)
+    assert consumed == [1]
+
+
+@patch("src.load_csv.ProcessPoolExecutor", lambda mp_context, **kwargs: ThreadPoolExecutor(**kwargs))
+@patch("src.load_csv.get_latest_checkpoint", return_value=None)
+@patch("src.load_csv.update_checkpoint")
+def test_parallel_load_advances_global_checkpoint_over_completed_prefix(mock_update_checkpoint, _):
+    results = {
+        "batch1.csv": FileLoadResult("batch1.csv", 2, "2023-01-02T00:00:00+00:00", True),
+        "batch2.csv": FileLoadResult("batch2.csv", 0, None, False),
+        "batch3.csv": FileLoadResult("batch3.csv", 5, "2023-01-09T00:00:00+00:00", True),
+    }
+
+    with patch("src.load_csv._load_file_in_worker", side_effect=lambda path, *args: results[path]):
+        assert not load_csv_files_in_parallel(list(results), workers=3)
+
+    # batch2 failed, so the global checkpoint must not move past batch1 even though batch3 finished
+    mock_update_checkpoint.assert_called_once_with("item_prices_ingestion", "2023-01-02T00:00:00+00:00")
+
+
+@patch("src.load_csv.ensure_item_prices_partitions")
+@patch("src.load_csv.migrate_item_prices")
+@patch("src.load_csv.get_latest_checkpoint", return_value=None)
+def test_sequential_load_stops_after_a_failed_file(*_):
+    results = {
+        "batch1.csv": FileLoadResult("batch1.csv", 0, None, False),
+        "batch2.csv": FileLoadResult("batch2.csv", 5, "2023-01-09T00:00:00+00:00", True),
+    }
+
+    with patch("src.load_csv._load_file", side_effect=lambda path, *args, **kwargs: results[path]) as mock_load:
+        assert not load_csv_files(files=list(results), use_manifest=False)
+
+    # batch2 would advance the checkpoint past the rows of batch1, which are loaded again next run
+    assert [call[0][0] for call in mock_load.call_args_list] == ["batch1.csv"]
+
+
+@patch("src.dead_letter.batch_insert")
+@patch("src.load_csv.update_checkpoint")
+def test_transactional_load_holds_checkpoint_when_a_savepoint_fails(
+    mock_update_checkpoint, mock_batch_insert, csv_file
+):
+    mock_conn = MagicMock()
+    mock_cursor = mock_conn.cursor.return_value.__enter__.return_value
+
+    @contextmanager
+    def fake_transaction():
+        yield mock_conn
+
+    def insert(query, params_list, **kwargs):
+        assert kwargs["conn"] is mock_conn
+        if params_list[0][0].startswith("2"):
+            raise RuntimeError("bad batch")
+        return len(params_list)
+
+    mock_batch_insert.side_effect = insert
+
+    with patch("src.load_csv.transaction", fake_transaction):
+        result = _load_file(csv_file, "batch", 100, None, None, transactional=True, savepoint_size=1)
+
+    assert result.rows_inserted == 2
+    assert not result.succeeded
+    mock_update_checkpoint.assert_not_called()
+    statements = [call[0][0] for call in mock_cursor.execute.call_args_list]
+    assert statements.count("SAVEPOINT sub_batch;") == 3
+    assert statements.count("ROLLBACK TO SAVEPOINT sub_batch;") == 1
@@ -0,0 +1,97 @@
+import json
+import os
+import sys
+from datetime import UTC, datetime
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src import metrics
+from src.database_manager import batch_insert
+from src.load_csv import iter_csv_chunks
+from src.metrics import MetricsRegistry
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = MetricsRegistry(buckets=(0.1, 1.0))
+    monkeypatch.setattr(metrics, "REGISTRY", registry)
+    return registry
+
+
+def test_prometheus_text_has_cumulative_buckets_and_escaped_labels(registry):
+    registry.increment("csv_rows_parsed_total", 3)
+    registry.increment("csv_rows_parsed_total", 2)
+    registry.set_gauge("checkpoint_lag_seconds", 12.5, checkpoint='a"b')
+    for value in (0.05, 0.5, 2.0):
+        registry.observe("db_insert_duration_seconds", value, method="batch")
+
+    text = registry.to_prometheus_text()
+
+    assert "# TYPE tibber_csv_rows_parsed_total counter\ntibber_csv_rows_parsed_total 5.0\n" in text
+    assert 'tibber_checkpoint_lag_seconds{checkpoint="a\\"b"} 12.5' in text
+    assert (
+        'tibber_db_insert_duration_seconds_bucket{method="batch",le="0.1"} 1.0\n'
+        'tibber_db_insert_duration_seconds_bucket{method="batch",le="1.0"} 2.0\n'
+        'tibber_db_insert_duration_seconds_bucket{method="batch",le="+Inf"} 3.0\n'
+        'tibber_db_insert_duration_seconds_sum{method="batch"} 2.55\n'
+        'tibber_db_insert_duration_seconds_count{method="batch"} 3.0\n'
+    ) in text
+
+
+def test_snapshot_from_a_worker_merges_into_the_parent(registry):
+    worker = MetricsRegistry(buckets=(0.1, 1.0))
+    worker.increment("db_rows_inserted_total", 4, table="item_prices", method="copy")
+    worker.observe("csv_parse_duration_seconds", 0.5, unit="chunk")
+    registry.increment("db_rows_inserted_total", 1, table="item_prices", method="copy")
+    registry.observe("csv_parse_duration_seconds", 0.05, unit="chunk")
+
+    registry.merge(worker.drain())
+
+    assert registry.counter_value("db_rows_inserted_total", table="item_prices", method="copy") == 5
+    assert worker.snapshot() == {"counters": [], "gauges": [], "histograms": []}
+    parse = registry.summary()["histograms"]['csv_parse_duration_seconds{unit="chunk"}']
+    assert parse["count"] == 2
+    assert parse["max"] == 0.5
+
+
+def test_batch_insert_records_latency_and_conflict_skip_ratio(registry):
+    mock_conn = MagicMock()
+    mock_conn.cursor.return_value.__enter__.return_value.rowcount = 3
+
+    with patch("src.database_manager.execute_values"):
+        batch_insert(
+            "INSERT INTO item_prices (id) VALUES (%s) ON CONFLICT DO NOTHING", [(1,), (2,), (3,), (4,)], conn=mock_conn
+        )
+
+    summary = registry.summary()
+    assert summary["counters"]['db_rows_attempted_total{method="batch",table="item_prices"}'] == 4
+    assert summary["gauges"]['db_conflict_skip_ratio{method="batch",table="item_prices"}'] == 0.25
+    assert summary["histograms"]['db_insert_duration_seconds{method="batch"}']["count"] == 1
+
+
+def test_csv_chunks_count_parsed_and_filtered_rows(registry, tmp_path):
+    csv_path = tmp_path / "batch1.csv"
+    rows = [
+        f"123e4567-e89b-12d3-a456-42661417400{day},Pulse,10.00,NOK,{timestamp},{timestamp},{timestamp}"
+        for day, timestamp in ((0, "2023-01-01T00:00:00Z"), (1, "2023-01-02T00:00:00Z"))
+    ]
+    csv_path.write_text("\n".join(["id,item,price,currency,created_at,updated_at,system_timestamp", *rows]) + "\n")
+
+    list(iter_csv_chunks(str(csv_path), "2023-01-01T00:00:00+00:00"))
+
+    assert registry.counter_value("csv_rows_parsed_total") == 2
+    assert registry.counter_value("csv_rows_filtered_total") == 1
+    assert registry.summary()["histograms"]['csv_parse_duration_seconds{unit="chunk"}']["count"] == 1
+
+
+def test_export_writes_prometheus_file_and_run_summary(registry, tmp_path):
+    registry.increment("vatcomply_requests_total", endpoint="/rates", outcome="cache")
+
+    summary_path = metrics.export_metrics(datetime(2024, 1, 1, tzinfo=UTC), tmp_path)
+
+    assert summary_path == tmp_path / "run-20240101T000000Z.json"
+    summary = json.loads(summary_path.read_text())
+    assert summary["counters"] == {'vatcomply_requests_total{endpoint="/rates",outcome="cache"}': 1}
+    assert "tibber_vatcomply_requests_total" in (tmp_path / metrics.PROMETHEUS_FILE_NAME).read_text()
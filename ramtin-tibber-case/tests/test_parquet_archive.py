@@ -0,0 +1,110 @@
+import os
+import sys
+from datetime import UTC, datetime
+from unittest.mock import patch
+
+import pyarrow.parquet as pq
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.csv_schema import read_item_prices_table
+from src.database_manager import CopyResult
+from src.load_csv import copy_csv_file_into_database, stream_csv_file_into_database
+from src.parquet_archive import archive_chunk, archive_csv_file, read_archive
+
+
+@pytest.fixture
+def csv_file(tmp_path):
+    file_path = tmp_path / "batch1.csv"
+    file_path.write_text(
+        "id,item,price,currency,created_at,updated_at,system_timestamp\n"
+        "11111111-1111-1111-1111-111111111111,Pulse,199.99,NOK,"
+        "2023-01-01T00:00:00+01:00,2023-01-01T00:05:00+01:00,2023-01-01T23:30:00+00:00\n"
+        "22222222-2222-2222-2222-222222222222,Smart Pulse,249.50,EUR,"
+        "2023-01-02T00:00:00+01:00,2023-01-02T00:05:00+01:00,2023-01-02T00:30:00+01:00\n"
+        "33333333-3333-3333-3333-333333333333,Pulse,10.00,USD,"
+        "2023-01-03T00:00:00+01:00,2023-01-03T00:05:00+01:00,2023-01-03T12:00:00+00:00\n"
+    )
+    return str(file_path)
+
+
+CHUNK_FILE_NAME = "batch1-20230101T233000000000Z-20230103T120000000000Z-0-0.parquet"
+
+
+def archived_files(directory):
+    return sorted(str(path.relative_to(directory)) for path in directory.rglob("*.parquet"))
+
+
+def test_chunks_are_partitioned_by_utc_date_and_replays_overwrite(csv_file, tmp_path):
+    archive = tmp_path / "archive"
+    _, table = read_item_prices_table(csv_file)
+
+    archive_chunk(table, archive, csv_file, 0)
+    archive_chunk(table, archive, csv_file, 0)
+
+    assert archived_files(archive) == [
+        f"system_date=2023-01-01/{CHUNK_FILE_NAME}",
+        f"system_date=2023-01-03/{CHUNK_FILE_NAME}",
+    ]
+    assert read_archive(archive).num_rows == 3
+    metadata = pq.ParquetFile(archive / f"system_date=2023-01-01/{CHUNK_FILE_NAME}").metadata
+    assert metadata.row_group(0).column(0).compression == "ZSTD"
+    assert metadata.row_group(0).column(6).statistics.has_min_max
+
+
+def test_read_archive_projects_columns_and_time_range(csv_file, tmp_path):
+    archive = tmp_path / "archive"
+    archive_csv_file(csv_file, archive)
+
+    table = read_archive(
+        archive,
+        columns=["id", "price"],
+        start=datetime(2023, 1, 1, 23, 30, tzinfo=UTC),
+        end=datetime(2023, 1, 3, tzinfo=UTC),
+    )
+
+    assert table.column_names == ["id", "price"]
+    assert table["id"].to_pylist() == ["11111111-1111-1111-1111-111111111111", "22222222-2222-2222-2222-222222222222"]
+
+
+def test_reload_of_a_grown_file_keeps_the_rows_archived_before(csv_file, tmp_path):
+    archive = tmp_path / "archive"
+    archive_csv_file(csv_file, archive)
+    with open(csv_file, "a") as grown:
+        grown.write(
+            "44444444-4444-4444-4444-444444444444,Pulse,12.00,USD,"
+            "2023-01-03T00:00:00+01:00,2023-01-03T00:05:00+01:00,2023-01-03T18:00:00+00:00\n"
+        )
+
+    archive_csv_file(csv_file, archive, "2023-01-03T12:00:00+00:00")
+
+    assert read_archive(archive).num_rows == 4
+
+
+@patch("src.dead_letter.batch_insert")
+@patch("src.load_csv.update_checkpoint")
+def test_stream_csv_file_archives_the_rows_it_keeps(mock_update_checkpoint, mock_batch_insert, csv_file, tmp_path):
+    mock_batch_insert.side_effect = lambda query, params_list, **kwargs: len(params_list)
+    archive = tmp_path / "archive"
+
+    result = stream_csv_file_into_database(csv_file, "2023-01-01T23:30:00+00:00", archive_dir=str(archive))
+
+    assert result.succeeded
+    assert archived_files(archive) == [
+        "system_date=2023-01-03/batch1-20230103T120000000000Z-20230103T120000000000Z-0-0.parquet"
+    ]
+    assert read_archive(archive)["id"].to_pylist() == ["33333333-3333-3333-3333-333333333333"]
+
+
+@patch("src.load_csv.copy_insert")
+@patch("src.load_csv.update_checkpoint")
+@patch("src.load_csv.archive_csv_file", side_effect=OSError("disk full"))
+def test_failed_archive_holds_the_copy_checkpoint_back(
+    mock_archive, mock_update_checkpoint, mock_copy_insert, csv_file
+):
+    mock_copy_insert.return_value = CopyResult(3, 3, 3, datetime(2023, 1, 3, 12, tzinfo=UTC))
+
+    result = copy_csv_file_into_database(csv_file, archive_dir="archive")
+
+    assert not result.succeeded
+    mock_update_checkpoint.assert_not_called()
@@ -0,0 +1,166 @@
+import json
+import os
+import sys
+import threading
+from collections import Counter
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.rate_backfill import backfill_exchange_rates, date_range
+
+RATES = {"EUR": 0.087, "USD": 0.095, "NOK": 1.0}
+
+
+class VatcomplyStandIn(BaseHTTPRequestHandler):
+    """Replays the shape of vatcomply's /rates responses, failing the first attempt for some days."""
+
+    calls: Counter = Counter()
+    flaky_dates: dict[str, int] = {}
+
+    def do_GET(self):  # noqa: N802
+        query = parse_qs(urlparse(self.path).query)
+        base, requested = query["base"][0], query["date"][0]
+        attempt = self.calls[(base, requested)]
+        self.calls[(base, requested)] += 1
+
+        if attempt == 0 and requested in self.flaky_dates:
+            self.send_response(self.flaky_dates[requested])
+            self.send_header("Retry-After", "0")
+            self.end_headers()
+            return
+
+        # weekends are answered with the rates of the preceding Friday
+        published = date.fromisoformat(requested)
+        published -= timedelta(days=max(0, published.weekday() - 4))
+        body = json.dumps({"date": published.isoformat(), "base": base, "rates": RATES}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stand_in_server(monkeypatch, tmp_path):
+    VatcomplyStandIn.calls = Counter()
+    VatcomplyStandIn.flaky_dates = {"2024-01-03": 503, "2024-01-04": 429}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), VatcomplyStandIn)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv("VATCOMPLY_BASE_URL", f"http://127.0.0.1:{server.server_port}")
+    monkeypatch.setenv("VATCOMPLY_CACHE_DIR", str(tmp_path / "cache"))
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_date_range_is_inclusive():
+    assert list(date_range(date(2024, 1, 30), date(2024, 2, 1))) == [
+        date(2024, 1, 30),
+        date(2024, 1, 31),
+        date(2024, 2, 1),
+    ]
+
+
+@patch("src.rate_backfill.batch_insert")
+def test_backfill_retries_and_bulk_inserts_published_days(mock_batch_insert, stand_in_server):
+    inserted = []
+
+    def insert(query, params_list, **kwargs):
+        inserted.extend(params_list)
+        return len(params_list)
+
+    mock_batch_insert.side_effect = insert
+
+    # 2024-01-01 is a Monday, so the range ends on a weekend answered with Friday's rates
+    result = backfill_exchange_rates(
+        ["NOK", "EUR"],
+        date(2024, 1, 1),
+        date(2024, 1, 7),
+        concurrency=4,
+        requests_per_second=None,
+        backoff_seconds=0,
+        derive_cross_rates=False,
+    )
+
+    assert result.requests_made == 14
+    assert result.requests_failed == 0
+    assert VatcomplyStandIn.calls[("NOK", "2024-01-03")] == 2
+    assert VatcomplyStandIn.calls[("EUR", "2024-01-04")] == 2
+
+    # Saturday and Sunday collapse onto Friday, so each base has five published days
+    assert len(inserted) == len({(base, code, day) for base, code, day, _ in inserted}) == 2 * 5 * len(RATES)
+    assert ("EUR", "USD", "2024-01-05", 0.095) in inserted
+    assert "ON CONFLICT (base_currency, currency_code, rate_date)" in mock_batch_insert.call_args[0][0]
+
+
+@patch("src.rate_backfill.batch_insert")
+def test_backfill_gives_up_after_max_retries(mock_batch_insert, stand_in_server):
+    mock_batch_insert.side_effect = lambda query, params_list, **kwargs: len(params_list)
+    VatcomplyStandIn.flaky_dates = {"2024-01-02": 503}
+
+    result = backfill_exchange_rates(
+        ["NOK"],
+        date(2024, 1, 1),
+        date(2024, 1, 2),
+        requests_per_second=None,
+        max_retries=0,
+        backoff_seconds=0,
+        derive_cross_rates=False,
+    )
+
+    assert result.requests_failed == 1
+    assert result.rows_inserted == len(RATES)
+
+
+@patch("src.rate_backfill.batch_insert")
+def test_backfill_rerun_is_served_from_cache(mock_batch_insert, stand_in_server):
+    mock_batch_insert.side_effect = lambda query, params_list, **kwargs: len(params_list)
+    VatcomplyStandIn.flaky_dates = {}
+
+    for _ in range(2):
+        backfill_exchange_rates(["NOK"], date(2024, 1, 1), date(2024, 1, 5), requests_per_second=None)
+
+    assert sum(VatcomplyStandIn.calls.values()) == 5
+
+
+@patch("src.rate_backfill.batch_insert")
+def test_unexpected_error_fails_only_its_day(mock_batch_insert):
+    mock_batch_insert.side_effect = lambda query, params_list, **kwargs: len(params_list)
+
+    async def fetch(base_currency, rate_date, *args):
+        if rate_date == date(2024, 1, 2):
+            raise json.JSONDecodeError("Expecting value", "<html>", 0)
+        return {"date": rate_date.isoformat(), "base": base_currency, "rates": RATES}
+
+    with patch("src.rate_backfill.fetch_rates", side_effect=fetch):
+        result = backfill_exchange_rates(
+            ["NOK"], date(2024, 1, 1), date(2024, 1, 3), requests_per_second=None, derive_cross_rates=False
+        )
+
+    assert result.requests_failed == 1
+    assert result.rows_inserted == 2 * len(RATES)
+
+
+@patch("src.rate_backfill.batch_insert")
+def test_derived_cross_rates_store_only_one_anchor(mock_batch_insert):
+    mock_batch_insert.side_effect = lambda query, params_list, **kwargs: len(params_list)
+
+    with pytest.raises(ValueError, match="one anchor currency"):
+        backfill_exchange_rates(["NOK", "EUR"], date(2024, 1, 1), date(2024, 1, 2))
+
+    async def fetch(base_currency, rate_date, *args):
+        return {"date": rate_date.isoformat(), "base": base_currency, "rates": RATES}
+
+    with patch("src.rate_backfill.fetch_rates", side_effect=fetch):
+        result = backfill_exchange_rates(["NOK"], date(2024, 1, 1), date(2024, 1, 2), requests_per_second=None)
+
+    assert result.rows_inserted == 2 * len(RATES)
+    assert {params[0] for params in mock_batch_insert.call_args[0][1]} == {"NOK"}
@@ -0,0 +1,71 @@
+import os
+import sys
+import tracemalloc
+import uuid
+from decimal import Decimal
+
+import pandas as pd
+import pyarrow as pa
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.csv_schema import ITEM_PRICES_SCHEMA, to_data_frame
+from src.load_csv import ITEM_PRICES_COLUMNS
+from src.row_feed import RowFeed, arrow_csv_buffer
+
+
+def make_item_prices_frame(rows):
+    timestamps = pd.date_range("2025-03-01", periods=rows, freq="min", tz="UTC")
+    table = pa.table(
+        {
+            "id": [str(uuid.UUID(int=i)) for i in range(rows)],
+            "item": pa.array(["Pulse", "Smart Pulse"] * (rows // 2)).dictionary_encode(),
+            "price": pa.array([Decimal("199.99")] * rows, pa.decimal128(10, 2)),
+            "currency": pa.array(["NOK", "EUR"] * (rows // 2)).dictionary_encode(),
+            "created_at": timestamps,
+            "updated_at": timestamps,
+            "system_timestamp": timestamps,
+        }
+    ).cast(ITEM_PRICES_SCHEMA)
+    return to_data_frame(table)
+
+
+def test_row_feed_encodes_timestamps_and_decimals_as_integers():
+    data_frame = make_item_prices_frame(2)
+    row_feed = RowFeed(data_frame, ITEM_PRICES_COLUMNS)
+
+    ((first_row, second_row),) = row_feed.batches(10)
+
+    assert first_row[:4] == (str(uuid.UUID(int=0)), "Pulse", 19999, "NOK")
+    assert first_row[6] == 1740787200000000  # 2025-03-01T00:00:00Z in microseconds
+    assert second_row[6] - first_row[6] == 60_000_000
+    assert "(%s::numeric / 100)" in row_feed.template
+    assert row_feed.template.count("INTERVAL '1 microsecond'") == 3
+
+
+def test_row_feed_allocates_less_than_object_array_rows():
+    data_frame = make_item_prices_frame(20_000)
+
+    def peak_bytes_per_row(build_rows):
+        tracemalloc.start()
+        rows = build_rows()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        assert len(rows) == len(data_frame)
+        return peak / len(rows)
+
+    object_array_rows = peak_bytes_per_row(lambda: [tuple(row) for row in data_frame.values])
+    row_feed_rows = peak_bytes_per_row(
+        lambda: [row for batch in RowFeed(data_frame, ITEM_PRICES_COLUMNS).batches(100) for row in batch]
+    )
+
+    assert row_feed_rows < object_array_rows / 2
+
+
+def test_arrow_csv_buffer_decodes_categoricals():
+    data_frame = make_item_prices_frame(2)
+
+    copied = pd.read_csv(arrow_csv_buffer(data_frame, ITEM_PRICES_COLUMNS))
+
+    assert list(copied.columns) == ITEM_PRICES_COLUMNS
+    assert list(copied["currency"]) == ["NOK", "EUR"]
+    assert list(copied["price"]) == [199.99, 199.99]
@@ -0,0 +1,91 @@
+import os
+import sys
+import threading
+from unittest.mock import patch
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.main import pipeline_stages
+from src.scheduler import Stage, critical_path, run_stages
+
+
+def test_independent_stages_overlap_and_dependents_wait():
+    # both stages only get past the barrier if they run at the same time
+    barrier = threading.Barrier(2, timeout=5)
+    order = []
+
+    def stage(name, wait=False):
+        def run():
+            if wait:
+                barrier.wait()
+            order.append(name)
+
+        return run
+
+    stages = [
+        Stage("currencies", stage("currencies", wait=True)),
+        Stage("rates", stage("rates"), ("currencies",)),
+        Stage("csv_files", stage("csv_files", wait=True)),
+        Stage("nok_prices", stage("nok_prices"), ("rates", "csv_files")),
+    ]
+
+    results = run_stages(stages)
+
+    assert all(result.succeeded for result in results.values())
+    assert order.index("rates") > order.index("currencies")
+    assert order[-1] == "nok_prices"
+    assert critical_path(stages, results)[-1] == "nok_prices"
+
+
+def test_failed_stage_skips_its_dependents_and_is_reraised_after_the_others():
+    ran = []
+
+    def fail():
+        raise RuntimeError("vatcomply is down")
+
+    stages = [
+        Stage("currencies", fail),
+        Stage("rates", lambda: ran.append("rates"), ("currencies",)),
+        Stage("nok_prices", lambda: ran.append("nok_prices"), ("rates",)),
+        Stage("csv_files", lambda: ran.append("csv_files")),
+    ]
+
+    with pytest.raises(RuntimeError, match="vatcomply is down"):
+        run_stages(stages)
+
+    assert ran == ["csv_files"]
+
+
+@pytest.mark.parametrize(
+    ("stages", "message"),
+    [
+        ([Stage("a", print, ("b",)), Stage("b", print, ("a",))], "cycle"),
+        ([Stage("a", print, ("missing",))], "unknown"),
+        ([Stage("a", print), Stage("a", print)], "unique"),
+    ],
+)
+def test_invalid_graphs_are_rejected_before_anything_runs(stages, message):
+    with pytest.raises(ValueError, match=message):
+        run_stages(stages)
+
+
+def test_pipeline_stages_only_wait_for_setup_after_a_reset():
+    without_reset = {stage.name: stage.depends_on for stage in pipeline_stages(False, None)}
+    with_reset = {stage.name: stage.depends_on for stage in pipeline_stages(True, "2024-01-01")}
+
+    assert without_reset == {
+        "currencies": (),
+        "rates": ("currencies",),
+        "csv_files": (),
+        "nok_prices": ("rates", "csv_files"),
+    }
+    assert with_reset["csv_files"] == ("setup",)
+    assert with_reset["backfill"] == ("setup",)
+
+
+def test_csv_files_stage_fails_when_a_file_was_not_loaded():
+    stages = {stage.name: stage for stage in pipeline_stages(False, None)}
+
+    with patch("src.main.load_csv_files", return_value=False), pytest.raises(RuntimeError, match="CSV"):
+        stages["csv_files"].run()
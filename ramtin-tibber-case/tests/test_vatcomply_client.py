@@ -0,0 +1,90 @@
+import json
+import os
+import sys
+import threading
+from collections import Counter
+from datetime import UTC, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.vatcomply_client import close_session, get_currencies_json, get_rates_json
+
+ETAG = '"rates-v1"'
+
+
+class ConditionalStandIn(BaseHTTPRequestHandler):
+    """Answers /rates and /currencies with an ETag, and with 304 when the client already has it."""
+
+    requests_seen: Counter = Counter()
+
+    def do_GET(self):  # noqa: N802
+        parsed = urlparse(self.path)
+        query = parse_qs(parsed.query)
+        status = 304 if self.headers.get("If-None-Match") == ETAG else 200
+        self.requests_seen[(parsed.path, query.get("date", [None])[0], status)] += 1
+
+        self.send_response(status)
+        self.send_header("ETag", ETAG)
+        if status == 304:
+            self.end_headers()
+            return
+
+        if parsed.path == "/currencies":
+            payload = {"NOK": {"name": "Norwegian Krone", "symbol": "kr"}}
+        else:
+            payload = {"date": query["date"][0], "base": query["base"][0], "rates": {"EUR": 0.087}}
+        body = json.dumps(payload).encode()
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stand_in_server(monkeypatch, tmp_path):
+    ConditionalStandIn.requests_seen = Counter()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ConditionalStandIn)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv("VATCOMPLY_BASE_URL", f"http://127.0.0.1:{server.server_port}")
+    monkeypatch.setenv("VATCOMPLY_CACHE_DIR", str(tmp_path / "cache"))
+    yield server
+    close_session()
+    server.shutdown()
+    server.server_close()
+
+
+def test_past_rates_are_cached_forever(stand_in_server):
+    first = get_rates_json("NOK", "2024-01-02")
+    second = get_rates_json("NOK", "2024-01-02")
+
+    assert first.body == second.body == {"date": "2024-01-02", "base": "NOK", "rates": {"EUR": 0.087}}
+    assert not first.from_cache
+    assert second.from_cache
+    assert sum(ConditionalStandIn.requests_seen.values()) == 1
+
+
+def test_todays_rates_are_revalidated_with_etag(stand_in_server, monkeypatch):
+    today = datetime.now(tz=UTC).date().isoformat()
+    get_rates_json("NOK", today)
+    get_rates_json("NOK", today)
+    assert ConditionalStandIn.requests_seen[("/rates", today, 200)] == 1
+
+    # once the TTL has passed the entry is revalidated instead of downloaded again
+    monkeypatch.setattr("src.vatcomply_client.TODAY_RATES_MAX_AGE", 0)
+    response = get_rates_json("NOK", today)
+
+    assert response.body["date"] == today
+    assert response.from_cache
+    assert ConditionalStandIn.requests_seen[("/rates", today, 304)] == 1
+
+
+def test_currencies_are_cached_with_ttl(stand_in_server):
+    assert get_currencies_json().body == get_currencies_json().body
+    assert sum(ConditionalStandIn.requests_seen.values()) == 1
@@ -0,0 +1,75 @@
+import os
+import sys
+from unittest.mock import patch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.ingestion_manifest import ManifestEntry, file_fingerprint
+from src.main import main, parse_args
+from src.watcher import DirectoryWatcher, run_daemon
+
+HEADER = "id,item,price,currency,created_at,updated_at,system_timestamp\n"
+
+
+def manifest_for(*file_paths):
+    return {
+        str(path): ManifestEntry(str(path), *file_fingerprint(str(path)), "hash", 1, None, None) for path in file_paths
+    }
+
+
+def test_watcher_hands_out_new_and_grown_files_once_they_settle(tmp_path):
+    first = tmp_path / "batch1.csv"
+    first.write_text(HEADER)
+    watcher = DirectoryWatcher(str(tmp_path))
+
+    assert watcher.poll() == []
+    assert watcher.poll() == [str(first)]
+
+    watcher.mark_loaded(manifest_for(first))
+    assert watcher.poll() == []
+
+    first.write_text(HEADER + "row\n")
+    second = tmp_path / "batch2.csv"
+    second.write_text(HEADER)
+    assert watcher.poll() == []
+    second.write_text(HEADER + "still being written\n")
+    assert watcher.poll() == [str(first)]
+    assert watcher.poll() == [str(first), str(second)]
+
+
+@patch("src.watcher.export_metrics")
+@patch("src.watcher.get_currencies_and_rates")
+@patch("src.watcher.create_ingestion_manifest_table")
+def test_daemon_loads_only_changed_files_and_refreshes_rates_on_its_interval(
+    mock_create_table, mock_rates, mock_export, tmp_path
+):
+    loaded = tmp_path / "batch1.csv"
+    loaded.write_text(HEADER)
+    new = tmp_path / "batch2.csv"
+    new.write_text(HEADER)
+    manifests = [manifest_for(loaded), manifest_for(loaded, new)]
+
+    with patch("src.watcher.load_manifest", side_effect=manifests), patch("src.watcher.load_csv_files") as mock_load:
+        run_daemon(str(tmp_path), interval=0, rates_refresh_interval=3600, max_cycles=4, mode="copy")
+
+    mock_load.assert_called_once_with(directory=str(tmp_path), files=[str(new)], mode="copy")
+    mock_rates.assert_called_once()
+    mock_export.assert_called_once()
+
+
+def test_watch_mode_never_prompts_for_a_reset():
+    assert parse_args([]).reset is None
+    assert parse_args(["--no-reset"]).reset is False
+
+    with (
+        patch("builtins.input") as mock_input,
+        patch("src.main.run_daemon") as mock_run_daemon,
+        patch("src.main.reset_database") as mock_reset,
+        patch("src.main.close_session"),
+        patch("src.main.close_connection_pool"),
+        patch("src.main.export_metrics"),
+    ):
+        main(["--watch", "--interval", "5"])
+
+    mock_input.assert_not_called()
+    mock_reset.assert_not_called()
+    assert mock_run_daemon.call_args[0][:2] == ("data", 5.0)